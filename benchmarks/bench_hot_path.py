@@ -0,0 +1,244 @@
+"""
+Benchmarks the stages of the polling hot path on the recorded retailer fixtures
+in `benchmarks/fixtures`, with the http session and SES stubbed out, and
+compares the results with a saved baseline.
+
+Usage:
+    python -m benchmarks.bench_hot_path [--repeat N] [--save] [--baseline PATH]
+        [--tolerance FRACTION]
+
+Exits with status 1 if a benchmark is slower than its baseline by more than
+the tolerance. Baselines are only comparable on the same machine.
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from requests import Response
+from urllib3 import HTTPResponse
+
+from gpu_alert.mailer import Mailer
+from gpu_alert.product import Product, ProductRetailerA, WatcherPool
+from gpu_alert.search import SearchRetailerA
+from gpu_alert.search.listing_parser import ListingParser
+from gpu_alert.store import ProfileStore
+from gpu_alert.utils import ValidatorCache
+
+from .stubs import StubSESClient, StubSession
+
+FIXTURES_PATH = Path(__file__).parent / Path("fixtures/retailer_a")
+BASELINE_PATH = Path(__file__).parent / Path("baseline.json")
+PRODUCT = "RTX-3070"
+
+
+class TemporaryProfileStore(ProfileStore):
+    """
+    Reads profiles from a temporary directory rather than the resources. Saved
+    profiles are serialised but not written, so that the serialisation is timed
+    rather than the fsync of the file system.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        super().__init__(0)
+        self._directory = directory
+
+    @staticmethod
+    def _write_atomic(path: Path, content: str) -> None:
+        pass
+
+    def _get_profile_path(self, vendor: str, product: str) -> Path:
+        path = self._directory / Path(f"{vendor}/{product}.json")
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(ProfileStore._get_profile_path(self, vendor, product), path)
+        return path
+
+
+class StubWatcherPool(WatcherPool):
+    """
+    Starts no product watchers, so that only the search itself is timed.
+    """
+
+    def submit(self, key: str, watcher: Product, callback: Callable[[], None]) -> bool:
+        return False
+
+
+def create_search(directory: Path, listings: List[bytes]) -> SearchRetailerA:
+    mailer = Mailer("me", ses_client=StubSESClient())
+    search = SearchRetailerA(
+        PRODUCT,
+        mailer,
+        watcher_pool=StubWatcherPool(),
+        profile_store=TemporaryProfileStore(directory),
+        session_manager=StubSession(dict()),
+    )
+    search_url = search._requests["search"]["url"]
+    search._session = StubSession({search_url: listings})
+    return search
+
+
+def create_compressed_response(compressed_body: bytes) -> Response:
+    response = Response()
+    response.status_code = 200
+    response.headers["Content-Encoding"] = "gzip"
+    response.raw = HTTPResponse(
+        io.BytesIO(compressed_body), headers=response.headers, preload_content=False
+    )
+    return response
+
+
+def measure(run: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    # Run until a batch takes long enough to time reliably
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        if time.perf_counter() - start > 0.05:
+            break
+        iterations *= 2
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        durations.append((time.perf_counter() - start) / iterations)
+
+    return {
+        "median_us": statistics.median(durations) * 1e6,
+        "min_us": min(durations) * 1e6,
+        "iterations": iterations,
+    }
+
+
+def run_benchmarks(directory: Path, repeat: int) -> Dict[str, Dict[str, float]]:
+    listing = (FIXTURES_PATH / Path("listing.html")).read_bytes()
+    # The same listing with the stock of the products flipped, so that every
+    # update changes product data and exercises the full cycle
+    restocked_listing = listing.replace(
+        "Auf Lager".encode(), "Nicht verfügbar".encode()
+    )
+    product_page = (FIXTURES_PATH / Path("product.html")).read_bytes()
+
+    search = create_search(directory, [listing, restocked_listing])
+    rows = list(ListingParser("productBox", "utf-8").parse([listing]))
+    prices = [row["price"] for row in rows]
+
+    product_data = dict(next(iter(search._products.values())))
+    product_watcher = ProductRetailerA(
+        product_data, StubSession({product_data["url"]: [product_page]})
+    )
+
+    def update_products() -> None:
+        search._validator_cache = ValidatorCache()
+        search._update_products()
+
+    def update_profile() -> None:
+        search._dirty = True
+        search._update_profile()
+
+    # An unchanged compressed listing is only hashed, not decoded or parsed
+    compressed_listing = gzip.compress(listing)
+    listing_parser = ListingParser("productBox", "utf-8")
+    validator_cache = ValidatorCache()
+
+    def skip_unchanged_listing() -> None:
+        validator_cache.parse_if_changed(
+            "listing",
+            create_compressed_response(compressed_listing),
+            lambda chunks: list(listing_parser.parse(chunks)),
+        )
+
+    def check_availability() -> None:
+        product_watcher._validator_cache = ValidatorCache()
+        product_watcher._check_availability()
+
+    benchmarks: Dict[str, Callable[[], Any]] = {
+        "format_price": lambda: [search._format_price(price) for price in prices],
+        "parse_search_results": lambda: search._parse_search_results(rows),
+        "update_products": update_products,
+        "update_profile": update_profile,
+        "skip_unchanged_listing": skip_unchanged_listing,
+        "check_availability": check_availability,
+        "search_update": search.update,
+    }
+
+    results = dict()
+    for name, run in benchmarks.items():
+        # Keep the progress messages of the searches out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = measure(run, repeat)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    regressions = []
+    # The fastest run is compared, as it is the least disturbed by other load
+    print(
+        f"{'benchmark':<24}{'median us':>12}{'min us':>12}"
+        + f"{'baseline us':>14}{'change':>10}"
+    )
+    for name, result in results.items():
+        row = f"{name:<24}{result['median_us']:>12.1f}{result['min_us']:>12.1f}"
+        if name not in baseline:
+            print(row + f"{'-':>14}{'-':>10}")
+            continue
+        change = result["min_us"] / baseline[name]["min_us"] - 1
+        print(row + f"{baseline[name]['min_us']:>14.1f}{change:>+10.0%}")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument("--repeat", type=int, default=7)
+    argument_parser.add_argument("--save", action="store_true")
+    argument_parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    argument_parser.add_argument("--tolerance", type=float, default=0.25)
+    args = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run_benchmarks(Path(directory), args.repeat)
+
+    baseline = dict()
+    if args.baseline.exists():
+        with open(args.baseline, "r") as in_:
+            baseline = json.load(in_)["benchmarks"]
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.baseline, "w") as out:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "benchmarks": results,
+                },
+                out,
+                indent=4,
+            )
+        print(f"Saved baseline to {args.baseline}.")
+    elif regressions:
+        print(f"Slower than baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
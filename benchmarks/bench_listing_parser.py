@@ -0,0 +1,85 @@
+"""
+Compares the streaming `ListingParser` with the full BeautifulSoup parse it
+replaced, on the listing pages saved in `benchmarks/fixtures`.
+
+Usage:
+    python -m benchmarks.bench_listing_parser [--repeat N] [listing ...]
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+
+from gpu_alert.search.listing_parser import ListingParser
+
+FIXTURES_PATH = Path(__file__).parent / Path("fixtures/retailer_a")
+CHUNK_SIZE = 64 * 1024
+
+warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+
+
+def parse_bs4(listing: bytes) -> List[Dict[str, str]]:
+    parsed_listing = BeautifulSoup(listing.decode("utf-8"), "lxml")
+    return [
+        {
+            "name": str(result.find("div", {"class": "product-name"}).text),
+            "stock_message": result.find("div", {"class": "delivery-info"}).text,
+            "price": result.find("span", {"class": "price"}).text,
+            "url": result["href"],
+        }
+        for result in parsed_listing.find_all("a", {"class", "productBox"})
+    ]
+
+
+def parse_streaming(listing: bytes) -> List[Dict[str, str]]:
+    chunks = (listing[i : i + CHUNK_SIZE] for i in range(0, len(listing), CHUNK_SIZE))
+    return list(ListingParser("productBox", "utf-8").parse(chunks))
+
+
+def measure(
+    parse: Callable[[bytes], List[Dict[str, str]]], listing: bytes, repeat: int
+) -> Tuple[float, int]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(listing)
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse(listing)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(durations), peak
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument("listings", nargs="*", type=Path)
+    argument_parser.add_argument("--repeat", type=int, default=20)
+    args = argument_parser.parse_args()
+
+    listings = args.listings or sorted(FIXTURES_PATH.glob("listing*"))
+    print(f"{'listing':<24}{'parser':<12}{'results':>8}{'ms':>10}{'peak KiB':>12}")
+    for listing_path in listings:
+        listing = listing_path.read_bytes()
+        expected = parse_bs4(listing)
+        if parse_streaming(listing) != expected:
+            raise AssertionError(f"Parsers disagree on {listing_path.name}.")
+
+        for name, parse in (("bs4", parse_bs4), ("streaming", parse_streaming)):
+            duration, peak = measure(parse, listing, args.repeat)
+            print(
+                f"{listing_path.name:<24}{name:<12}{len(expected):>8}"
+                + f"{duration * 1000:>10.2f}{peak / 1024:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures the start-up time of gpu-alert: the import time of the package, as
+reported by `python -X importtime`, and the time until a `Manager` is ready to
+start polling.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeat N] [--alert-profile NAME]
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_PATH = Path(__file__).parents[1]
+
+MANAGER_SCRIPT = """
+import time
+start = time.perf_counter()
+from gpu_alert.manager import Manager
+manager = Manager({alert_profile!r})
+print(time.perf_counter() - start)
+manager._close()
+"""
+
+
+def measure_import_time(module: str) -> Dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = dict()
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match and not match.group(3):
+            import_times[match.group(4)] = int(match.group(2)) / 1e6
+    return import_times
+
+
+def measure_manager_startup(alert_profile: str) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", MANAGER_SCRIPT.format(alert_profile=alert_profile)],
+        cwd=ROOT_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument("--repeat", type=int, default=5)
+    argument_parser.add_argument("--alert-profile", default="me")
+    args = argument_parser.parse_args()
+
+    import_times: List[float] = []
+    startup_times: List[float] = []
+    for _ in range(args.repeat):
+        import_times.append(
+            measure_import_time("gpu_alert.manager")["gpu_alert.manager"]
+        )
+        startup_times.append(measure_manager_startup(args.alert_profile))
+
+    print(f"import gpu_alert.manager: {statistics.median(import_times) * 1000:8.1f} ms")
+    print(
+        f"Manager ready:            {statistics.median(startup_times) * 1000:8.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
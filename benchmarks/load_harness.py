@@ -0,0 +1,330 @@
+"""
+Runs a `Manager` end to end against the simulated retailer of
+`benchmarks.simulated_retailer`, started in a separate process, with SES
+replaced by a sink recording delivery times. Reports the request rate, the
+latency from a target SKU coming into stock at the retailer to its alert email
+being delivered, and the memory and CPU time of the manager's process.
+
+Usage:
+    python -m benchmarks.load_harness [--duration S] [--interval S]
+        [--products N] [--skus N] [--page-size N] [--latency S]
+        [--error-rate F] [--flip-rate F] [--hold S] [--target-every N]
+        [--script PATH] [--seed N] [--json PATH]
+
+Profiles and outbox are kept in a temporary directory and session cookies are
+not saved, so nothing is written to the resources and no request leaves the
+machine.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from gpu_alert.mailer import Mailer, Outbox
+from gpu_alert.manager import Manager
+from gpu_alert.search import Search, SpecSearch
+from gpu_alert.session import RateLimiter, SessionManager
+from gpu_alert.store import ProfileStore
+
+from .simulated_retailer import (
+    DEFAULTS,
+    get_product_names,
+    get_sku_name,
+    get_sku_path,
+    serve,
+)
+from .stubs import StubSESClient
+
+TEMPLATE_REQUESTS_PATH = Path(__file__).parents[1] / Path(
+    "resources/retailers/retailer_a/requests/search/RTX-3080.json"
+)
+
+
+class SimulatedProfileStore(ProfileStore):
+    """
+    Keeps the profiles of the simulated products in a temporary directory.
+    """
+
+    def __init__(self, directory: Path, flush_interval: float = 30.0) -> None:
+        super().__init__(flush_interval)
+        self._directory = directory
+
+    def _get_profile_path(self, vendor: str, product: str) -> Path:
+        return self._directory / Path(f"{vendor}/{product}.json")
+
+    def create(self, vendor: str, product: str, profile: Dict[str, Any]) -> None:
+        path = self._get_profile_path(vendor, product)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(path, json.dumps(profile))
+
+
+class SimulatedSearch(SpecSearch):
+    """
+    Searches the simulated retailer with the requests and spec of retailer A,
+    their urls pointing to the simulated retailer.
+    """
+
+    def __init__(self, base_url: str, *args: Any, **kwargs: Any) -> None:
+        self._base_url = base_url
+        super().__init__(*args, **kwargs)
+
+    def _read_requests(self) -> Dict[str, Any]:
+        with open(TEMPLATE_REQUESTS_PATH, "r") as in_:
+            requests_data = json.load(in_)
+        requests_data["cookies"]["url"] = f"{self._base_url}/cookies"
+        requests_data["search"]["url"] = f"{self._base_url}/search/{self._product}"
+        return requests_data
+
+
+class SimulatedManager(Manager):
+    """
+    A `Manager` searching the simulated retailer, polling every search about
+    once per interval rather than at the pace of a real retailer.
+    """
+
+    def __init__(self, base_url: str, interval: float, **kwargs: Any) -> None:
+        self._base_url = base_url
+        self._interval = interval
+        super().__init__("me", **kwargs)
+
+    def _get_session_manager(self, vendor: str) -> SessionManager:
+        with self._session_managers_lock:
+            if vendor not in self._session_managers:
+                self._session_managers[vendor] = SessionManager(
+                    vendor, pool_maxsize=32, rate_limiter=self._rate_limiter
+                )
+            return self._session_managers[vendor]
+
+    def _create_search(self, alert: Dict[str, Any]) -> Search:
+        return SimulatedSearch(
+            self._base_url,
+            "retailer_a",
+            alert["product"],
+            self._mailer,
+            watcher_pool=self._watcher_pool,
+            profile_store=self._profile_store,
+            outbox=self._outbox,
+            session_manager=self._get_session_manager("retailer_a"),
+            coordinator=self._coordinator,
+        )
+
+    def _generate_search_interval(self) -> float:
+        return self._interval * random.uniform(0.8, 1.2)
+
+    def _generate_time_interval(self) -> float:
+        return self._interval / len(self._searches)
+
+
+def create_profile(base_url: str, product: str, options: Dict[str, Any]) -> Dict:
+    products = dict()
+    for sku in range(options["skus"]):
+        target = sku % options["target_every"] == 0
+        products[f"product{sku}"] = {
+            "name": get_sku_name(product, sku),
+            "stock": False,
+            "alert": False,
+            "time_updated": None,
+            "price": None,
+            "url": f"{base_url}{get_sku_path(product, sku)}",
+            "target": target,
+            "priority": 1 if target else 10000,
+        }
+    return {"time_updated": None, "products": products}
+
+
+def start_retailer(options: Dict[str, Any]) -> BaseProcess:
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=serve, args=(options, sender), name="simulated-retailer", daemon=True
+    )
+    process.start()
+    options["base_url"] = receiver.recv()
+    return process
+
+
+def run(manager: Manager, duration: float) -> None:
+    """
+    Runs the concurrent update loop of the manager for a duration, then lets the
+    running updates finish and closes the manager.
+    """
+
+    async def run_for_duration() -> None:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(manager._run_concurrently(), duration)
+
+    try:
+        asyncio.run(run_for_duration())
+    finally:
+        manager._close()
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarise(
+    stats: Dict[str, Any],
+    sink: StubSESClient,
+    options: Dict[str, Any],
+    duration: float,
+    cpu_seconds: float,
+) -> Dict[str, Any]:
+    # The delivery times of the stock alerts for each SKU url
+    deliveries: Dict[str, List[float]] = dict()
+    for sent_time, email in zip(sink.sent_times, sink.sent):
+        # Single emails carry their data as TemplateData, bulk ones as the default
+        template_data = json.loads(
+            email.get("TemplateData") or email["DefaultTemplateData"]
+        )
+        if email["Template"] == "stock_alert":
+            deliveries.setdefault(template_data["url"], []).append(sent_time)
+
+    # Each restock of a target SKU is alerted if an alert is delivered before it
+    # sells out again, missed if it sells out first and pending otherwise
+    flips = [tuple(flip) for flip in stats["flips"]]
+    latencies = []
+    missed = 0
+    pending = 0
+    for i, (flip_time, product, sku, stock) in enumerate(flips):
+        if not stock or sku % options["target_every"]:
+            continue
+        sold_out_time = next(
+            (f[0] for f in flips[i + 1 :] if f[1:3] == (product, sku)), None
+        )
+        url = f"{options['base_url']}{get_sku_path(product, sku)}"
+        alerts = [
+            t
+            for t in deliveries.get(url, [])
+            if t >= flip_time and (sold_out_time is None or t < sold_out_time)
+        ]
+        if alerts:
+            latencies.append(alerts[0] - flip_time)
+        elif sold_out_time is not None:
+            missed += 1
+        else:
+            pending += 1
+
+    elapsed = stats["time"] - stats["start_time"]
+    requests_total = sum(stats["requests"].values())
+    return {
+        "duration_s": duration,
+        "requests_per_s": requests_total / elapsed,
+        "requests": stats["requests"],
+        "errors_injected": stats["errors"],
+        "target_restocks": len(latencies) + missed + pending,
+        "alerted": len(latencies),
+        "missed": missed,
+        "pending": pending,
+        "emails_delivered": len(sink.sent),
+        "latency_s": {
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies) if latencies else None,
+            "mean": statistics.mean(latencies) if latencies else None,
+        },
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "cpu_s": cpu_seconds,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f} s"
+
+    latency = report["latency_s"]
+    lines = [
+        f"duration             {report['duration_s']:.0f} s",
+        f"requests/s           {report['requests_per_s']:.1f}",
+        *(
+            f"  {endpoint:<18} {count}"
+            for endpoint, count in sorted(report["requests"].items())
+        ),
+        f"errors injected      {report['errors_injected']}",
+        f"target restocks      {report['target_restocks']}"
+        + f" ({report['alerted']} alerted, {report['missed']} missed,"
+        + f" {report['pending']} pending)",
+        f"emails delivered     {report['emails_delivered']}",
+        "detection-to-alert   "
+        + f"p50 {seconds(latency['p50'])}, p90 {seconds(latency['p90'])},"
+        + f" p99 {seconds(latency['p99'])}, max {seconds(latency['max'])}",
+        f"max rss              {report['max_rss_mb']:.1f} MB",
+        f"cpu time             {report['cpu_s']:.2f} s",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument("--duration", type=float, default=60.0)
+    argument_parser.add_argument("--interval", type=float, default=2.0)
+    for name, default in DEFAULTS.items():
+        if name != "port":
+            argument_parser.add_argument(
+                f"--{name.replace('_', '-')}",
+                type=type(default) if default is not None else str,
+                default=default,
+            )
+    argument_parser.add_argument("--json", type=Path)
+    args = argument_parser.parse_args()
+    options = {k: v for k, v in vars(args).items() if k in DEFAULTS}
+
+    retailer = start_retailer(options)
+    sink = StubSESClient()
+    directory = Path(tempfile.mkdtemp(prefix="load-harness-"))
+    profile_store = SimulatedProfileStore(directory)
+    for product in get_product_names(options["products"]):
+        profile_store.create(
+            "retailer_a", product, create_profile(options["base_url"], product, options)
+        )
+
+    mailer = Mailer("me", ses_client=sink)
+    host = options["base_url"].split("//")[1]
+    manager = SimulatedManager(
+        options["base_url"],
+        args.interval,
+        alerts=[
+            {"vendor": "retailer_a", "product": p}
+            for p in get_product_names(options["products"])
+        ],
+        outbox=Outbox(mailer, path=directory / Path("outbox.sqlite3")),
+        rate_limiter=RateLimiter(host_limits={host: {"rate": 1e4, "burst": 100}}),
+        profile_store=profile_store,
+    )
+
+    # Keep the progress messages of the searches and watchers out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        cpu_start = time.process_time()
+        run(manager, args.duration)
+        cpu_seconds = time.process_time() - cpu_start
+        stats = requests.get(f"{options['base_url']}/_stats").json()
+        retailer.terminate()
+        report = summarise(stats, sink, options, args.duration, cpu_seconds)
+
+    print(format_report(report), end="")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=4)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
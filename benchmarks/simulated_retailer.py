@@ -0,0 +1,327 @@
+"""
+A local stand-in for retailer A, serving the cookie, search and product page
+endpoints of `resources/retailers/retailer_a/requests` for synthetic listings of
+thousands of SKUs, with configurable latency, error rate and stock flips. The
+flips and request counts are served as JSON at `/_stats`.
+
+Usage:
+    python -m benchmarks.simulated_retailer [--port N] [--products N] [--skus N]
+        [--page-size N] [--latency S] [--error-rate F] [--flip-rate F]
+        [--hold S] [--target-every N] [--script PATH] [--seed N]
+
+A script is a JSON list of flips, e.g.
+    [{"at": 5.0, "product": "SIM-0", "sku": 10, "stock": true}]
+with "at" in seconds after the start of the server.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+DEFAULTS: Dict[str, Any] = {
+    "port": 0,
+    "products": 3,
+    "skus": 2000,
+    "page_size": 500,
+    "latency": 0.0,
+    "error_rate": 0.0,
+    "flip_rate": 1.0,
+    "hold": 30.0,
+    "target_every": 50,
+    "target_flip_share": 0.5,
+    "script": None,
+    "seed": 0,
+}
+
+
+def get_product_names(products: int) -> List[str]:
+    return [f"SIM-{i}" for i in range(products)]
+
+
+def get_sku_name(product: str, sku: int) -> str:
+    return f"SIMULATED GeForce {product} Model {sku}, Grafikkarte"
+
+
+def get_sku_path(product: str, sku: int) -> str:
+    return f"/product/{product}/{sku}"
+
+
+def format_price(cents: int) -> str:
+    euros = f"{cents // 100:,}".replace(",", ".")
+    return f"€ {euros},{cents % 100:02d}"
+
+
+class Catalogue:
+    """
+    The SKUs of the simulated products and their stock, with a log of every
+    stock flip. Listing entries are rendered once per stock state.
+    """
+
+    def __init__(self, base_url: str, options: Dict[str, Any]) -> None:
+        self._page_size = options["page_size"]
+        self._lock = threading.Lock()
+        self.flips: List[Tuple[float, str, int, bool]] = []
+        self._stock: Dict[str, bytearray] = dict()
+        self._entries: Dict[str, List[Tuple[str, str]]] = dict()
+
+        for product in get_product_names(options["products"]):
+            self._stock[product] = bytearray(options["skus"])
+            self._entries[product] = [
+                self._render_entries(base_url, product, sku)
+                for sku in range(options["skus"])
+            ]
+
+    @staticmethod
+    def _render_entries(base_url: str, product: str, sku: int) -> Tuple[str, str]:
+        entry = (
+            f'<a href="{base_url}{get_sku_path(product, sku)}"'
+            + ' class="card align-content-center productBox boxCounter">'
+            + '<div class="product-name font-weight-bold">'
+            + f"{get_sku_name(product, sku)}</div>"
+            + '<div class="delivery-info text-right"><span>{stock}</span></div>'
+            + '<div class="price-container"><span class="price">'
+            + f"{format_price(50000 + sku * 1337 % 150000)}</span></div></a>\n"
+        )
+        return (
+            entry.replace("{stock}", "Liefertermin unbekannt"),
+            entry.replace("{stock}", "Auf Lager"),
+        )
+
+    def flip(self, product: str, sku: int, stock: bool) -> None:
+        with self._lock:
+            self._stock[product][sku] = stock
+            self.flips.append((time.time(), product, sku, stock))
+
+    def is_in_stock(self, product: str, sku: int) -> bool:
+        return bool(self._stock[product][sku])
+
+    def has(self, product: str, sku: int) -> bool:
+        return product in self._stock and 0 <= sku < len(self._stock[product])
+
+    def render_listing(self, product: str, page: int) -> bytes:
+        start = (page - 1) * self._page_size
+        stock = self._stock[product]
+        entries = self._entries[product][start : start + self._page_size]
+        body = "".join(
+            entry[stock[sku]] for sku, entry in enumerate(entries, start=start)
+        )
+        return (
+            "<?xml version='1.0' encoding='UTF-8'?>\n<partial-response><changes>"
+            + '<update id="lazyListingContainer"><![CDATA[<div id="lazyListingContainer"'
+            + f' class="grid-container listing">\n{body}</div>]]></update>'
+            + "</changes></partial-response>"
+        ).encode("utf-8")
+
+    def render_product_page(self, product: str, sku: int) -> bytes:
+        button = (
+            '<a href="/warenkorb/add" class="btn btn-primary" title="In den Warenkorb">'
+            + "In den Warenkorb</a>"
+            if self.is_in_stock(product, sku)
+            else '<div class="delivery-info">Liefertermin unbekannt</div>'
+        )
+        return (
+            f"<html><head><title>{get_sku_name(product, sku)}</title></head><body>"
+            + f"<h1>{get_sku_name(product, sku)}</h1>{button}</body></html>"
+        ).encode("utf-8")
+
+
+class QuietServer(ThreadingHTTPServer):
+    """
+    A `ThreadingHTTPServer` ignoring connections closed by the client, e.g.
+    after an error response whose body was not read.
+    """
+
+    daemon_threads = True
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        pass
+
+
+class SimulatedRetailer:
+    """
+    Serves the catalogue over http and flips the stock of its SKUs, randomly at
+    the flip rate and as scripted.
+    """
+
+    def __init__(self, options: Dict[str, Any]) -> None:
+        self._options = {**DEFAULTS, **options}
+        self._random = random.Random(self._options["seed"])
+        self._server = QuietServer(
+            ("127.0.0.1", self._options["port"]), self._create_handler()
+        )
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._catalogue = Catalogue(self.base_url, self._options)
+        self._requests: Counter = Counter()
+        self._errors = 0
+        self._counter_lock = threading.Lock()
+        self._start_time = time.time()
+        self._stop_event = threading.Event()
+
+    def _create_handler(self) -> type:
+        retailer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                retailer._handle(self, dict())
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode())
+                retailer._handle(self, {k: v[0] for k, v in form.items()})
+
+        return Handler
+
+    def _respond(
+        self,
+        handler: BaseHTTPRequestHandler,
+        status: int,
+        body: bytes,
+        content_type: str = "text/html;charset=UTF-8",
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers if headers else dict()).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle(self, handler: BaseHTTPRequestHandler, form: Dict[str, str]) -> None:
+        parts = handler.path.split("?")[0].strip("/").split("/")
+        endpoint = parts[0]
+
+        if endpoint == "_stats":
+            self._respond(
+                handler, 200, json.dumps(self.get_stats()).encode(), "application/json"
+            )
+            return
+
+        with self._counter_lock:
+            self._requests[endpoint] += 1
+        if self._options["latency"]:
+            time.sleep(self._random.expovariate(1 / self._options["latency"]))
+        if self._random.random() < self._options["error_rate"]:
+            with self._counter_lock:
+                self._errors += 1
+            self._respond(
+                handler, 503, b"<html><body>Service Unavailable</body></html>"
+            )
+            return
+
+        if endpoint == "cookies":
+            self._respond(
+                handler, 200, b"<html></html>", headers={"Set-Cookie": "sid=1; Path=/"}
+            )
+        elif endpoint == "search" and len(parts) == 2:
+            page = int(form.get("lpf", "1"))
+            body = self._catalogue.render_listing(parts[1], page)
+            self._respond(handler, 200, body, "text/xml;charset=UTF-8")
+        elif (
+            endpoint == "product"
+            and len(parts) == 3
+            and self._catalogue.has(parts[1], int(parts[2]))
+        ):
+            body = self._catalogue.render_product_page(parts[1], int(parts[2]))
+            self._respond(handler, 200, body)
+        else:
+            self._respond(handler, 404, b"<html><body>Not Found</body></html>")
+
+    def _pick_sku(self) -> Tuple[str, int]:
+        product = self._random.choice(get_product_names(self._options["products"]))
+        target_every = self._options["target_every"]
+        if self._random.random() < self._options["target_flip_share"]:
+            sku = self._random.randrange(0, self._options["skus"], target_every)
+        else:
+            sku = self._random.randrange(self._options["skus"])
+        return product, sku
+
+    def _run_flips(self) -> None:
+        # Scheduled flips, as (time, product, sku, stock)
+        flips: List[Tuple[float, str, int, bool]] = []
+        if self._options["script"]:
+            with open(self._options["script"], "r") as in_:
+                for flip in json.load(in_):
+                    flips.append(
+                        (
+                            self._start_time + flip["at"],
+                            flip["product"],
+                            flip["sku"],
+                            flip["stock"],
+                        )
+                    )
+
+        next_random = self._start_time
+        while not self._stop_event.is_set():
+            now = time.time()
+            if self._options["flip_rate"] and now >= next_random:
+                product, sku = self._pick_sku()
+                if not self._catalogue.is_in_stock(product, sku):
+                    flips.append((now, product, sku, True))
+                    flips.append((now + self._options["hold"], product, sku, False))
+                next_random = now + self._random.expovariate(self._options["flip_rate"])
+
+            flips.sort()
+            while flips and flips[0][0] <= now:
+                _, product, sku, stock = flips.pop(0)
+                self._catalogue.flip(product, sku, stock)
+            self._stop_event.wait(0.01)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._counter_lock:
+            return {
+                "start_time": self._start_time,
+                "time": time.time(),
+                "requests": dict(self._requests),
+                "errors": self._errors,
+                "flips": list(self._catalogue.flips),
+            }
+
+    def serve_forever(self) -> None:
+        threading.Thread(target=self._run_flips, name="flips", daemon=True).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stop_event.set()
+            self._server.server_close()
+
+
+def serve(options: Dict[str, Any], connection: Optional[Connection] = None) -> None:
+    """
+    Runs the simulated retailer, sending its base url through the connection
+    once it accepts requests, e.g. to the process that started it.
+    """
+    retailer = SimulatedRetailer(options)
+    if connection is not None:
+        connection.send(retailer.base_url)
+        connection.close()
+    else:
+        print(f"Serving the simulated retailer at {retailer.base_url}.")
+    retailer.serve_forever()
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    for name, default in DEFAULTS.items():
+        argument_parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=type(default) if default is not None else str,
+            default=default,
+        )
+    serve(vars(argument_parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
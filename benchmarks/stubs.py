@@ -0,0 +1,80 @@
+"""
+Stand-ins for the retailer session and SES, serving recorded fixtures so that
+benchmarks run offline and without sending emails.
+"""
+
+import io
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from requests import Response
+
+from gpu_alert.session import SessionManager
+
+
+class StubResponse(Response):
+    def __init__(
+        self,
+        body: bytes,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        encoding: Optional[str] = "utf-8",
+    ) -> None:
+        super().__init__()
+        self.status_code = status_code
+        self.headers.update(headers if headers else dict())
+        self.encoding = encoding
+        self.raw = io.BytesIO(body)
+
+
+class StubSession(SessionManager):
+    """
+    Serves recorded bodies per url in place of a `SessionManager`, cycling
+    through them if there are several. The recorded listings are single pages,
+    requests for later pages of a paginated listing are served empty.
+    """
+
+    def __init__(
+        self, bodies: Dict[str, Sequence[bytes]], page_parameter: str = "lpf"
+    ) -> None:
+        super().__init__("stub")
+        self._bodies = {url: itertools.cycle(cycle) for url, cycle in bodies.items()}
+        self._page_parameter = page_parameter
+        self.requests: List[str] = []
+
+    def register_cookie_request(self, cookie_request: Dict[str, Any]) -> None:
+        pass
+
+    def request(self, method: str, url: str, **kwargs: Any) -> Response:
+        self.requests.append(url)
+        data = kwargs.get("data") or dict()
+        if str(data.get(self._page_parameter, 1)) != "1":
+            return StubResponse(b"")
+        return StubResponse(next(self._bodies[url]))
+
+
+class StubSESClient:
+    """
+    Records the emails sent in place of a boto3 SES client, and the time each
+    was sent at.
+    """
+
+    def __init__(self) -> None:
+        self.sent: List[Dict[str, Any]] = []
+        self.sent_times: List[float] = []
+
+    def send_templated_email(self, **kwargs: Any) -> Dict[str, Any]:
+        self.sent_times.append(time.time())
+        self.sent.append(kwargs)
+        return {"MessageId": str(len(self.sent))}
+
+    def send_bulk_templated_email(self, **kwargs: Any) -> Dict[str, Any]:
+        self.sent_times.append(time.time())
+        self.sent.append(kwargs)
+        return {
+            "Status": [
+                {"Status": "Success", "MessageId": str(len(self.sent))}
+                for _ in kwargs["Destinations"]
+            ]
+        }
@@ -0,0 +1,4 @@
+from .lease_backend import LeaseBackend, SQLiteLeaseBackend
+from .lease_coordinator import LeaseCoordinator
+
+__all__ = ["LeaseBackend", "LeaseCoordinator", "SQLiteLeaseBackend"]
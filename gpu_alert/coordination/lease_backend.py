@@ -0,0 +1,286 @@
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+
+class LeaseBackend(ABC):
+    """
+    A `LeaseBackend` stores the state shared by all nodes running the same alert
+    profile: the nodes that are alive, the time-bounded leases nodes hold on
+    partitions of the work, and the last known stock state of every product,
+    used to send a single alert per stock transition.
+
+    Backends specific to a storage inherit from this class. Every operation must
+    be atomic across nodes.
+
+    Methods:
+        heartbeat
+        leave
+        acquire
+        release
+        get_owners
+        claim_transition
+        close
+    """
+
+    @abstractmethod
+    def heartbeat(self, node: str, ttl: float) -> List[str]:
+        """
+        Marks a node as alive for a time and returns the nodes that are alive.
+
+        Args:
+            node (str): The id of the node.
+            ttl (float): The time in seconds the node is considered alive for.
+
+        Returns:
+            List[str]: The ids of the nodes that are alive, including the node.
+        """
+        pass
+
+    @abstractmethod
+    def leave(self, node: str) -> None:
+        """
+        Marks a node as no longer alive, so that its share is given to the other
+        nodes at once.
+
+        Args:
+            node (str): The id of the node.
+        """
+        pass
+
+    @abstractmethod
+    def acquire(self, partition: str, node: str, ttl: float) -> bool:
+        """
+        Acquires or renews the lease of a node on a partition, if the partition
+        is not leased by another node or its lease expired.
+
+        Args:
+            partition (str): The key of the partition.
+            node (str): The id of the node.
+            ttl (float): The time in seconds the lease is held for.
+
+        Returns:
+            bool: True if the node holds the lease, False otherwise.
+        """
+        pass
+
+    @abstractmethod
+    def release(self, partition: str, node: str) -> None:
+        """
+        Releases the lease of a node on a partition, if it holds it.
+
+        Args:
+            partition (str): The key of the partition.
+            node (str): The id of the node.
+        """
+        pass
+
+    @abstractmethod
+    def get_owners(self) -> Dict[str, str]:
+        """
+        Returns the nodes holding a lease on each leased partition.
+
+        Returns:
+            Dict[str, str]: A dict mapping partitions to the ids of the nodes
+                holding an unexpired lease on them.
+        """
+        pass
+
+    @abstractmethod
+    def claim_transition(self, key: str, in_stock: bool) -> bool:
+        """
+        Records the stock state of a product, if it differs from the last state
+        recorded by any node.
+
+        Args:
+            key (str): The key identifying the product.
+            in_stock (bool): The stock state of the product.
+
+        Returns:
+            bool: True if this call recorded a stock transition, False if the
+                state was recorded by a node already.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Releases the resources of the backend.
+        """
+        pass
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """
+    A `LeaseBackend` storing the shared state in an SQLite database, for nodes
+    on one host or sharing a file system with working locks. Inherits from the
+    LeaseBackend class.
+
+    Expiry times are compared to the wall clock of the node, so the clocks of
+    the nodes must be synchronised to well within the lease time.
+
+    Attributes:
+        _connection -- the connection to the database.
+        _lock -- a lock guarding `_connection`.
+
+    Methods:
+        __init__
+        _get_backend_path
+        _create_tables
+        heartbeat
+        leave
+        acquire
+        release
+        get_owners
+        claim_transition
+        close
+    """
+
+    def __init__(self, path: Optional[Path] = None, timeout: float = 10.0) -> None:
+        """
+        Initializes the SQLiteLeaseBackend object.
+
+        Args:
+            path (Path): The path of the database. Defaults to a database in the
+                coordination resources.
+            timeout (float): The time in seconds to wait for another node holding
+                the database lock.
+        """
+        path = path if path else self._get_backend_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are begun explicitly, so that each operation is atomic
+        self._connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        self._lock = Lock()
+        self._create_tables()
+
+    @staticmethod
+    def _get_backend_path() -> Path:
+        """
+        Returns the default path of the database.
+
+        Returns:
+            Path: The path of the database.
+        """
+        return Path(__file__).parents[2] / Path("resources/coordination/leases.sqlite3")
+
+    def _create_tables(self) -> None:
+        """
+        Creates the tables of nodes, leases and stock states, if they do not exist yet.
+        """
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS nodes"
+                + " (node TEXT PRIMARY KEY, expires REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases (partition_key TEXT PRIMARY KEY,"
+                + " node TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS stock_states"
+                + " (key TEXT PRIMARY KEY, in_stock INTEGER NOT NULL,"
+                + " transitions INTEGER NOT NULL)"
+            )
+
+    def heartbeat(self, node: str, ttl: float) -> List[str]:
+        """
+        Marks a node as alive, forgets the nodes whose heartbeat expired and
+        returns the nodes that are alive.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO nodes (node, expires) VALUES (?, ?)",
+                    (node, now + ttl),
+                )
+                self._connection.execute("DELETE FROM nodes WHERE expires < ?", (now,))
+                rows = self._connection.execute("SELECT node FROM nodes").fetchall()
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return sorted(row[0] for row in rows)
+
+    def leave(self, node: str) -> None:
+        """
+        Deletes the heartbeat of a node.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM nodes WHERE node = ?", (node,))
+
+    def acquire(self, partition: str, node: str, ttl: float) -> bool:
+        """
+        Acquires or renews a lease in a single upsert, which only overwrites
+        leases of the same node or expired ones.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO leases (partition_key, node, expires) VALUES (?, ?, ?)"
+                + " ON CONFLICT (partition_key) DO UPDATE"
+                + " SET node = excluded.node, expires = excluded.expires"
+                + " WHERE leases.node = excluded.node OR leases.expires < ?",
+                (partition, node, now + ttl, now),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, partition: str, node: str) -> None:
+        """
+        Deletes the lease of a node on a partition, if it holds it.
+        """
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM leases WHERE partition_key = ? AND node = ?",
+                (partition, node),
+            )
+
+    def get_owners(self) -> Dict[str, str]:
+        """
+        Returns the nodes holding an unexpired lease on each partition.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT partition_key, node FROM leases WHERE expires >= ?",
+                (time.time(),),
+            ).fetchall()
+        return dict(rows)
+
+    def claim_transition(self, key: str, in_stock: bool) -> bool:
+        """
+        Records the stock state of a product and counts the transition, unless
+        the state is recorded already.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT in_stock FROM stock_states WHERE key = ?", (key,)
+                ).fetchone()
+                claimed = row is None or bool(row[0]) != in_stock
+                if claimed:
+                    self._connection.execute(
+                        "INSERT INTO stock_states (key, in_stock, transitions)"
+                        + " VALUES (?, ?, 1) ON CONFLICT (key) DO UPDATE"
+                        + " SET in_stock = excluded.in_stock,"
+                        + " transitions = transitions + 1",
+                        (key, int(in_stock)),
+                    )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def close(self) -> None:
+        """
+        Closes the connection to the database.
+        """
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,217 @@
+import os
+import socket
+import time
+import zlib
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, List, Optional
+
+from .lease_backend import LeaseBackend
+
+
+class LeaseCoordinator:
+    """
+    A `LeaseCoordinator` lets several nodes running the same alert profile share
+    its searches, each search being polled by one node at a time. The searches
+    are partitions of the work, a node only polls the partitions it holds a
+    time-bounded lease on. Leases are renewed in the background, a node that
+    fails stops renewing and its partitions are taken over by the other nodes
+    once the leases expire.
+
+    Every node takes an equal share of the partitions: a node holding more than
+    its share releases the surplus, so that nodes joining later are given work.
+    Free partitions are tried in an order depending on the node, so that nodes
+    rarely compete for the same one.
+
+    Stock transitions are claimed through the backend before alerting, so that
+    a transition seen by several nodes, e.g. around a failover, is alerted once.
+
+    Attributes:
+        _backend -- stores the leases and stock states shared by all nodes.
+        _node_id -- the id of this node.
+        _lease_ttl -- the time in seconds a lease is held for without renewal.
+        _renew_interval -- the time in seconds between two renewals.
+        _partitions -- the partitions shared between the nodes.
+        _leases -- a dict mapping the partitions held by this node to the time
+            until which they are considered held.
+        _lock -- a lock guarding `_leases`.
+        _stop_event -- set to stop the renewal thread.
+        _renew_thread -- the background thread renewing the leases.
+
+    Methods:
+        __init__
+        _get_order
+        _run
+        rebalance
+        get_renew_interval
+        holds
+        claim_transition
+        start
+        set_partitions
+        close
+    """
+
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        node_id: Optional[str] = None,
+        lease_ttl: float = 15.0,
+    ) -> None:
+        """
+        Initializes the LeaseCoordinator object.
+
+        Args:
+            backend (LeaseBackend): Stores the leases and stock states shared by
+                all nodes.
+            node_id (str): The id of this node. Defaults to the host name and
+                process id.
+            lease_ttl (float): The time in seconds a lease is held for without
+                renewal. Failover takes at most this long.
+        """
+        self._backend = backend
+        self._node_id = node_id if node_id else f"{socket.gethostname()}-{os.getpid()}"
+        self._lease_ttl = lease_ttl
+        self._renew_interval = lease_ttl / 3
+        self._partitions: List[str] = []
+        self._leases: Dict[str, float] = dict()
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._renew_thread: Optional[Thread] = None
+
+    def _get_order(self, partition: str) -> int:
+        """
+        Returns the rank of a partition in the order this node tries partitions in.
+
+        Args:
+            partition (str): The key of the partition.
+
+        Returns:
+            int: The rank of the partition.
+        """
+        return zlib.crc32(f"{self._node_id}/{partition}".encode())
+
+    def _run(self) -> None:
+        """
+        Rebalances the leases at every renewal interval until stopped.
+        """
+        while not self._stop_event.wait(self._renew_interval):
+            self.rebalance()
+
+    def rebalance(self) -> None:
+        """
+        Renews the leases of this node up to its share of the partitions, releases
+        the surplus and acquires free partitions until its share is reached.
+        If the backend can not be reached, the leases lapse locally before they
+        expire for the other nodes.
+        """
+        try:
+            nodes = self._backend.heartbeat(self._node_id, self._lease_ttl)
+            owners = self._backend.get_owners()
+            share = -(-len(self._partitions) // max(1, len(nodes)))
+
+            partitions = sorted(self._partitions, key=self._get_order)
+            held = [p for p in partitions if owners.get(p) == self._node_id]
+            for partition in held[share:]:
+                self._backend.release(partition, self._node_id)
+            free = [p for p in partitions if p not in owners]
+
+            # Leases are given up locally before they expire for the other nodes
+            held_until = time.monotonic() + self._lease_ttl - self._renew_interval
+            leases: Dict[str, float] = dict()
+            for partition in held[:share] + free:
+                if len(leases) >= share:
+                    break
+                if self._backend.acquire(partition, self._node_id, self._lease_ttl):
+                    leases[partition] = held_until
+        except Exception as e:
+            print("Error renewing leases:")
+            print(e)
+            return
+
+        with self._lock:
+            self._leases = leases
+
+    def get_renew_interval(self) -> float:
+        """
+        Returns the time in seconds between two renewals of the leases.
+        """
+        return self._renew_interval
+
+    def holds(self, partition: str) -> bool:
+        """
+        Checks whether this node holds the lease on a partition.
+
+        Args:
+            partition (str): The key of the partition.
+
+        Returns:
+            bool: True if this node holds the lease, False otherwise.
+        """
+        with self._lock:
+            return self._leases.get(partition, 0.0) > time.monotonic()
+
+    def claim_transition(self, key: str, in_stock: bool) -> bool:
+        """
+        Claims a stock transition of a product seen by this node, so that only
+        the first node to see it alerts for it. If the backend can not be
+        reached, the transition is claimed, as a duplicate alert is preferable
+        to a missed one.
+
+        Args:
+            key (str): The key identifying the product.
+            in_stock (bool): The new stock state of the product.
+
+        Returns:
+            bool: True if this node claimed the transition, False if another node
+                did already.
+        """
+        try:
+            return self._backend.claim_transition(key, in_stock)
+        except Exception as e:
+            print("Error claiming stock transition:")
+            print(e)
+            return True
+
+    def start(self, partitions: Iterable[str]) -> None:
+        """
+        Acquires this node's share of the partitions and starts renewing the
+        leases in the background.
+
+        Args:
+            partitions (Iterable[str]): The partitions shared between the nodes.
+        """
+        self._partitions = list(partitions)
+        self.rebalance()
+        self._renew_thread = Thread(target=self._run, name="leases", daemon=True)
+        self._renew_thread.start()
+
+    def set_partitions(self, partitions: Iterable[str]) -> None:
+        """
+        Changes the partitions shared between the nodes, e.g. after searches were
+        added to or removed from the alert profile, and rebalances the leases.
+
+        Args:
+            partitions (Iterable[str]): The partitions shared between the nodes.
+        """
+        self._partitions = list(partitions)
+        self.rebalance()
+
+    def close(self) -> None:
+        """
+        Stops renewing the leases and releases them, so that the other nodes can
+        take over the partitions at once rather than after the leases expire.
+        """
+        self._stop_event.set()
+        if self._renew_thread is not None:
+            self._renew_thread.join()
+
+        with self._lock:
+            partitions = list(self._leases)
+            self._leases = dict()
+        try:
+            for partition in partitions:
+                self._backend.release(partition, self._node_id)
+            self._backend.leave(self._node_id)
+        except Exception as e:
+            print("Error releasing leases:")
+            print(e)
+        self._backend.close()
@@ -1,3 +1,4 @@
 from .mailer import Mailer
+from .outbox import Outbox
 
-__all__ = ["Mailer"]
+__all__ = ["Mailer", "Outbox"]
@@ -1,9 +1,11 @@
 import json
-from pathlib import Path
-from typing import Any, Dict, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-import boto3
-from botocore.exceptions import ClientError
+from gpu_alert.metrics import span
+from gpu_alert.resources import get_resource_registry
 
 
 class Mailer:
@@ -11,45 +13,76 @@ class Mailer:
     An object of `Mailer` provides an interface for the sending
     of alert emails via AWS SES.
 
+    Alerts are sent to all recipients in parallel, either as single emails
+    from a bounded thread pool or, in bulk mode, as bulk templated emails
+    with a fallback to single emails for the recipients they failed for.
+
     Attributes:
         _recipient_group -- the name of a group of recipients of alert emails.
-        _sender -- the SES-enabled email to use to send alerts.
-        _ses_client -- an object enabling send-email requests to be sent to SES.
+        _ses_client -- an object enabling send-email requests to be sent to SES,
+            created on first use.
+        _ses_client_lock -- a lock guarding the creation of `_ses_client`.
+        _bulk -- a boolean flag indicating whether to send bulk templated emails.
+        _executor -- the thread pool single emails are sent from.
+        _recipients_cache -- the recipients data last read from the resource
+            registry and the email addresses in it.
+        _recipients_lock -- a lock guarding `_recipients_cache`.
+        last_dispatch_duration -- the time in seconds it took to send the last
+            alert to all recipients.
 
     Methods:
         __init__
         _read_sender
         _create_ses_client
+        _get_ses_client
         _read_recipients
+        _send_bulk
+        _send_parallel
         send_email
         send_to_all
     """
 
-    def __init__(self, recipient_group: str) -> None:
+    # The maximum number of destinations of a single bulk templated email
+    _bulk_batch_size = 50
+
+    def __init__(
+        self,
+        recipient_group: str,
+        bulk: bool = False,
+        max_workers: int = 8,
+        ses_client: Optional[Any] = None,
+    ) -> None:
         """
         Initialize the Mailer object by setting the recipient group and initializing
         the SES client and the sender's email address.
 
         Args:
             recipient_group (str): The name of a group of recipients of alert emails.
+            bulk (bool): Whether to send alerts as bulk templated emails.
+            max_workers (int): The maximum number of single emails to send at once.
+            ses_client (Any): The SES client to send emails with. Defaults to a
+                boto3 SES client created on first use.
         """
         self._recipient_group = recipient_group
-        self._ses_client = self._create_ses_client()
-        self._sender = self._read_sender()
+        self._ses_client = ses_client
+        self._ses_client_lock = Lock()
+        self._bulk = bulk
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mailer"
+        )
+        self._recipients_cache: Optional[Tuple[Dict[str, Any], List[str]]] = None
+        self._recipients_lock = Lock()
+        self.last_dispatch_duration: Optional[float] = None
 
-    def _read_sender(self) -> Any:
+    def _read_sender(self) -> str:
         """
-        Reads the sender's email from a configuration file.
+        Reads the sender's email from the resource registry, so that a change of
+        the sender takes effect with the next email.
 
         Returns:
             str: The sender's email address.
         """
-        alert_profile_path = Path(__file__).parents[2] / Path(
-            "resources/email/senders/me.json"
-        )
-
-        with open(alert_profile_path, "r") as in_:
-            return json.load(in_)["sender"]
+        return get_resource_registry().get("email/senders/me.json")["sender"]["email"]
 
     def _create_ses_client(self) -> Any:
         """
@@ -58,27 +91,114 @@ class Mailer:
         Returns:
             A boto3 SES client object.
         """
+        # Imported here, as importing boto3 takes a large share of the start-up time
+        import boto3
+
         return boto3.client("ses", region_name="eu-central-1")
 
+    def _get_ses_client(self) -> Any:
+        """
+        Returns the SES client, creating it on first use.
+
+        Returns:
+            A boto3 SES client object.
+        """
+        with self._ses_client_lock:
+            if self._ses_client is None:
+                self._ses_client = self._create_ses_client()
+            return self._ses_client
+
     def _read_recipients(self) -> Iterable[str]:
         """
-        Reads the email addresses of the recipients from a configuration file.
+        Reads the email addresses of the recipients from the resource registry.
+        The addresses are cached until the registry reloads the recipients file.
 
         Returns:
             Iterable[str]: An iterable object of recipient email addresses.
         """
-        recipients_file_path = Path(__file__).parents[2] / Path(
-            f"resources/email/recipients/{self._recipient_group}.json"
+        recipients = get_resource_registry().get(
+            f"email/recipients/{self._recipient_group}.json"
         )
 
-        with open(recipients_file_path, "r") as in_:
-            recipients = json.load(in_)
+        with self._recipients_lock:
+            if self._recipients_cache and self._recipients_cache[0] is recipients:
+                return iter(self._recipients_cache[1])
+
+            recipient_emails = [recipients[id]["email"] for id in recipients]
+            self._recipients_cache = (recipients, recipient_emails)
+            return iter(recipient_emails)
+
+    def _send_bulk(
+        self,
+        recipient_emails: List[str],
+        alert_type: str,
+        template_data: Dict[str, str],
+    ) -> List[str]:
+        """
+        Sends bulk templated emails to the recipients, in batches of the maximum
+        number of destinations SES accepts per request.
+
+        Args:
+            recipient_emails (List[str]): The recipients' email addresses.
+            alert_type (str): The type of the alert (used to select the email template).
+            template_data (Dict[str, str]): The data to use in the template.
+
+        Returns:
+            List[str]: The email addresses of the recipients the email failed for.
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        failed = []
+
+        for i in range(0, len(recipient_emails), self._bulk_batch_size):
+            batch = recipient_emails[i : i + self._bulk_batch_size]
+            try:
+                response = self._get_ses_client().send_bulk_templated_email(
+                    Source=self._read_sender(),
+                    Template=alert_type,
+                    DefaultTemplateData=json.dumps(template_data),
+                    Destinations=[
+                        {"Destination": {"ToAddresses": [recipient_email]}}
+                        for recipient_email in batch
+                    ],
+                )
+            except (BotoCoreError, ClientError) as e:
+                print(e)
+                failed.extend(batch)
+                continue
+
+            for recipient_email, status in zip(batch, response["Status"]):
+                if status["Status"] != "Success":
+                    failed.append(recipient_email)
 
-        return (recipients[id]["email"] for id in recipients)
+        return failed
+
+    def _send_parallel(
+        self,
+        recipient_emails: List[str],
+        alert_type: str,
+        template_data: Dict[str, str],
+    ) -> None:
+        """
+        Sends single emails to the recipients in parallel, from the thread pool.
+
+        Args:
+            recipient_emails (List[str]): The recipients' email addresses.
+            alert_type (str): The type of the alert (used to select the email template).
+            template_data (Dict[str, str]): The data to use in the template.
+        """
+        futures = [
+            self._executor.submit(
+                self.send_email, recipient_email, alert_type, template_data
+            )
+            for recipient_email in recipient_emails
+        ]
+        for future in futures:
+            future.result()
 
     def send_email(
         self, recipient_email: str, alert_type: str, template_data: Dict[str, str]
-    ) -> None:
+    ) -> bool:
         """
         Sends an email using a specified template and data.
 
@@ -86,16 +206,24 @@ class Mailer:
             recipient_email (str): The recipient's email address.
             alert_type (str): The type of the alert (used to select the email template).
             template_data (Dict[str, str]): The data to use in the template.
+
+        Returns:
+            bool: True if the email was sent, False if SES returned an error or
+                the request could not be made.
         """
+        from botocore.exceptions import BotoCoreError, ClientError
+
         try:
-            self._ses_client.send_templated_email(
-                Source=self._sender,
+            self._get_ses_client().send_templated_email(
+                Source=self._read_sender(),
                 Destination={"ToAddresses": [recipient_email]},
                 Template=alert_type,
-                TemplateData=template_data,
+                TemplateData=json.dumps(template_data),
             )
-        except ClientError as e:
-            print(e.response["Error"]["Message"])
+        except (BotoCoreError, ClientError) as e:
+            print(e)
+            return False
+        return True
 
     def send_to_all(
         self,
@@ -108,7 +236,9 @@ class Mailer:
         time: str,
     ) -> None:
         """
-        Sends an email alert to all the recipients in the recipient group.
+        Sends an email alert to all the recipients in the recipient group. The time
+        it took until the last recipient was sent the alert is stored in
+        `last_dispatch_duration`.
 
         Args:
             alert_type (str): The type of the alert (used to select the email template).
@@ -119,7 +249,8 @@ class Mailer:
             price (str): The price of the product.
             time (str): The time of the alert.
         """
-        recipient_emails = self._read_recipients()
+        start_time = perf_counter()
+        recipient_emails = list(self._read_recipients())
 
         template_data = {
             "product": product,
@@ -130,5 +261,15 @@ class Mailer:
             "time": time,
         }
 
-        for recipient_email in recipient_emails:
-            self.send_email(recipient_email, alert_type, template_data)
+        with span("mail_send", retailer, product):
+            if self._bulk:
+                recipient_emails = self._send_bulk(
+                    recipient_emails, alert_type, template_data
+                )
+            self._send_parallel(recipient_emails, alert_type, template_data)
+
+        self.last_dispatch_duration = perf_counter() - start_time
+        print(
+            f"Sent {alert_type} for {name} to all recipients in"
+            + f" {self.last_dispatch_duration:.3f} s."
+        )
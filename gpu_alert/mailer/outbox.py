@@ -0,0 +1,297 @@
+import functools
+import json
+import random
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Dict, Optional, Set
+
+from gpu_alert.metrics import span
+
+from .mailer import Mailer
+
+
+class Outbox:
+    """
+    An object of `Outbox` queues alert emails in an SQLite database and sends
+    them in the background, so that polling never waits on email delivery and
+    queued alerts survive restarts. Every queued email has an idempotency key,
+    an alert queued twice under the same key is only sent once. Emails that
+    fail, e.g. because SES is throttling, are retried with exponential backoff.
+
+    Attributes:
+        _mailer -- the interface to AWS SES used to send the queued emails.
+        _max_attempts -- the number of attempts after which an email is given up.
+        _base_delay -- the delay in seconds before the first retry of an email.
+        _max_delay -- the maximum delay in seconds between two retries.
+        _connection -- the connection to the outbox database.
+        _lock -- a lock guarding `_connection` and `_in_flight`.
+        _in_flight -- the idempotency keys of the emails being sent.
+        _executor -- the thread pool emails are sent from.
+        _wake_event -- set to wake the sender thread when an email is queued.
+        _stop_event -- set to stop the sender thread.
+        _sender_thread -- the background thread sending queued emails.
+
+    Methods:
+        __init__
+        _get_outbox_path
+        _create_tables
+        _generate_retry_delay
+        _send
+        _complete
+        _dispatch_due
+        _run
+        enqueue
+        count_pending
+        close
+    """
+
+    def __init__(
+        self,
+        mailer: Mailer,
+        path: Optional[Path] = None,
+        max_workers: int = 4,
+        max_attempts: int = 10,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+    ) -> None:
+        """
+        Initialize the Outbox object and start sending queued emails, including
+        the ones left over from a previous run.
+
+        Args:
+            mailer (Mailer): The interface to AWS SES used to send the queued emails.
+            path (Path): The path of the outbox database. Defaults to a database
+                per recipient group in the email resources.
+            max_workers (int): The maximum number of emails to send at once.
+            max_attempts (int): The number of attempts after which an email is given up.
+            base_delay (float): The delay in seconds before the first retry of an email.
+            max_delay (float): The maximum delay in seconds between two retries.
+        """
+        self._mailer = mailer
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+
+        path = path if path else self._get_outbox_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = Lock()
+        self._in_flight: Set[str] = set()
+        self._create_tables()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="outbox"
+        )
+        self._wake_event = Event()
+        self._stop_event = Event()
+        self._sender_thread = Thread(target=self._run, name="outbox", daemon=True)
+        self._sender_thread.start()
+
+    def _get_outbox_path(self) -> Path:
+        """
+        Returns the default path of the outbox database.
+
+        Returns:
+            Path: The path of the outbox database.
+        """
+        return Path(__file__).parents[2] / Path(
+            f"resources/email/outbox/{self._mailer._recipient_group}.sqlite3"
+        )
+
+    def _create_tables(self) -> None:
+        """
+        Creates the table of queued emails, if it does not exist yet.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    idempotency_key TEXT PRIMARY KEY,
+                    recipient TEXT NOT NULL,
+                    alert_type TEXT NOT NULL,
+                    template_data TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL,
+                    created REAL NOT NULL
+                )
+                """)
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_due"
+                + " ON outbox (status, next_attempt)"
+            )
+
+    def _generate_retry_delay(self, attempts: int) -> float:
+        """
+        Generate the delay before the next attempt to send an email, growing
+        exponentially with the number of failed attempts, with full jitter.
+
+        Args:
+            attempts (int): The number of failed attempts so far.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        return random.uniform(
+            0, min(self._max_delay, self._base_delay * 2 ** (attempts - 1))
+        )
+
+    def _send(self, recipient: str, alert_type: str, template_data: str) -> bool:
+        """
+        Sends a single queued email.
+
+        Args:
+            recipient (str): The recipient's email address.
+            alert_type (str): The type of the alert (used to select the email template).
+            template_data (str): The data to use in the template, as JSON.
+
+        Returns:
+            bool: True if the email was sent, False otherwise.
+        """
+        template = json.loads(template_data)
+        with span(
+            "mail_send", template.get("retailer", ""), template.get("product", "")
+        ):
+            return self._mailer.send_email(recipient, alert_type, template)
+
+    def _complete(self, idempotency_key: str, attempts: int, future: Future) -> None:
+        """
+        Records the outcome of an attempt to send an email, scheduling a retry
+        if it failed.
+
+        Args:
+            idempotency_key (str): The idempotency key of the email.
+            attempts (int): The number of attempts including this one.
+            future (Future): The future of the attempt.
+        """
+        try:
+            sent = future.result()
+        except Exception as e:
+            print(f"Error sending queued email {idempotency_key}:")
+            print(e)
+            sent = False
+
+        if sent:
+            status, next_attempt = "sent", 0.0
+        elif attempts >= self._max_attempts:
+            print(f"Giving up on queued email {idempotency_key}.")
+            status, next_attempt = "failed", 0.0
+        else:
+            status = "pending"
+            next_attempt = time.time() + self._generate_retry_delay(attempts)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?"
+                + " WHERE idempotency_key = ?",
+                (status, attempts, next_attempt, idempotency_key),
+            )
+            self._in_flight.discard(idempotency_key)
+        self._wake_event.set()
+
+    def _dispatch_due(self) -> Optional[float]:
+        """
+        Submits all queued emails that are due to the thread pool.
+
+        Returns:
+            float: The time of the next attempt that is not due yet, or None if
+                there is none.
+        """
+        now = time.time()
+        with self._lock:
+            due = self._connection.execute(
+                "SELECT idempotency_key, recipient, alert_type, template_data,"
+                + " attempts FROM outbox WHERE status = 'pending'"
+                + " AND next_attempt <= ? ORDER BY next_attempt",
+                (now,),
+            ).fetchall()
+            next_attempt = self._connection.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'"
+                + " AND next_attempt > ?",
+                (now,),
+            ).fetchone()[0]
+
+            due = [row for row in due if row[0] not in self._in_flight]
+            self._in_flight.update(row[0] for row in due)
+
+        for idempotency_key, recipient, alert_type, template_data, attempts in due:
+            future = self._executor.submit(
+                self._send, recipient, alert_type, template_data
+            )
+            future.add_done_callback(
+                functools.partial(self._complete, idempotency_key, attempts + 1)
+            )
+
+        return next_attempt
+
+    def _run(self) -> None:
+        """
+        Sends queued emails as they become due, until stopped.
+        """
+        while not self._stop_event.is_set():
+            next_attempt = self._dispatch_due()
+            timeout = max(0.0, next_attempt - time.time()) if next_attempt else None
+            self._wake_event.wait(timeout)
+            self._wake_event.clear()
+
+    def enqueue(
+        self, idempotency_key: str, alert_type: str, template_data: Dict[str, str]
+    ) -> None:
+        """
+        Queues an alert email to every recipient in the mailer's recipient group.
+        Recipients that were already queued the alert under the same idempotency
+        key are skipped.
+
+        Args:
+            idempotency_key (str): A key identifying the alert.
+            alert_type (str): The type of the alert (used to select the email template).
+            template_data (Dict[str, str]): The data to use in the template.
+        """
+        now = time.time()
+        rows = [
+            (
+                f"{idempotency_key}/{recipient_email}",
+                recipient_email,
+                alert_type,
+                json.dumps(template_data),
+                now,
+                now,
+            )
+            for recipient_email in self._mailer._read_recipients()
+        ]
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, recipient,"
+                + " alert_type, template_data, next_attempt, created)"
+                + " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._wake_event.set()
+
+    def count_pending(self) -> int:
+        """
+        Returns the number of queued emails that were not sent yet.
+
+        Returns:
+            int: The number of pending emails.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Stops the sender thread and waits for the emails being sent. Emails that
+        are still queued are sent after the next start.
+        """
+        self._stop_event.set()
+        self._wake_event.set()
+        self._sender_thread.join()
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._connection.close()
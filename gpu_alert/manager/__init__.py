@@ -1,3 +1,5 @@
 from .manager import Manager
+from .scheduler import PollScheduler
+from .sharded_runner import AlertForwarder, ShardedRunner
 
-__all__ = ["Manager"]
+__all__ = ["AlertForwarder", "Manager", "PollScheduler", "ShardedRunner"]
@@ -1,12 +1,22 @@
-import json
+import asyncio
+import random
 import time
+from concurrent.futures import Executor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-import numpy
+from gpu_alert.coordination import LeaseBackend, LeaseCoordinator
+from gpu_alert.mailer import Mailer, Outbox
+from gpu_alert.metrics import MetricsServer, Profiler, get_registry
+from gpu_alert.product import WatcherPool
+from gpu_alert.resources import get_resource_registry
+from gpu_alert.search import Search, SpecSearch
+from gpu_alert.session import RateLimiter, SessionManager
+from gpu_alert.spec import RetailerSpec
+from gpu_alert.store import ProfileStore, SQLiteProfileStore
 
-from gpu_alert.mailer import Mailer
-from gpu_alert.search import Search, SearchRetailerA
+from .scheduler import PollScheduler
 
 
 class Manager:
@@ -18,75 +28,520 @@ class Manager:
     specified retailers, initialised with the target products
     and continuously updates them.
 
+    The resources the searches are configured from are watched for changes
+    while running. Searches are added and removed as the alert profile is
+    edited, and a search whose request file or retailer spec was edited is
+    reconfigured, while all other searches keep running with their sessions.
+
     Attributes:
         _alert_profile_name -- the name of the alert profile to use.
+        _alerts -- the entries of the alert profile to search for, if not all.
         _mailer -- an interface to AWS SES used to send alert emails.
+        _watcher_pool -- runs product watchers in the background, shared by
+            all searches.
+        _profile_store -- reads and writes the profiles of all searches,
+            batching writes.
+        _outbox -- queues the alert emails of all searches and sends them in
+            the background.
+        _rate_limiter -- admits the requests to each retailer host at a limited
+            rate, shared by the session managers of all vendors.
+        _session_managers -- a dict mapping each vendor to the session manager
+            shared by all of its searches.
+        _session_managers_lock -- a lock guarding `_session_managers`.
         _searches -- a list of Alert objects to continuously update.
+        _metrics_server -- serves the stage latencies and error counts for
+            Prometheus, if enabled.
+        _profiler -- profiles the program for a bounded window when the process
+            receives SIGUSR1.
+        _scheduler -- decides when each search is updated next, within the
+            request budget of its vendor.
+        _coordinator -- shares the searches with the other nodes running the same
+            alert profile, if set.
+        _resource_registry -- serves the resources of the searches and watches
+            them for changes.
+        _reload_interval -- the time in seconds between two checks of the
+            resources for changes.
+        _changed_resources -- the names of the resources that changed since the
+            searches were last reconfigured.
+        _changed_resources_lock -- a lock guarding `_changed_resources`.
 
     Methods:
         __init__
+        _get_session_manager
+        _read_alert_profile
+        _create_search
         _create_searches
+        _on_resources_changed
+        _apply_resource_changes
+        _close
+        _get_lease_delay
         _generate_time_interval
+        _generate_search_interval
+        _poll_search
+        _watch_resources
+        _run_concurrently
         auto_update
+        auto_update_concurrent
     """
 
-    def __init__(self, alert_profile_name: str) -> None:
+    def __init__(
+        self,
+        alert_profile_name: str,
+        max_watchers: int = 4,
+        flush_interval: float = 30.0,
+        metrics_port: Optional[int] = None,
+        alerts: Optional[List[Dict[str, Any]]] = None,
+        outbox: Optional[Outbox] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        lease_backend: Optional[LeaseBackend] = None,
+        profile_store: Optional[ProfileStore] = None,
+        reload_interval: float = 5.0,
+    ) -> None:
         """
         Initialize a Manager object.
 
         Args:
             alert_profile_name (str): The name of the alert profile to use.
+            max_watchers (int): The maximum number of product watchers to run
+                at once across all searches.
+            flush_interval (float): The time in seconds between two writes of
+                changed profiles to the file system.
+            metrics_port (int): The local port to serve metrics for Prometheus on,
+                at `/metrics`. Metrics are not served if omitted.
+            alerts (List[Dict[str, Any]]): The entries of the alert profile to search
+                for. Defaults to all entries of the alert profile.
+            outbox (Outbox): Queues the alert emails of all searches. Defaults to an
+                outbox sending them with the manager's own mailer.
+            rate_limiter (RateLimiter): Admits the requests to each retailer host.
+                Defaults to a rate limiter with the default rates.
+            lease_backend (LeaseBackend): Stores the leases of the nodes running the
+                same alert profile. If set, this node only updates the searches
+                it holds a lease on, and alerts for a stock transition only if no
+                other node did. Every search is updated by this node if omitted.
+            profile_store (ProfileStore): Reads and writes the profiles of all
+                searches. Defaults to the JSON profiles, flushed at the flush
+                interval.
+            reload_interval (float): The time in seconds between two checks of
+                the alert profile and the request files and specs of the searches
+                for changes.
 
         Returns:
             None
         """
         self._alert_profile_name = alert_profile_name
+        self._alerts = alerts
         self._mailer = Mailer("me")
+        self._watcher_pool = WatcherPool(max_watchers)
+        self._profile_store = (
+            profile_store if profile_store else ProfileStore(flush_interval)
+        )
+        self._outbox = outbox if outbox is not None else Outbox(self._mailer)
+        self._rate_limiter = rate_limiter if rate_limiter else RateLimiter()
+        self._session_managers: Dict[str, SessionManager] = dict()
+        self._session_managers_lock = Lock()
+        self._metrics_server = (
+            MetricsServer(get_registry(), metrics_port)
+            if metrics_port is not None
+            else None
+        )
+        self._profiler = Profiler(
+            Path(__file__).parents[2] / Path("resources/profiles")
+        )
+        self._profiler.install_signal_handler()
+        self._coordinator = (
+            LeaseCoordinator(lease_backend) if lease_backend is not None else None
+        )
+        self._resource_registry = get_resource_registry()
+        self._reload_interval = reload_interval
+        self._changed_resources: Set[str] = set()
+        self._changed_resources_lock = Lock()
         self._searches = self._create_searches()
+        if self._coordinator is not None:
+            self._coordinator.start(search.key for search in self._searches)
+        self._scheduler = PollScheduler(
+            self._generate_search_interval, self._generate_time_interval
+        )
+        self._resource_registry.subscribe(self._on_resources_changed)
+        self._resource_registry.watch(reload_interval)
+
+    def _get_session_manager(self, vendor: str) -> SessionManager:
+        """
+        Get the session manager shared by all searches of a vendor, creating it
+        on first use.
+
+        Args:
+            vendor (str): The name of the vendor.
+
+        Returns:
+            SessionManager: The session manager of the vendor.
+        """
+        with self._session_managers_lock:
+            if vendor not in self._session_managers:
+                self._session_managers[vendor] = SessionManager(
+                    vendor,
+                    snapshot_path=Path(__file__).parents[2]
+                    / Path(f"resources/sessions/{vendor}.json"),
+                    rate_limiter=self._rate_limiter,
+                )
+            return self._session_managers[vendor]
+
+    @staticmethod
+    def _read_alert_profile(alert_profile_name: str) -> List[Dict[str, Any]]:
+        """
+        Read the entries of an alert profile from the resource registry.
+
+        Args:
+            alert_profile_name (str): The name of the alert profile.
+
+        Returns:
+            List[Dict[str, Any]]: The entries, each holding the names of the vendor,
+                or an alias of it, and the product.
+        """
+        return get_resource_registry().get(f"alert_profiles/{alert_profile_name}.json")
+
+    def _create_search(self, alert: Dict[str, Any]) -> Search:
+        """
+        Create a search for a single entry of the alert profile.
+
+        Args:
+            alert (Dict[str, Any]): The entry of the alert profile, holding the names
+                of the vendor, or an alias of it, and the product.
+
+        Returns:
+            Search: The Search object.
+        """
+        # The vendor may be given by an alias of the retailer
+        vendor = RetailerSpec.find(alert["vendor"]).vendor
+
+        return SpecSearch(
+            vendor,
+            alert["product"],
+            self._mailer,
+            watcher_pool=self._watcher_pool,
+            profile_store=self._profile_store,
+            outbox=self._outbox,
+            session_manager=self._get_session_manager(vendor),
+            coordinator=self._coordinator,
+        )
 
     def _create_searches(self) -> List[Search]:
         """
         Create searches for the specified retailers, initialized with the target products.
+        The searches are created concurrently.
 
         Returns:
             List[Search]: A list of Search objects.
         """
-        alert_profile_path = Path(__file__).parents[2] / Path(
-            f"resources/alert_profiles/{self._alert_profile_name}.json"
+        alerts = (
+            self._alerts
+            if self._alerts is not None
+            else self._read_alert_profile(self._alert_profile_name)
         )
-        vendor_class_map = {"alternate": SearchRetailerA}
 
-        with open(alert_profile_path, "r") as alert_profile:
-            self._searches = [
-                vendor_class_map[alert["vendor"]](alert["product"], self._mailer)
-                for alert in json.load(alert_profile)
-            ]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(alerts), 8))) as executor:
+            self._searches = list(executor.map(self._create_search, alerts))
         return self._searches
 
+    def _on_resources_changed(self, names: Set[str]) -> None:
+        """
+        Record resources that changed, to reconfigure the searches using them
+        from the update loop. Called from the thread of the resource registry.
+
+        Args:
+            names (Set[str]): The names of the resources that changed.
+
+        Returns:
+            None
+        """
+        with self._changed_resources_lock:
+            self._changed_resources.update(names)
+
+    def _apply_resource_changes(self) -> Tuple[List[Search], List[Search]]:
+        """
+        Reconfigure the searches using the resources that changed since the last
+        call. If the alert profile changed, searches are created for its new
+        entries and the searches of its removed entries are dropped, the others
+        are kept as they are. A search that can not be created is reported and
+        left out.
+
+        Returns:
+            Tuple[List[Search], List[Search]]: The searches added and removed.
+        """
+        with self._changed_resources_lock:
+            changed, self._changed_resources = self._changed_resources, set()
+        if not changed:
+            return [], []
+
+        added: List[Search] = []
+        removed: List[Search] = []
+        alert_profile = f"alert_profiles/{self._alert_profile_name}.json"
+        if self._alerts is None and alert_profile in changed:
+            searches = {search.key: search for search in self._searches}
+            alerts: Dict[str, Dict[str, Any]] = dict()
+            for alert in self._read_alert_profile(self._alert_profile_name):
+                try:
+                    # The vendor may be given by an alias of the retailer
+                    vendor = RetailerSpec.find(alert["vendor"]).vendor
+                    key = f"{vendor}/{alert['product']}"
+                    if key not in searches and key not in alerts:
+                        added.append(self._create_search(alert))
+                    alerts[key] = alert
+                except Exception as e:
+                    print(f"Error adding search for {alert}:")
+                    print(e)
+
+            removed = [s for key, s in searches.items() if key not in alerts]
+            self._searches = [s for s in self._searches if s not in removed] + added
+            if self._coordinator is not None and (added or removed):
+                self._coordinator.set_partitions(s.key for s in self._searches)
+
+        for search in self._searches:
+            if search not in added and search.resources & changed:
+                search.reconfigure()
+        return added, removed
+
+    def _close(self) -> None:
+        """
+        Stop the product watchers, write pending profile changes, stop sending
+        queued alert emails, close the sessions, stop serving metrics, end a
+        running profile and release the leases of this node. Queued alert emails
+        that were not sent yet are sent after the next start.
+
+        Returns:
+            None
+        """
+        self._resource_registry.unsubscribe(self._on_resources_changed)
+        self._watcher_pool.shutdown(wait=False)
+        self._profile_store.close()
+        self._outbox.close()
+        for session_manager in self._session_managers.values():
+            session_manager.close()
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+        self._profiler.stop()
+        if self._coordinator is not None:
+            self._coordinator.close()
+
+    def _get_lease_delay(self, search: Search) -> float:
+        """
+        Get the time until a search leased to another node is checked again. If
+        the searches are shared with other nodes, this node only updates the
+        searches it holds the lease on.
+
+        Args:
+            search (Search): The Search object.
+
+        Returns:
+            float: The time in seconds until the next renewal of the leases, or 0
+                if this node is to update the search.
+        """
+        if self._coordinator is None or self._coordinator.holds(search.key):
+            return 0.0
+        return self._coordinator.get_renew_interval()
+
     def _generate_time_interval(self) -> float:
         """
         Generate a pseudorandom time interval between requests to scrape a bit more ethically.
+        Used by the scheduler as the minimum time between two requests to the same
+        vendor, which keeps the request volume of the fixed-interval loop.
 
         Returns:
             float: The generated time interval.
         """
-        time_interval = numpy.random.uniform(0, 30)
-        time_interval += numpy.random.normal(30, 7)
-        return 5 + (abs(time_interval) / len(self._searches))
+        time_interval = random.uniform(0, 30)
+        time_interval += random.gauss(30, 7)
+        # An alert profile may be emptied by an edit while the program runs
+        return 5 + (abs(time_interval) / max(1, len(self._searches)))
 
     def auto_update(self) -> None:
         """
-        Continuously update the Search objects with a pseudorandom delay between updates.
+        Continuously update the Search objects, each when it is due according to
+        the scheduler. Searches whose product data changes often, that have target
+        products or that did not fail recently are updated more often, while the
+        requests to each vendor are spaced as they were with a fixed interval.
+        Changes of the resources of the searches are applied between two updates,
+        and removed searches are closed.
+        Pending profile changes are written when the loop is interrupted.
+
+        Returns:
+            None
+        """
+        for search in self._searches:
+            self._scheduler.add(search)
+
+        try:
+            while True:
+                added, removed = self._apply_resource_changes()
+                for search in added:
+                    self._scheduler.add(search)
+                for search in removed:
+                    search.close()
+
+                # Wait for searches to be added while the alert profile is empty
+                if not self._scheduler:
+                    time.sleep(self._reload_interval)
+                    continue
+
+                search, due = self._scheduler.pop()
+                # Removed searches are dropped from the queue when they are due
+                if search not in self._searches:
+                    continue
+                time.sleep(max(0.0, due - time.time()))
+
+                # Searches leased to other nodes are checked again after renewal
+                lease_delay = self._get_lease_delay(search)
+                if lease_delay:
+                    self._scheduler.push(search, time.time() + lease_delay)
+                    continue
+
+                # Let other vendors' searches go first while over budget
+                budget_delay = self._scheduler.get_budget_delay(search.vendor)
+                if budget_delay:
+                    self._scheduler.push(search, time.time() + budget_delay)
+                    continue
+
+                self._scheduler.consume_budget(search.vendor)
+                self._scheduler.record(search, search.update())
+                self._scheduler.push(search)
+        finally:
+            self._close()
+
+    def _generate_search_interval(self) -> float:
+        """
+        Generate a pseudorandom time interval between two updates of the same
+        search, before the scheduler adapts it to the search. Unlike
+        `_generate_time_interval`, the interval does not depend on the number of
+        searches, as each search keeps its own cadence.
+
+        Returns:
+            float: The generated time interval.
+        """
+        time_interval = random.uniform(0, 30)
+        time_interval += random.gauss(30, 7)
+        return 5 + abs(time_interval)
+
+    async def _poll_search(self, search: Search, executor: Executor) -> None:
+        """
+        Continuously update a single Search object with the adaptive interval of
+        the scheduler, within the request budget of its vendor. The blocking
+        update is run in the given executor so that other searches are not held
+        up by it.
+
+        Args:
+            search (Search): The Search object to update.
+            executor (Executor): The executor to run the blocking update in.
 
         Returns:
             None
         """
+        loop = asyncio.get_running_loop()
+
+        # Stagger the first update so that the searches do not fire in lockstep
+        await asyncio.sleep(random.uniform(0, self._scheduler.get_interval(search)))
+
+        while True:
+            lease_delay = self._get_lease_delay(search)
+            while lease_delay:
+                await asyncio.sleep(lease_delay)
+                lease_delay = self._get_lease_delay(search)
+
+            budget_delay = self._scheduler.get_budget_delay(search.vendor)
+            while budget_delay:
+                await asyncio.sleep(budget_delay)
+                budget_delay = self._scheduler.get_budget_delay(search.vendor)
+            self._scheduler.consume_budget(search.vendor)
+
+            try:
+                changed = await loop.run_in_executor(executor, search.update)
+            except Exception as e:
+                print("Unhandled error while updating search:")
+                print(e)
+                changed = False
+            self._scheduler.record(search, changed)
+            await asyncio.sleep(self._scheduler.get_interval(search))
+
+    async def _watch_resources(
+        self,
+        tasks: Dict[Search, "asyncio.Task[None]"],
+        executors: Dict[Search, ThreadPoolExecutor],
+    ) -> None:
+        """
+        Continuously apply the changes of the resources of the searches, starting
+        a task for every search added and cancelling the task of every search
+        removed, which is closed. The other tasks keep running. The searches added at once share
+        a new executor with a thread for each of them, which is shut down once
+        they are all removed again.
+
+        Args:
+            tasks (Dict[Search, asyncio.Task]): The task polling each search.
+            executors (Dict[Search, ThreadPoolExecutor]): The executor each
+                search's blocking updates are run in.
+
+        Returns:
+            None
+        """
+        loop = asyncio.get_running_loop()
         while True:
-            for search in self._searches:
-                search.update()
-                time.sleep(self._generate_time_interval())
+            await asyncio.sleep(self._reload_interval)
+            # Creating searches reads their profiles, off the event loop
+            added, removed = await loop.run_in_executor(
+                None, self._apply_resource_changes
+            )
+            for search in removed:
+                tasks.pop(search).cancel()
+                search.close()
+                executor = executors.pop(search)
+                if executor not in executors.values():
+                    executor.shutdown(wait=False)
+            if added:
+                executor = ThreadPoolExecutor(max_workers=len(added))
+                for search in added:
+                    executors[search] = executor
+                    tasks[search] = asyncio.create_task(
+                        self._poll_search(search, executor)
+                    )
+
+    async def _run_concurrently(self) -> None:
+        """
+        Schedule every Search object as its own task and run them concurrently,
+        adding and removing tasks as the resources of the searches change.
+        Every search has a thread to run its blocking updates in.
+
+        Returns:
+            None
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self._searches)))
+        executors = {search: executor for search in self._searches}
+        tasks = {
+            search: asyncio.create_task(self._poll_search(search, executor))
+            for search in self._searches
+        }
+        try:
+            await self._watch_resources(tasks, executors)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            # The initial executor is kept if its searches were all removed
+            for executor in {executor, *executors.values()}:
+                executor.shutdown()
+
+    def auto_update_concurrent(self) -> None:
+        """
+        Continuously update the Search objects concurrently, each with its own
+        pseudorandom delay between updates. An alternative to `auto_update`, in
+        which adding products does not stretch the update interval of the others.
+        Pending profile changes are written when the loop is interrupted.
+
+        Returns:
+            None
+        """
+        try:
+            asyncio.run(self._run_concurrently())
+        finally:
+            self._close()
 
 
 if __name__ == "__main__":
-    alert_manager = Manager("me")
+    alert_manager = Manager("me", metrics_port=9108, profile_store=SQLiteProfileStore())
     alert_manager.auto_update()
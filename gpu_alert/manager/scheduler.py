@@ -0,0 +1,209 @@
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from gpu_alert.search import Search
+
+
+class PollScheduler:
+    """
+    A `PollScheduler` decides when each `Search` object is updated next. The
+    searches are kept in a priority queue keyed by the time their next update
+    is due. The interval between two updates of a search adapts to how often
+    its product data changed recently, to whether it has target products and
+    to recent failures, so that hot targets are updated more often than
+    products that never change.
+
+    Independently of the intervals, the updates of the searches of each vendor
+    are spaced so that the overall request volume to a vendor stays within a
+    budget, i.e. the rate of requests the fixed-interval loop used to make.
+
+    Attributes:
+        _base_interval -- generates the pseudorandom base interval of a search.
+        _vendor_spacing -- generates the pseudorandom minimum time between two
+            requests to the same vendor.
+        _max_interval -- the maximum interval between two updates of a search.
+        _heap -- the priority queue of (due time, sequence number, search).
+        _counter -- generates the sequence numbers breaking ties in the queue.
+        _change_rates -- a dict mapping each search to an exponentially weighted
+            moving average of how often its product data changed.
+        _next_request -- a dict mapping each vendor to the earliest time the
+            next request to it fits within its budget.
+
+    Methods:
+        __init__
+        _get_change_factor
+        _get_priority_factor
+        _get_failure_factor
+        get_interval
+        __len__
+        add
+        pop
+        push
+        get_budget_delay
+        consume_budget
+        record
+    """
+
+    # The weight of the latest update in the moving average of the change rate
+    _change_rate_weight = 0.3
+
+    def __init__(
+        self,
+        base_interval: Callable[[], float],
+        vendor_spacing: Callable[[], float],
+        max_interval: float = 600.0,
+    ) -> None:
+        """
+        Initializes the PollScheduler object.
+
+        Args:
+            base_interval (Callable[[], float]): Generates the pseudorandom base
+                interval of a search.
+            vendor_spacing (Callable[[], float]): Generates the pseudorandom minimum
+                time between two requests to the same vendor.
+            max_interval (float): The maximum interval between two updates of a search.
+        """
+        self._base_interval = base_interval
+        self._vendor_spacing = vendor_spacing
+        self._max_interval = max_interval
+        self._heap: List[Tuple[float, int, Search]] = []
+        self._counter = itertools.count()
+        self._change_rates: Dict[Search, float] = dict()
+        self._next_request: Dict[str, float] = dict()
+
+    def _get_change_factor(self, search: Search) -> float:
+        """
+        Returns the factor scaling the interval of a search by how often its
+        product data changed recently, from 0.5 for a search whose data changes
+        on every update to 2 for a search whose data never changes.
+
+        Args:
+            search (Search): The Search object.
+
+        Returns:
+            float: The factor.
+        """
+        return 2 ** (1 - 2 * self._change_rates.get(search, 0.5))
+
+    def _get_priority_factor(self, search: Search) -> float:
+        """
+        Returns the factor scaling the interval of a search by the priority of
+        its target products, 0.5 for targets of the highest priority (1), rising
+        towards 1 for lower priorities, and 1 for searches without targets.
+
+        Args:
+            search (Search): The Search object.
+
+        Returns:
+            float: The factor.
+        """
+        if search.target_priority is None:
+            return 1.0
+        return 1 - 0.5 / max(1, search.target_priority)
+
+    def _get_failure_factor(self, search: Search) -> float:
+        """
+        Returns the factor backing off a search after consecutive failures.
+
+        Args:
+            search (Search): The Search object.
+
+        Returns:
+            float: The factor.
+        """
+        return 2.0 ** min(search.consecutive_failures, 4)
+
+    def get_interval(self, search: Search) -> float:
+        """
+        Generates the interval until the next update of a search.
+
+        Args:
+            search (Search): The Search object.
+
+        Returns:
+            float: The interval in seconds.
+        """
+        interval = self._base_interval()
+        interval *= self._get_change_factor(search)
+        interval *= self._get_priority_factor(search)
+        interval *= self._get_failure_factor(search)
+        return min(self._max_interval, interval)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of searches in the queue.
+
+        Returns:
+            int: The number of searches.
+        """
+        return len(self._heap)
+
+    def add(self, search: Search) -> None:
+        """
+        Adds a search to the queue, due at a pseudorandom time within its first
+        interval so that the searches do not start in lockstep.
+
+        Args:
+            search (Search): The Search object.
+        """
+        self.push(search, time.time() + self.get_interval(search) * 0.1)
+
+    def pop(self) -> Tuple[Search, float]:
+        """
+        Removes the search that is due first from the queue.
+
+        Returns:
+            Tuple[Search, float]: The search and the time its update is due.
+        """
+        due, _, search = heapq.heappop(self._heap)
+        return search, due
+
+    def push(self, search: Search, due: Optional[float] = None) -> None:
+        """
+        Adds a search to the queue.
+
+        Args:
+            search (Search): The Search object.
+            due (float): The time the next update is due. Defaults to one interval
+                from now.
+        """
+        if due is None:
+            due = time.time() + self.get_interval(search)
+        heapq.heappush(self._heap, (due, next(self._counter), search))
+
+    def get_budget_delay(self, vendor: str) -> float:
+        """
+        Returns the time to wait until the next request to a vendor fits within
+        its budget.
+
+        Args:
+            vendor (str): The name of the vendor.
+
+        Returns:
+            float: The time in seconds, 0 if a request can be made right away.
+        """
+        return max(0.0, self._next_request.get(vendor, 0.0) - time.time())
+
+    def consume_budget(self, vendor: str) -> None:
+        """
+        Records a request to a vendor, delaying the next one by the vendor spacing.
+
+        Args:
+            vendor (str): The name of the vendor.
+        """
+        self._next_request[vendor] = time.time() + self._vendor_spacing()
+
+    def record(self, search: Search, changed: bool) -> None:
+        """
+        Records the outcome of an update of a search.
+
+        Args:
+            search (Search): The Search object.
+            changed (bool): Whether the product data changed with the update.
+        """
+        change_rate = self._change_rates.get(search, 0.5)
+        self._change_rates[search] = (
+            1 - self._change_rate_weight
+        ) * change_rate + self._change_rate_weight * float(bool(changed))
@@ -0,0 +1,511 @@
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+import zlib
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from threading import Event, Thread
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from gpu_alert.mailer import Mailer, Outbox
+from gpu_alert.resources import get_resource_registry
+from gpu_alert.session import RateLimiter
+from gpu_alert.spec import RetailerSpec
+from gpu_alert.store import SQLiteProfileStore
+
+from .manager import Manager
+
+
+class AlertForwarder(Outbox):
+    """
+    An `AlertForwarder` takes the place of the outbox in a worker process of a
+    `ShardedRunner`. Alert emails are not queued in the worker but forwarded to
+    the coordinator process, which queues them in the single outbox sending
+    them with its mailer. Inherits from the Outbox class, without its database
+    and sender thread.
+
+    Attributes:
+        _alert_queue -- the queue the coordinator reads the alerts from.
+
+    Methods:
+        __init__
+        enqueue
+        count_pending
+        close
+    """
+
+    def __init__(self, alert_queue: Any) -> None:
+        """
+        Initializes the AlertForwarder object.
+
+        Args:
+            alert_queue (multiprocessing.Queue): The queue the coordinator reads
+                the alerts from.
+        """
+        self._alert_queue = alert_queue
+
+    def enqueue(
+        self, idempotency_key: str, alert_type: str, template_data: Dict[str, str]
+    ) -> None:
+        """
+        Forwards an alert email to the coordinator.
+
+        Args:
+            idempotency_key (str): A key identifying the alert.
+            alert_type (str): The type of the alert (used to select the email template).
+            template_data (Dict[str, str]): The data to use in the template.
+        """
+        self._alert_queue.put((idempotency_key, alert_type, template_data))
+
+    def count_pending(self) -> int:
+        """
+        Returns the number of queued emails that were not sent yet, always 0 as
+        the emails are queued by the coordinator.
+        """
+        return 0
+
+    def close(self) -> None:
+        """
+        Does nothing, the forwarded alerts are sent by the coordinator.
+        """
+        pass
+
+
+def _exit(*_: object) -> None:
+    """
+    Exits the worker process, running the cleanup of its manager.
+    """
+    sys.exit(0)
+
+
+def _run_shard(
+    alert_profile_name: str,
+    alerts: List[Dict[str, Any]],
+    alert_queue: Any,
+    max_watchers: int,
+    flush_interval: float,
+    rate_limits: Dict[str, Any],
+) -> None:
+    """
+    Runs the searches of one shard in a worker process until it is terminated.
+
+    Args:
+        alert_profile_name (str): The name of the alert profile.
+        alerts (List[Dict[str, Any]]): The entries of the alert profile in the shard.
+        alert_queue (multiprocessing.Queue): The queue to forward alerts to.
+        max_watchers (int): The maximum number of product watchers to run at once.
+        flush_interval (float): The time in seconds between two profile writes.
+        rate_limits (Dict[str, Any]): The "rate", "burst" and "host_limits" of
+            the rate limiter of the worker.
+    """
+    # The coordinator handles interrupts and terminates the workers, which write
+    # their pending profile changes on the way out
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _exit)
+
+    manager = Manager(
+        alert_profile_name,
+        max_watchers,
+        flush_interval,
+        alerts=alerts,
+        outbox=AlertForwarder(alert_queue),
+        rate_limiter=RateLimiter(**rate_limits),
+        profile_store=SQLiteProfileStore(flush_interval),
+    )
+    manager.auto_update()
+
+
+class ShardedRunner:
+    """
+    A `ShardedRunner` runs the searches of an alert profile in several worker
+    processes, so that parsing is not capped by the GIL of a single process. The
+    entries of the alert profile are split into shards by a hash of the vendor
+    and product, each shard is updated by a `Manager` in its own process. The
+    coordinator process supervises the workers, restarting crashed ones with
+    exponential backoff, and sends the alerts forwarded by all workers with a
+    single mailer and outbox.
+
+    The request rate and burst per retailer host are split evenly between the
+    workers, so that sharding does not multiply the load on the retailers.
+
+    The coordinator watches the alert profile. When it changes, the entries are
+    split into shards again, and only the workers whose entries changed are
+    restarted, as the workers do not reload the alert profile themselves. All
+    workers are restarted if the number of shards changes, as the share of the
+    rates of each worker changes with it.
+
+    Attributes:
+        _alert_profile_name -- the name of the alert profile to use.
+        _max_watchers -- the maximum number of product watchers per worker.
+        _flush_interval -- the time in seconds between two profile writes.
+        _rate_limits -- the "rate", "burst" and "host_limits" of the requests to
+            the retailer hosts, split between the workers.
+        _reload_interval -- the time in seconds between two checks of the alert
+            profile for changes.
+        _restart_delay -- the delay in seconds before restarting a crashed worker
+            for the first time.
+        _max_restart_delay -- the maximum delay in seconds before restarting a
+            crashed worker. A worker running for longer is considered healthy.
+        _context -- the multiprocessing context the workers are started in.
+        _mailer -- an interface to AWS SES used to send alert emails.
+        _outbox -- queues the alert emails of all workers and sends them.
+        _alert_queue -- the queue the workers forward alerts to.
+        _workers -- the number of shards the entries are split into.
+        _shards -- a list of the entries of the alert profile in each shard,
+            including empty shards, which have no worker.
+        _processes -- the worker process of each shard, if running.
+        _started -- the time each worker was last started.
+        _restarts -- the number of times each worker crashed in a row.
+        _restart_at -- the time each crashed worker is restarted at.
+        _stop_event -- set to stop the alert collector thread.
+        _collector_thread -- the thread queueing the forwarded alerts in the outbox.
+        _resource_registry -- the registry the alert profile is read from.
+        _profile_changed -- set when the alert profile changed.
+
+    Methods:
+        __init__
+        get_shard
+        _create_shards
+        _count_shards
+        _split_rate_limits
+        _start_worker
+        _generate_restart_delay
+        _supervise
+        _on_resources_changed
+        _reshard
+        _collect_alerts
+        _stop_workers
+        _close
+        run
+    """
+
+    def __init__(
+        self,
+        alert_profile_name: str,
+        workers: Optional[int] = None,
+        max_watchers: int = 4,
+        flush_interval: float = 30.0,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 60.0,
+        rate: float = 1.0,
+        burst: int = 5,
+        host_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        reload_interval: float = 5.0,
+    ) -> None:
+        """
+        Initializes the ShardedRunner object and splits the alert profile into shards.
+
+        Args:
+            alert_profile_name (str): The name of the alert profile to use.
+            workers (int): The number of worker processes. Defaults to the number
+                of CPUs.
+            max_watchers (int): The maximum number of product watchers per worker.
+            flush_interval (float): The time in seconds between two profile writes.
+            restart_delay (float): The delay in seconds before restarting a crashed
+                worker for the first time.
+            max_restart_delay (float): The maximum delay in seconds before restarting
+                a crashed worker.
+            rate (float): The default number of requests per second admitted per
+                host, across all workers.
+            burst (int): The default number of requests admitted at once per host,
+                across all workers.
+            host_limits (Dict[str, Dict[str, float]]): The "rate" and "burst" of
+                hosts tolerating more or fewer requests than the default.
+            reload_interval (float): The time in seconds between two checks of
+                the alert profile for changes.
+        """
+        self._alert_profile_name = alert_profile_name
+        self._max_watchers = max_watchers
+        self._flush_interval = flush_interval
+        self._restart_delay = restart_delay
+        self._max_restart_delay = max_restart_delay
+        self._rate_limits: Dict[str, Any] = {
+            "rate": rate,
+            "burst": burst,
+            "host_limits": host_limits if host_limits else dict(),
+        }
+        self._reload_interval = reload_interval
+
+        # Workers are spawned rather than forked, as the coordinator runs threads
+        self._context = multiprocessing.get_context("spawn")
+        self._mailer = Mailer("me")
+        self._outbox = Outbox(self._mailer)
+        self._alert_queue = self._context.Queue()
+
+        self._workers = workers or os.cpu_count() or 1
+        self._shards = self._create_shards(self._workers)
+        self._processes: List[Optional[BaseProcess]] = [None] * len(self._shards)
+        self._started = [0.0] * len(self._shards)
+        self._restarts = [0] * len(self._shards)
+        self._restart_at = [0.0] * len(self._shards)
+
+        self._stop_event = Event()
+        self._collector_thread = Thread(
+            target=self._collect_alerts, name="alert-collector", daemon=True
+        )
+        self._resource_registry = get_resource_registry()
+        self._profile_changed = Event()
+
+    @staticmethod
+    def get_shard(vendor: str, product: str, shards: int) -> int:
+        """
+        Returns the shard of a search. The hash is stable across processes and
+        runs, so a search stays in its shard, and its profile in one process.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+            shards (int): The number of shards.
+
+        Returns:
+            int: The index of the shard.
+        """
+        return zlib.crc32(f"{vendor}/{product}".encode()) % shards
+
+    def _create_shards(self, workers: int) -> List[List[Dict[str, Any]]]:
+        """
+        Splits the entries of the alert profile into shards. Each entry is in the
+        shard of its hash, so that an entry keeps its shard when others are
+        added or removed.
+
+        Args:
+            workers (int): The number of worker processes to split the entries between.
+
+        Returns:
+            List[List[Dict[str, Any]]]: The entries of the alert profile in each
+                shard, empty for shards without entries.
+        """
+        shards: List[List[Dict[str, Any]]] = [[] for _ in range(workers)]
+        for alert in Manager._read_alert_profile(self._alert_profile_name):
+            # Aliases of a vendor are resolved so that they share a shard
+            vendor = RetailerSpec.find(alert["vendor"]).vendor
+            shards[self.get_shard(vendor, alert["product"], workers)].append(alert)
+        return shards
+
+    def _count_shards(self) -> int:
+        """
+        Returns the number of shards with entries, i.e. of workers to run.
+
+        Returns:
+            int: The number of shards.
+        """
+        return sum(1 for shard in self._shards if shard)
+
+    def _split_rate_limits(self, parts: int) -> Dict[str, Any]:
+        """
+        Splits the rate limits between workers. The burst of each worker is at
+        least one request.
+
+        Args:
+            parts (int): The number of workers.
+
+        Returns:
+            Dict[str, Any]: The "rate", "burst" and "host_limits" of each worker.
+        """
+        rate, burst = self._rate_limits["rate"], self._rate_limits["burst"]
+        host_limits = {
+            host: {
+                "rate": limits.get("rate", rate) / parts,
+                "burst": max(1, int(limits.get("burst", burst)) // parts),
+            }
+            for host, limits in self._rate_limits["host_limits"].items()
+        }
+        return {
+            "rate": rate / parts,
+            "burst": max(1, burst // parts),
+            "host_limits": host_limits,
+        }
+
+    def _start_worker(self, shard: int) -> None:
+        """
+        Starts the worker process of a shard.
+
+        Args:
+            shard (int): The index of the shard.
+        """
+        process = self._context.Process(
+            target=_run_shard,
+            args=(
+                self._alert_profile_name,
+                self._shards[shard],
+                self._alert_queue,
+                self._max_watchers,
+                self._flush_interval,
+                self._split_rate_limits(self._count_shards()),
+            ),
+            name=f"shard-{shard}",
+        )
+        process.start()
+        self._processes[shard] = process
+        self._started[shard] = time.monotonic()
+
+    def _generate_restart_delay(self, restarts: int) -> float:
+        """
+        Generate the delay before restarting a worker, growing exponentially with
+        the number of times it crashed in a row.
+
+        Args:
+            restarts (int): The number of times the worker crashed in a row.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        return min(self._max_restart_delay, self._restart_delay * 2 ** (restarts - 1))
+
+    def _supervise(self) -> Optional[float]:
+        """
+        Schedules the restart of crashed workers and restarts the ones that are due.
+
+        Returns:
+            float: The time in seconds until the next restart is due, or None if
+                no worker is waiting to be restarted.
+        """
+        now = time.monotonic()
+        next_restart: Optional[float] = None
+        for shard, process in enumerate(self._processes):
+            if process is not None and not process.is_alive():
+                # A worker that ran for long enough before crashing was healthy
+                if now - self._started[shard] > self._max_restart_delay:
+                    self._restarts[shard] = 0
+                self._restarts[shard] += 1
+                delay = self._generate_restart_delay(self._restarts[shard])
+                print(
+                    f"Worker of shard {shard} exited with code {process.exitcode},"
+                    + f" restarting in {delay:.0f}s."
+                )
+                self._processes[shard] = None
+                self._restart_at[shard] = now + delay
+
+            if self._processes[shard] is None and self._shards[shard]:
+                if self._restart_at[shard] <= now:
+                    self._start_worker(shard)
+                else:
+                    remaining = self._restart_at[shard] - now
+                    if next_restart is None or remaining < next_restart:
+                        next_restart = remaining
+        return next_restart
+
+    def _on_resources_changed(self, names: Set[str]) -> None:
+        """
+        Records a change of the alert profile, to split it into shards again from
+        the supervision loop. Called from the thread of the resource registry.
+
+        Args:
+            names (Set[str]): The names of the resources that changed.
+        """
+        if f"alert_profiles/{self._alert_profile_name}.json" in names:
+            self._profile_changed.set()
+
+    def _reshard(self) -> None:
+        """
+        Splits the changed alert profile into shards and stops the workers of
+        the shards whose entries changed, or all workers if the number of shards
+        changed. The supervision loop starts them with their new entries. If the
+        alert profile can not be split, the workers keep running as they are.
+        """
+        try:
+            shards = self._create_shards(self._workers)
+        except Exception as e:
+            print(f"Error splitting alert profile {self._alert_profile_name}:")
+            print(e)
+            return
+        changed = [i for i, shard in enumerate(shards) if shard != self._shards[i]]
+        if sum(1 for shard in shards if shard) != self._count_shards():
+            changed = list(range(len(shards)))
+        if not changed:
+            return
+
+        print(f"Alert profile {self._alert_profile_name} changed, restarting shards.")
+        self._stop_workers(changed)
+        self._shards = shards
+        for shard in changed:
+            self._processes[shard] = None
+            self._restarts[shard] = 0
+            self._restart_at[shard] = 0.0
+
+    def _collect_alerts(self) -> None:
+        """
+        Queues the alerts forwarded by the workers in the outbox, until stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                alert = self._alert_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._outbox.enqueue(*alert)
+
+    def _stop_workers(
+        self, shards: Optional[Iterable[int]] = None, timeout: float = 10.0
+    ) -> None:
+        """
+        Terminates the workers, waiting for them to write their pending profile
+        changes, and kills the ones that do not exit in time.
+
+        Args:
+            shards (Iterable[int]): The indices of the shards whose workers to
+                stop. Defaults to all shards.
+            timeout (float): The time in seconds to wait for the workers to exit.
+        """
+        if shards is None:
+            shards = range(len(self._processes))
+        processes = [p for p in (self._processes[i] for i in shards) if p is not None]
+        for process in processes:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def _close(self) -> None:
+        """
+        Stop the workers, queue the alerts they forwarded on the way out and stop
+        sending queued alert emails. Queued alert emails that were not sent yet
+        are sent after the next start.
+        """
+        self._resource_registry.unsubscribe(self._on_resources_changed)
+        self._stop_workers()
+        self._stop_event.set()
+        if self._collector_thread.is_alive():
+            self._collector_thread.join()
+        while True:
+            try:
+                self._outbox.enqueue(*self._alert_queue.get_nowait())
+            except queue.Empty:
+                break
+        self._outbox.close()
+
+    def run(self) -> None:
+        """
+        Starts a worker per shard and supervises the workers until interrupted.
+        """
+        if not self._count_shards():
+            print(f"Alert profile {self._alert_profile_name} has no entries.")
+            return
+
+        self._collector_thread.start()
+        self._resource_registry.subscribe(self._on_resources_changed)
+        self._resource_registry.watch(self._reload_interval)
+        try:
+            while True:
+                if self._profile_changed.is_set():
+                    self._profile_changed.clear()
+                    self._reshard()
+                timeout = self._supervise()
+                if timeout is None or timeout > self._reload_interval:
+                    timeout = self._reload_interval
+                sentinels = [p.sentinel for p in self._processes if p is not None]
+                # Wakes up as soon as a worker exits, a restart is due or the
+                # alert profile is to be checked for changes
+                wait(sentinels, timeout)
+        finally:
+            self._close()
+
+
+if __name__ == "__main__":
+    runner = ShardedRunner("me")
+    runner.run()
@@ -0,0 +1,4 @@
+from .metrics import MetricsRegistry, MetricsServer, get_registry, span
+from .profiler import Profiler
+
+__all__ = ["MetricsRegistry", "MetricsServer", "Profiler", "get_registry", "span"]
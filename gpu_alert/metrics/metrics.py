@@ -0,0 +1,351 @@
+import bisect
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds of the latency histogram buckets, from fast parsing
+# steps to slow requests and email dispatch
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+Labels = Tuple[str, str, str]
+
+
+class Histogram:
+    """
+    A `Histogram` counts observed durations in cumulative buckets.
+
+    Attributes:
+        _buckets -- the upper bounds of the buckets, in ascending order.
+        _counts -- the number of observations per bucket, not cumulative,
+            with a last bucket for observations above all bounds.
+        _sum -- the sum of all observations.
+        _count -- the number of observations.
+
+    Methods:
+        __init__
+        observe
+        render
+    """
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        """
+        Initializes the Histogram object.
+
+        Args:
+            buckets (Sequence[float]): The upper bounds of the buckets, ascending.
+        """
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float) -> None:
+        """
+        Records an observation. Must be called with the lock of the registry held.
+
+        Args:
+            value (float): The observed duration in seconds.
+        """
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        """
+        Renders the histogram in the Prometheus text format.
+
+        Args:
+            name (str): The name of the metric.
+            labels (str): The rendered labels of the histogram.
+
+        Returns:
+            List[str]: The lines of the histogram.
+        """
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self._buckets, self._counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self._count}')
+        lines.append(f"{name}_sum{{{labels}}} {self._sum}")
+        lines.append(f"{name}_count{{{labels}}} {self._count}")
+        return lines
+
+
+class Span:
+    """
+    A `Span` times the stage of the code it is entered for and records the
+    duration in the registry, counting an error instead if the stage raises.
+
+    Attributes:
+        _registry -- the registry the duration is recorded in.
+        _labels -- the stage, vendor and product the span times.
+        _start -- the time the span was entered.
+
+    Methods:
+        __init__
+        __enter__
+        __exit__
+    """
+
+    __slots__ = ("_registry", "_labels", "_start")
+
+    def __init__(self, registry: "MetricsRegistry", labels: Labels) -> None:
+        self._registry = registry
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Optional[type], *_: Any) -> None:
+        duration = time.perf_counter() - self._start
+        if exc_type is None:
+            self._registry.observe(self._labels, duration)
+        else:
+            self._registry.count_error(self._labels)
+
+
+class MetricsRegistry:
+    """
+    A `MetricsRegistry` holds a latency histogram and an error counter per
+    stage, vendor and product, e.g. per search request or profile write of a
+    product at a retailer, and renders them in the Prometheus text format.
+
+    Attributes:
+        _buckets -- the upper bounds of the histogram buckets.
+        _histograms -- a dict mapping labels to their latency histogram.
+        _errors -- a dict mapping labels to their number of errors.
+        _lock -- a lock guarding `_histograms` and `_errors`.
+
+    Methods:
+        __init__
+        _escape
+        span
+        observe
+        count_error
+        render
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Initializes the MetricsRegistry object.
+
+        Args:
+            buckets (Sequence[float]): The upper bounds of the histogram buckets
+                in seconds, ascending.
+        """
+        self._buckets = buckets
+        self._histograms: Dict[Labels, Histogram] = dict()
+        self._errors: Dict[Labels, int] = dict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _escape(labels: Labels) -> str:
+        """
+        Renders labels in the Prometheus text format.
+
+        Args:
+            labels (Labels): The stage, vendor and product.
+
+        Returns:
+            str: The rendered labels, without braces.
+        """
+        values = [
+            value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            for value in labels
+        ]
+        return 'stage="{}",vendor="{}",product="{}"'.format(*values)
+
+    def span(self, stage: str, vendor: str = "", product: str = "") -> Span:
+        """
+        Returns a span timing a stage, to be used as a context manager.
+
+        Args:
+            stage (str): The name of the stage, e.g. "parse".
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+
+        Returns:
+            Span: The span.
+        """
+        return Span(self, (stage, vendor, product))
+
+    def observe(self, labels: Labels, duration: float) -> None:
+        """
+        Records the duration of a stage.
+
+        Args:
+            labels (Labels): The stage, vendor and product.
+            duration (float): The duration in seconds.
+        """
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = Histogram(self._buckets)
+            histogram.observe(duration)
+
+    def count_error(self, labels: Labels) -> None:
+        """
+        Counts an error in a stage.
+
+        Args:
+            labels (Labels): The stage, vendor and product.
+        """
+        with self._lock:
+            self._errors[labels] = self._errors.get(labels, 0) + 1
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the Prometheus text format.
+
+        Returns:
+            str: The metrics.
+        """
+        lines = [
+            "# HELP gpu_alert_stage_duration_seconds Duration of a stage of polling"
+            + " or alerting.",
+            "# TYPE gpu_alert_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for labels, histogram in sorted(self._histograms.items()):
+                lines.extend(
+                    histogram.render(
+                        "gpu_alert_stage_duration_seconds", self._escape(labels)
+                    )
+                )
+            lines.append(
+                "# HELP gpu_alert_stage_errors_total Number of errors raised in a stage."
+            )
+            lines.append("# TYPE gpu_alert_stage_errors_total counter")
+            for labels, count in sorted(self._errors.items()):
+                lines.append(
+                    f"gpu_alert_stage_errors_total{{{self._escape(labels)}}} {count}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    A `MetricsServer` serves the metrics of a registry at `/metrics` over http,
+    to be scraped by Prometheus, from a background thread.
+
+    Attributes:
+        _server -- the http server.
+        _server_thread -- the background thread serving requests.
+
+    Methods:
+        __init__
+        port
+        _create_handler
+        close
+    """
+
+    def __init__(
+        self, registry: "MetricsRegistry", port: int, host: str = "127.0.0.1"
+    ) -> None:
+        """
+        Initializes the MetricsServer object and starts serving.
+
+        Args:
+            registry (MetricsRegistry): The registry to serve the metrics of.
+            port (int): The port to listen on, 0 for any free port.
+            host (str): The address to listen on. Defaults to local connections only.
+        """
+        self._server = ThreadingHTTPServer((host, port), self._create_handler(registry))
+        self._server.daemon_threads = True
+        self._server_thread = Thread(
+            target=self._server.serve_forever, name="metrics", daemon=True
+        )
+        self._server_thread.start()
+
+    @property
+    def port(self) -> int:
+        """
+        The port the server listens on.
+        """
+        return self._server.server_address[1]
+
+    @staticmethod
+    def _create_handler(registry: "MetricsRegistry") -> type:
+        """
+        Creates the request handler serving the metrics of a registry.
+
+        Args:
+            registry (MetricsRegistry): The registry to serve the metrics of.
+
+        Returns:
+            type: The request handler class.
+        """
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_: Any) -> None:
+                # Scrapes are too frequent to be printed
+                pass
+
+        return MetricsHandler
+
+    def close(self) -> None:
+        """
+        Stops serving and closes the server socket.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._server_thread.join()
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Returns the registry all stages of the program are recorded in.
+
+    Returns:
+        MetricsRegistry: The registry.
+    """
+    return _registry
+
+
+def span(stage: str, vendor: str = "", product: str = "") -> Span:
+    """
+    Returns a span timing a stage in the registry of the program, to be used
+    as a context manager.
+
+    Args:
+        stage (str): The name of the stage, e.g. "parse".
+        vendor (str): The name of the vendor.
+        product (str): The name of the product.
+
+    Returns:
+        Span: The span.
+    """
+    return Span(_registry, (stage, vendor, product))
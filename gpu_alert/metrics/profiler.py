@@ -0,0 +1,367 @@
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from threading import Event, Lock, Thread
+from types import FrameType
+from typing import Dict, List, Optional, Tuple
+
+Function = Tuple[str, str]
+
+PACKAGE_PATH = Path(__file__).parents[1]
+
+
+class Profiler:
+    """
+    A `Profiler` profiles the running program for a bounded window on demand,
+    without restarting it. During the window, the stacks of all threads are
+    sampled at a fixed interval and memory allocations are traced. At the end
+    of the window, the samples and allocations are dumped to timestamped files,
+    along with a summary of the functions and allocation sites in `gpu_alert`
+    that took the most time and memory, by module.
+
+    A window is started and stopped early by sending the process SIGUSR1, once
+    the signal handler is installed.
+
+    Attributes:
+        _output_path -- the directory the results are dumped to.
+        _duration -- the default length of a window in seconds.
+        _interval -- the time in seconds between two samples.
+        _top -- the number of functions and allocation sites in the summary.
+        _lock -- a lock guarding `_profile_thread`.
+        _stop_event -- set to end the current window early.
+        _profile_thread -- the thread sampling the current window, if any.
+
+    Methods:
+        __init__
+        _get_module
+        _sample
+        _summarise_samples
+        _summarise_allocations
+        _dump
+        _run
+        install_signal_handler
+        is_running
+        start
+        stop
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        duration: float = 60.0,
+        interval: float = 0.005,
+        top: int = 20,
+    ) -> None:
+        """
+        Initializes the Profiler object.
+
+        Args:
+            output_path (Path): The directory to dump the results to.
+            duration (float): The default length of a window in seconds.
+            interval (float): The time in seconds between two samples.
+            top (int): The number of functions and allocation sites in the summary.
+        """
+        self._output_path = output_path
+        self._duration = duration
+        self._interval = interval
+        self._top = top
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._profile_thread: Optional[Thread] = None
+
+    @staticmethod
+    def _get_module(filename: str) -> Optional[str]:
+        """
+        Returns the name of the `gpu_alert` module a file belongs to.
+
+        Args:
+            filename (str): The path of the file.
+
+        Returns:
+            str: The module name, e.g. "gpu_alert.search.search", or None if the
+                file is not part of `gpu_alert` or is the profiler itself.
+        """
+        # The profiler's own sampling and allocations are left out
+        if filename == __file__:
+            return None
+        try:
+            relative_path = Path(filename).relative_to(PACKAGE_PATH)
+        except ValueError:
+            return None
+        return ".".join(("gpu_alert",) + relative_path.with_suffix("").parts)
+
+    def _sample(
+        self,
+        self_samples: Counter,
+        total_samples: Counter,
+        stacks: Counter,
+    ) -> None:
+        """
+        Samples the stacks of all threads but the profiling thread.
+
+        Args:
+            self_samples (Counter): Counts the samples per function on top of a stack.
+            total_samples (Counter): Counts the samples per function anywhere in a stack.
+            stacks (Counter): Counts the samples per stack, in folded format.
+        """
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+
+            functions: List[Function] = []
+            current: Optional[FrameType] = frame
+            while current is not None:
+                code = current.f_code
+                functions.append((code.co_filename, code.co_name))
+                current = current.f_back
+
+            self_samples[functions[0]] += 1
+            total_samples.update(set(functions))
+            stacks[
+                ";".join(
+                    f"{Path(filename).stem}:{name}"
+                    for filename, name in reversed(functions)
+                )
+            ] += 1
+
+    def _summarise_samples(
+        self, self_samples: Counter, total_samples: Counter, sample_count: int
+    ) -> List[str]:
+        """
+        Summarises the functions in `gpu_alert` found most often in the samples,
+        by module.
+
+        Args:
+            self_samples (Counter): The samples per function on top of a stack.
+            total_samples (Counter): The samples per function anywhere in a stack.
+            sample_count (int): The number of times all threads were sampled.
+
+        Returns:
+            List[str]: The lines of the summary.
+        """
+        by_module: Dict[str, List[Tuple[int, int, str]]] = dict()
+        for (filename, name), total in total_samples.most_common():
+            module = self._get_module(filename)
+            if module is None:
+                continue
+            by_module.setdefault(module, []).append(
+                (total, self_samples[(filename, name)], name)
+            )
+
+        lines = [
+            f"Top functions in gpu_alert ({sample_count} samples of all threads,"
+            + " total and self samples):"
+        ]
+        modules = sorted(by_module.items(), key=lambda item: -item[1][0][0])
+        for module, functions in modules[: self._top]:
+            lines.append(f"  {module}")
+            for total, self_count, name in functions[: self._top]:
+                lines.append(f"    {total:>8} {self_count:>8}  {name}")
+        return lines
+
+    def _summarise_allocations(self, snapshot: tracemalloc.Snapshot) -> List[str]:
+        """
+        Summarises the allocation sites in `gpu_alert` holding the most traced
+        memory at the end of the window, by module.
+
+        Args:
+            snapshot (tracemalloc.Snapshot): The snapshot taken at the end of the window.
+
+        Returns:
+            List[str]: The lines of the summary.
+        """
+        snapshot = snapshot.filter_traces(
+            [tracemalloc.Filter(True, str(PACKAGE_PATH / "*"))]
+        )
+        by_module: Dict[str, List[tracemalloc.Statistic]] = dict()
+        for statistic in snapshot.statistics("lineno"):
+            module = self._get_module(statistic.traceback[0].filename)
+            if module is not None:
+                by_module.setdefault(module, []).append(statistic)
+
+        lines = [
+            "Top allocation sites in gpu_alert (KiB held at the end of the window):"
+        ]
+        modules = sorted(
+            by_module.items(), key=lambda item: -sum(s.size for s in item[1])
+        )
+        for module, statistics in modules[: self._top]:
+            lines.append(
+                f"  {module} ({sum(s.size for s in statistics) / 1024:.1f} KiB)"
+            )
+            for statistic in statistics[: self._top]:
+                lines.append(
+                    f"    {statistic.size / 1024:>10.1f}"
+                    + f"  line {statistic.traceback[0].lineno}"
+                    + f" ({statistic.count} blocks)"
+                )
+        return lines
+
+    def _dump(
+        self,
+        stacks: Counter,
+        summary: List[str],
+        snapshot: Optional[tracemalloc.Snapshot],
+    ) -> Path:
+        """
+        Dumps the results of a window to timestamped files.
+
+        Args:
+            stacks (Counter): The samples per stack, in folded format.
+            summary (List[str]): The lines of the summary.
+            snapshot (tracemalloc.Snapshot): The snapshot taken at the end of the
+                window, if allocations were traced.
+
+        Returns:
+            Path: The path of the summary.
+        """
+        self._output_path.mkdir(parents=True, exist_ok=True)
+        prefix = self._output_path / time.strftime("%Y%m%d-%H%M%S")
+
+        # Folded stacks can be rendered with flamegraph tools
+        with open(f"{prefix}-stacks.folded", "w") as out:
+            for stack, count in stacks.most_common():
+                out.write(f"{stack} {count}\n")
+        if snapshot is not None:
+            snapshot.dump(f"{prefix}.tracemalloc")
+
+        summary_path = Path(f"{prefix}-summary.txt")
+        with open(summary_path, "w") as out:
+            out.write("\n".join(summary) + "\n")
+        return summary_path
+
+    def _run(self, duration: float) -> None:
+        """
+        Samples all threads and traces allocations until the window ends, then
+        dumps the results.
+
+        Args:
+            duration (float): The length of the window in seconds.
+        """
+        # Allocations are only traced if no one else is tracing them already
+        trace_allocations = not tracemalloc.is_tracing()
+        if trace_allocations:
+            tracemalloc.start(16)
+        start_snapshot = tracemalloc.take_snapshot()
+
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        stacks: Counter = Counter()
+        sample_count = 0
+        stop_time = time.monotonic() + duration
+        while time.monotonic() < stop_time:
+            self._sample(self_samples, total_samples, stacks)
+            sample_count += 1
+            if self._stop_event.wait(self._interval):
+                break
+
+        end_snapshot = tracemalloc.take_snapshot()
+        if trace_allocations:
+            tracemalloc.stop()
+
+        summary = self._summarise_samples(self_samples, total_samples, sample_count)
+        summary.append("")
+        summary.extend(self._summarise_allocations(end_snapshot))
+        summary.append("")
+        summary.append("Largest growth in gpu_alert during the window:")
+        package_filter = [tracemalloc.Filter(True, str(PACKAGE_PATH / "*"))]
+        differences = end_snapshot.filter_traces(package_filter).compare_to(
+            start_snapshot.filter_traces(package_filter), "lineno"
+        )
+        differences = [
+            d for d in differences if self._get_module(d.traceback[0].filename)
+        ]
+        for difference in differences[: self._top]:
+            summary.append(f"    {difference}")
+
+        try:
+            summary_path = self._dump(stacks, summary, end_snapshot)
+            print(f"Profile written to {summary_path}.")
+        except OSError as e:
+            print("Error writing profile:")
+            print(e)
+
+        with self._lock:
+            self._profile_thread = None
+
+    def install_signal_handler(self, signal_number: Optional[int] = None) -> bool:
+        """
+        Installs a handler starting a window when the process receives a signal,
+        or stopping the current window early. Must be called from the main thread.
+
+        Args:
+            signal_number (int): The signal to handle. Defaults to SIGUSR1.
+
+        Returns:
+            bool: True if the handler was installed, False if the platform has no
+                such signal or this is not the main thread.
+        """
+        if signal_number is None:
+            signal_number = getattr(signal, "SIGUSR1", None)
+        if (
+            signal_number is None
+            or threading.current_thread() is not threading.main_thread()
+        ):
+            return False
+
+        def toggle(*_: object) -> None:
+            if not self.start():
+                self.stop(wait=False)
+
+        signal.signal(signal_number, toggle)
+        return True
+
+    def is_running(self) -> bool:
+        """
+        Returns whether a window is running.
+
+        Returns:
+            bool: True if a window is running, False otherwise.
+        """
+        with self._lock:
+            return self._profile_thread is not None
+
+    def start(self, duration: Optional[float] = None) -> bool:
+        """
+        Starts a window in the background, unless one is running already.
+
+        Args:
+            duration (float): The length of the window in seconds. Defaults to the
+                default length.
+
+        Returns:
+            bool: True if a window was started, False if one is running already.
+        """
+        with self._lock:
+            if self._profile_thread is not None:
+                return False
+            self._stop_event.clear()
+            self._profile_thread = Thread(
+                target=self._run,
+                args=(duration if duration is not None else self._duration,),
+                name="profiler",
+                daemon=True,
+            )
+            self._profile_thread.start()
+        print("Started profiling.")
+        return True
+
+    def stop(self, wait: bool = True) -> None:
+        """
+        Ends the running window early.
+
+        Args:
+            wait (bool): Whether to wait for the results to be dumped.
+        """
+        with self._lock:
+            profile_thread = self._profile_thread
+        if profile_thread is None:
+            return
+        self._stop_event.set()
+        if wait:
+            profile_thread.join()
@@ -1,4 +1,13 @@
+from .availability_detector import AvailabilityDetector
 from .product import Product
 from .product_retailer_a import ProductRetailerA
+from .spec_product import SpecProduct
+from .watcher_pool import WatcherPool
 
-__all__ = ["Product", "ProductRetailerA"]
+__all__ = [
+    "AvailabilityDetector",
+    "Product",
+    "ProductRetailerA",
+    "SpecProduct",
+    "WatcherPool",
+]
@@ -0,0 +1,87 @@
+from typing import Iterable, List
+
+from lxml import etree
+
+from gpu_alert.spec import RetailerSpec
+
+
+class AvailabilityDetector:
+    """
+    An `AvailabilityDetector` tells whether a product page shows the product to
+    be available while the page is downloaded. The raw bytes of each chunk are
+    searched for the markers of the retailer's spec and reading stops at the
+    first available or unavailable marker, a page without any marker is
+    unavailable. Only a page with ambiguous markers alone, or of a retailer
+    without markers, is parsed with lxml and the availability selector.
+
+    Attributes:
+        _spec -- the compiled spec of the retailer.
+
+    Methods:
+        __init__
+        _parse
+        detect
+    """
+
+    def __init__(self, spec: RetailerSpec) -> None:
+        """
+        Initializes the AvailabilityDetector object.
+
+        Args:
+            spec (RetailerSpec): The compiled spec of the retailer.
+        """
+        self._spec = spec
+
+    def _parse(self, chunks: Iterable[bytes], encoding: str) -> bool:
+        """
+        Parses a product page and evaluates the availability selector on it.
+
+        Args:
+            chunks (Iterable[bytes]): The chunks of the product page.
+            encoding (str): The encoding of the product page.
+
+        Returns:
+            bool: True if the product is available, False otherwise.
+        """
+        parser = etree.HTMLParser(encoding=encoding)
+        for chunk in chunks:
+            parser.feed(chunk)
+        return self._spec.is_available(parser.close())
+
+    def detect(self, chunks: Iterable[bytes], encoding: str) -> bool:
+        """
+        Detects the availability of a product from its product page, reading
+        the chunks of the page only until there is a verdict.
+
+        Args:
+            chunks (Iterable[bytes]): The chunks of the product page, e.g. as
+                they are downloaded.
+            encoding (str): The encoding of the product page.
+
+        Returns:
+            bool: True if the product is available, False otherwise.
+        """
+        markers = self._spec.get_markers(encoding)
+        if markers is None:
+            return self._parse(chunks, encoding)
+        verdicts = [(m, True) for m in markers["available"]]
+        verdicts += [(m, False) for m in markers["unavailable"]]
+        overlap = max(len(m) for kind in markers.values() for m in kind) - 1
+
+        read: List[bytes] = []
+        ambiguous = False
+        tail = b""
+        for chunk in chunks:
+            read.append(chunk)
+            # The tail of the last chunk finds markers split between two chunks
+            window = tail + chunk
+            found = [(window.find(m), v) for m, v in verdicts]
+            found = [(position, v) for position, v in found if position >= 0]
+            if found:
+                return min(found)[1]
+            ambiguous = ambiguous or any(m in window for m in markers["ambiguous"])
+            tail = window[len(window) - overlap :] if overlap else b""
+
+        if ambiguous:
+            return self._parse(read, encoding)
+        return False
@@ -1,13 +1,13 @@
-import json
+import random
 import time
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from pathlib import Path
-from typing import Any, Dict
+from threading import Event
+from typing import Any, Dict, Optional
 
-import numpy
-
-from gpu_alert.utils import generate_time_stamp
+from gpu_alert.metrics import span
+from gpu_alert.resources import get_resource_registry
+from gpu_alert.utils import ValidatorCache, generate_time_stamp
 
 
 class Product(ABC):
@@ -28,6 +28,8 @@ class Product(ABC):
         product_data -- a dict of data on the product being searched for.
         send_alert_flag -- a boolean flag indicating whether an email alert
             should be sent for the product being watched.
+        validator_cache -- recognises product pages that did not change since
+            the last request.
 
     Methods:
         __init__
@@ -49,17 +51,16 @@ class Product(ABC):
         self._headers = self._read_request_headers()
         self._product_data = product_data
         self._send_alert_flag = False
+        self._validator_cache = ValidatorCache()
 
     def _read_request_headers(self) -> Dict[str, Any]:
-        headers_file_path = Path(__file__).parents[2] / Path(
-            f"resources/retailers/{self._vendor}/requests/product/product_page.json"
+        return get_resource_registry().get(
+            f"retailers/{self._vendor}/requests/product/product_page.json"
         )
-        with open(headers_file_path, "r") as in_:
-            return json.load(in_)
 
     def _generate_time_interval(self) -> float:
-        time_interval = numpy.random.uniform(0, 8)
-        time_interval += numpy.random.normal(8, 2)
+        time_interval = random.uniform(0, 8)
+        time_interval += random.gauss(8, 2)
         return 5 + abs(time_interval)
 
     @abstractmethod
@@ -69,7 +70,8 @@ class Product(ABC):
     def _update(self) -> None:
         time = generate_time_stamp()
         try:
-            self._check_availability()
+            with span("watcher_poll", self._vendor, self._product_data["name"]):
+                self._check_availability()
             print(
                 "Successfully downloaded product availability for "
                 + f"{self._product_data['name']} at {time}."
@@ -84,8 +86,9 @@ class Product(ABC):
             )
             print(e)
 
-    def auto_update(self) -> bool:
-        while True:
+    def auto_update(self, stop_event: Optional[Event] = None) -> bool:
+        stop_event = stop_event if stop_event else Event()
+        while not stop_event.is_set():
             self._update()
 
             if self._send_alert_flag:
@@ -103,4 +106,5 @@ class Product(ABC):
                 )
                 return False
 
-            time.sleep(self._generate_time_interval())
+            stop_event.wait(self._generate_time_interval())
+        return False
@@ -0,0 +1,70 @@
+from typing import Any, Dict
+
+from gpu_alert.session import SessionManager
+from gpu_alert.spec import RetailerSpec
+
+from .availability_detector import AvailabilityDetector
+from .product import Product
+
+
+class SpecProduct(Product):
+    """
+    A generic product watcher, checking the product page of any retailer with a
+    `RetailerSpec`. The product page is streamed and scanned for the markers of
+    the spec, and only parsed with lxml if they are ambiguous. Inherits from the
+    Product class.
+
+    Attributes:
+        _spec -- the compiled spec of the retailer.
+        _session -- the session manager the product page is requested with.
+        _detector -- detects the availability of the product from its page.
+        _chunk_size -- the size in bytes of the chunks in which the product page
+            is read, the detector stops reading after the chunk with a verdict.
+
+    Methods:
+        __init__
+        _check_availability
+    """
+
+    def __init__(
+        self, vendor: str, product_data: Dict[str, Any], session: SessionManager
+    ) -> None:
+        """
+        Initializes the SpecProduct object.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product_data (dict): The data of the product to watch.
+            session (SessionManager): The session manager of the vendor.
+        """
+        self._vendor = vendor
+        self._spec = RetailerSpec.load(vendor)
+        self._session = session
+        self._detector = AvailabilityDetector(self._spec)
+        self._chunk_size = 16 * 1024
+        Product.__init__(self, product_data)
+
+    def _check_availability(self) -> None:
+        """
+        Requests the product page and checks it for availability, unless it did
+        not change since the last request. The rest of the page is not read once
+        its availability is known.
+        """
+        url = self._product_data["url"]
+        product_page = self._session.get(
+            url,
+            headers={**self._headers, **self._validator_cache.get_headers(url)},
+            stream=True,
+        )
+        with product_page:
+            # An error page says nothing on the availability, nor are its
+            # validators to be sent with the next request
+            product_page.raise_for_status()
+            if self._validator_cache.is_not_modified(url, product_page):
+                # The product page did not change, neither did the availability
+                return
+
+            encoding = product_page.encoding if product_page.encoding else "utf-8"
+            self._availability = self._detector.detect(
+                product_page.iter_content(chunk_size=self._chunk_size), encoding
+            )
@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Callable, Dict
+
+from .product import Product
+
+
+class WatcherPool:
+    """
+    A `WatcherPool` runs `Product` watchers as background workers, so that the
+    search loop keeps its cadence while product pages are being watched. The
+    number of watchers running at once is capped, further watchers are queued
+    until a worker becomes free.
+
+    Attributes:
+        _executor -- the thread pool the product watchers are run in.
+        _active -- a dict mapping the keys of the products currently queued or
+            being watched to an event set to stop their watcher.
+        _lock -- a lock guarding `_active`.
+        _shut_down -- a boolean flag indicating whether the pool was shut down.
+
+    Methods:
+        __init__
+        is_watching
+        submit
+        _run
+        cancel
+        shutdown
+    """
+
+    def __init__(self, max_workers: int = 4) -> None:
+        """
+        Initialize the WatcherPool object.
+
+        Args:
+            max_workers (int): The maximum number of product watchers to run at once.
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="product-watcher"
+        )
+        self._active: Dict[str, Event] = dict()
+        self._lock = Lock()
+        self._shut_down = False
+
+    def is_watching(self, key: str) -> bool:
+        """
+        Checks whether a product is currently queued or being watched.
+
+        Args:
+            key (str): The key identifying the product.
+
+        Returns:
+            bool: True if the product is queued or being watched, False otherwise.
+        """
+        with self._lock:
+            return key in self._active
+
+    def submit(self, key: str, watcher: Product, callback: Callable[[], None]) -> bool:
+        """
+        Starts a product watcher in the background, unless the same product is
+        already queued or being watched.
+
+        Args:
+            key (str): The key identifying the product.
+            watcher (Product): The product watcher to run.
+            callback (Callable[[], None]): Called from the worker thread if the
+                watcher finds the product to be available.
+
+        Returns:
+            bool: True if the watcher was submitted, False otherwise.
+        """
+        with self._lock:
+            if key in self._active:
+                return False
+            stop_event = Event()
+            # A watcher submitted during a shutdown stops right away
+            if self._shut_down:
+                stop_event.set()
+            self._active[key] = stop_event
+
+        self._executor.submit(self._run, key, watcher, callback, stop_event)
+        return True
+
+    def _run(
+        self,
+        key: str,
+        watcher: Product,
+        callback: Callable[[], None],
+        stop_event: Event,
+    ) -> None:
+        """
+        Runs a product watcher to completion and calls the callback if the
+        product was found to be available.
+
+        Args:
+            key (str): The key identifying the product.
+            watcher (Product): The product watcher to run.
+            callback (Callable[[], None]): Called if the product is available.
+            stop_event (Event): Set to stop the watcher early.
+        """
+        try:
+            if watcher.auto_update(stop_event):
+                callback()
+        except Exception as e:
+            print(f"Error running product watcher for {key}:")
+            print(e)
+        finally:
+            with self._lock:
+                self._active.pop(key, None)
+
+    def cancel(self, prefix: str) -> None:
+        """
+        Stops the running and queued watchers of the products whose key starts
+        with a prefix, e.g. those of a search that was removed, after their
+        current request.
+
+        Args:
+            prefix (str): The prefix of the keys of the products.
+        """
+        with self._lock:
+            for key, stop_event in self._active.items():
+                if key.startswith(prefix):
+                    stop_event.set()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shuts down the pool. Running and queued watchers stop after their current
+        request rather than when their scan time runs out.
+
+        Args:
+            wait (bool): Whether to wait for running watchers to finish.
+        """
+        with self._lock:
+            self._shut_down = True
+            for stop_event in self._active.values():
+                stop_event.set()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,3 @@
+from .resource_registry import ResourceRegistry, get_resource_registry
+
+__all__ = ["ResourceRegistry", "get_resource_registry"]
@@ -0,0 +1,286 @@
+import json
+import os
+from pathlib import Path, PurePosixPath
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+RESOURCES_PATH = Path(__file__).parents[2] / Path("resources")
+
+
+def _validate_alert_profile(data: Any) -> None:
+    if not isinstance(data, list):
+        raise ValueError("An alert profile must be a list of entries.")
+    for entry in data:
+        if not isinstance(entry, dict) or not {"vendor", "product"} <= entry.keys():
+            raise ValueError(f"Alert profile entry {entry} has no vendor or product.")
+
+
+def _validate_recipients(data: Any) -> None:
+    if not isinstance(data, dict):
+        raise ValueError("Recipients must be a dict of recipients.")
+    for id, recipient in data.items():
+        if not isinstance(recipient, dict) or "email" not in recipient:
+            raise ValueError(f"Recipient {id} has no email.")
+
+
+def _validate_sender(data: Any) -> None:
+    if not isinstance(data, dict) or not isinstance(data.get("sender"), dict):
+        raise ValueError("A sender file must hold a sender.")
+    if "email" not in data["sender"]:
+        raise ValueError("The sender has no email.")
+
+
+def _validate_search_requests(data: Any) -> None:
+    if not isinstance(data, dict):
+        raise ValueError("Search requests must be a dict of requests.")
+    for request, fields in (("cookies", ("url",)), ("search", ("url", "data"))):
+        if not isinstance(data.get(request), dict):
+            raise ValueError(f"Search requests have no {request} request.")
+        for field in fields:
+            if field not in data[request]:
+                raise ValueError(f"The {request} request has no {field}.")
+
+
+def _validate_headers(data: Any) -> None:
+    if not isinstance(data, dict):
+        raise ValueError("Request headers must be a dict.")
+
+
+def _validate_spec(data: Any) -> None:
+    # Imported here, as the spec reads its JSON from the registry
+    from gpu_alert.spec import RetailerSpec
+
+    if not isinstance(data, dict):
+        raise ValueError("A retailer spec must be a dict.")
+    try:
+        RetailerSpec("validation", data)
+    except KeyError as e:
+        raise ValueError(f"Retailer spec has no {e}.")
+
+
+# The validator of each kind of resource, by the pattern of its name
+VALIDATORS: List[Tuple[str, Callable[[Any], None]]] = [
+    ("alert_profiles/*.json", _validate_alert_profile),
+    ("email/recipients/*.json", _validate_recipients),
+    ("email/senders/*.json", _validate_sender),
+    ("retailers/*/requests/search/*.json", _validate_search_requests),
+    ("retailers/*/requests/product/*.json", _validate_headers),
+    ("retailers/*/spec.json", _validate_spec),
+]
+
+
+class ResourceRegistry:
+    """
+    A `ResourceRegistry` serves the JSON resources of the program, e.g. alert
+    profiles, recipients and the request files and specs of the retailers, by
+    their path relative to the resources directory. Each file is read and
+    validated once and served from memory, rather than read again by every
+    object using it.
+
+    Loaded files are reloaded when their modification time or size changes,
+    on `reload` or by a background thread polling them. A changed file that
+    fails to validate is reported and the last valid version is kept, so an
+    edit in progress never takes down running searches. Subscribers are called
+    with the names of the files that changed, to reconfigure what uses them.
+
+    Served data is shared and must not be modified.
+
+    Attributes:
+        _root -- the resources directory.
+        _resources -- a dict mapping the name of each loaded file to its
+            modification time in nanoseconds, its size and its data.
+        _lock -- a lock guarding `_resources` and `_watch_thread`.
+        _subscribers -- the callbacks called with the names of changed files.
+        _stop_event -- set to stop the background watch thread.
+        _watch_thread -- the background thread polling the loaded files.
+
+    Methods:
+        __init__
+        _validate
+        _read
+        get
+        subscribe
+        unsubscribe
+        reload
+        _run
+        watch
+        close
+    """
+
+    def __init__(self, root: Path = RESOURCES_PATH) -> None:
+        """
+        Initializes the ResourceRegistry object.
+
+        Args:
+            root (Path): The resources directory.
+        """
+        self._root = root
+        self._resources: Dict[str, Tuple[int, int, Any]] = dict()
+        self._lock = Lock()
+        self._subscribers: List[Callable[[Set[str]], None]] = []
+        self._stop_event = Event()
+        self._watch_thread: Optional[Thread] = None
+
+    @staticmethod
+    def _validate(name: str, data: Any) -> None:
+        """
+        Validates the data of a file with the validator of its kind, if any.
+
+        Args:
+            name (str): The path of the file relative to the resources directory.
+            data (Any): The data of the file.
+
+        Raises:
+            ValueError: If the data is invalid.
+        """
+        for pattern, validator in VALIDATORS:
+            if PurePosixPath(name).match(pattern):
+                validator(data)
+                return
+
+    def _read(self, name: str) -> Tuple[int, int, Any]:
+        """
+        Reads and validates a file.
+
+        Args:
+            name (str): The path of the file relative to the resources directory.
+
+        Returns:
+            Tuple[int, int, Any]: The modification time of the file in
+                nanoseconds, its size and its data.
+
+        Raises:
+            OSError: If the file can not be read.
+            ValueError: If the file is no valid JSON or its data is invalid.
+        """
+        path = self._root / Path(name)
+        stat = os.stat(path)
+        with open(path, "r") as in_:
+            data = json.load(in_)
+        self._validate(name, data)
+        return stat.st_mtime_ns, stat.st_size, data
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the data of a file, reading and validating it on first use.
+
+        Args:
+            name (str): The path of the file relative to the resources
+                directory, e.g. "alert_profiles/me.json".
+
+        Returns:
+            Any: The data of the file. It is shared and must not be modified.
+
+        Raises:
+            OSError: If the file can not be read.
+            ValueError: If the file is no valid JSON or its data is invalid.
+        """
+        resource = self._resources.get(name)
+        if resource is None:
+            resource = self._read(name)
+            with self._lock:
+                resource = self._resources.setdefault(name, resource)
+        return resource[2]
+
+    def subscribe(self, callback: Callable[[Set[str]], None]) -> None:
+        """
+        Subscribes a callback to the changes of the loaded files.
+
+        Args:
+            callback (Callable[[Set[str]], None]): Called with the names of the
+                files that changed, from the thread reloading them.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Set[str]], None]) -> None:
+        """
+        Unsubscribes a callback from the changes of the loaded files.
+
+        Args:
+            callback (Callable[[Set[str]], None]): The subscribed callback.
+        """
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def reload(self) -> Set[str]:
+        """
+        Reloads the loaded files whose modification time or size changed and
+        notifies the subscribers. Files that can not be read or fail to validate
+        keep their last valid version.
+
+        Returns:
+            Set[str]: The names of the files that changed.
+        """
+        changed = set()
+        for name, (modification_time, size, _) in list(self._resources.items()):
+            try:
+                stat = os.stat(self._root / Path(name))
+                if (stat.st_mtime_ns, stat.st_size) == (modification_time, size):
+                    continue
+                resource = self._read(name)
+            except (OSError, ValueError) as e:
+                print(f"Error reloading resource {name}, keeping the last version:")
+                print(e)
+                continue
+
+            with self._lock:
+                self._resources[name] = resource
+            changed.add(name)
+
+        if changed:
+            for callback in list(self._subscribers):
+                callback(changed)
+        return changed
+
+    def _run(self, interval: float) -> None:
+        """
+        Reloads the changed files once per interval until stopped.
+
+        Args:
+            interval (float): The time in seconds between two reloads.
+        """
+        while not self._stop_event.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print("Error notifying the subscribers of changed resources:")
+                print(e)
+
+    def watch(self, interval: float = 5.0) -> None:
+        """
+        Starts polling the loaded files for changes in the background, unless
+        this was done already.
+
+        Args:
+            interval (float): The time in seconds between two polls.
+        """
+        with self._lock:
+            if self._watch_thread is None:
+                self._stop_event.clear()
+                self._watch_thread = Thread(
+                    target=self._run, args=(interval,), name="resources", daemon=True
+                )
+                self._watch_thread.start()
+
+    def close(self) -> None:
+        """
+        Stops polling the loaded files.
+        """
+        self._stop_event.set()
+        with self._lock:
+            watch_thread, self._watch_thread = self._watch_thread, None
+        if watch_thread is not None:
+            watch_thread.join()
+
+
+_registry = ResourceRegistry()
+
+
+def get_resource_registry() -> ResourceRegistry:
+    """
+    Returns the registry all resources of the program are read from.
+
+    Returns:
+        ResourceRegistry: The registry.
+    """
+    return _registry
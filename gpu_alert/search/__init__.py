@@ -1,4 +1,15 @@
+from .product_table import ProductRecord, ProductTable
 from .search import Search
 from .search_retailer_a import SearchRetailerA
+from .snapshot_diff import SnapshotDiff, SnapshotEvent
+from .spec_search import SpecSearch
 
-__all__ = ["Search", "SearchRetailerA"]
+__all__ = [
+    "ProductRecord",
+    "ProductTable",
+    "Search",
+    "SearchRetailerA",
+    "SnapshotDiff",
+    "SnapshotEvent",
+    "SpecSearch",
+]
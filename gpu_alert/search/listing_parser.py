@@ -0,0 +1,155 @@
+from typing import Dict, Iterable, Iterator, Optional
+
+from lxml import etree
+
+from gpu_alert.spec import RetailerSpec
+
+
+class ListingParser:
+    """
+    A `ListingParser` extracts the search results from the listing returned by a
+    search http request while it is being downloaded. The response is fed to an
+    incremental lxml parser chunk by chunk, and only the product anchors are read,
+    by evaluating the compiled selector of each field on them. Every element
+    is cleared as soon as it has been handled, so the parsed tree never holds
+    more than the product anchor currently being read and its ancestors.
+
+    Attributes:
+        _anchor_class -- the class of the anchors holding a single search result.
+        _encoding -- the encoding of the listing, if known.
+        _anchor_tag -- the tag of the anchors holding a single search result.
+        _fields -- a dict mapping each field of a search result to its selector.
+
+    Methods:
+        __init__
+        from_spec
+        _has_class
+        _extract
+        parse
+    """
+
+    def __init__(
+        self,
+        anchor_class: str = "productBox",
+        encoding: Optional[str] = None,
+        anchor_tag: str = "a",
+        fields: Optional[Dict[str, etree.XPath]] = None,
+    ) -> None:
+        """
+        Initializes the ListingParser object.
+
+        Args:
+            anchor_class (str): The class of the anchors holding a single search result.
+            encoding (str): The encoding of the listing. Guessed by lxml if omitted.
+            anchor_tag (str): The tag of the anchors holding a single search result.
+            fields (Dict[str, etree.XPath]): The compiled selector of each field of
+                a search result, relative to its anchor. Defaults to the fields of
+                retailer A.
+        """
+        self._anchor_class = anchor_class
+        self._encoding = encoding
+        self._anchor_tag = anchor_tag
+        self._fields = (
+            fields if fields else RetailerSpec.load("retailer_a").get_fields()
+        )
+
+    @classmethod
+    def from_spec(
+        cls, spec: RetailerSpec, encoding: Optional[str] = None
+    ) -> "ListingParser":
+        """
+        Creates a ListingParser for the listings of a retailer.
+
+        Args:
+            spec (RetailerSpec): The compiled spec of the retailer.
+            encoding (str): The encoding of the listing. Guessed by lxml if omitted.
+
+        Returns:
+            ListingParser: The ListingParser object.
+        """
+        return cls(
+            spec.get_result_class(),
+            encoding,
+            spec.get_result_tag(),
+            spec.get_fields(),
+        )
+
+    @staticmethod
+    def _has_class(element: etree._Element, class_name: str) -> bool:
+        """
+        Checks whether an element has the given class.
+
+        Args:
+            element (etree._Element): The element to check.
+            class_name (str): The class to look for.
+
+        Returns:
+            bool: True if the element has the class, False otherwise.
+        """
+        return class_name in element.get("class", "").split()
+
+    def _extract(self, anchor: etree._Element) -> Dict[str, str]:
+        """
+        Extracts the raw data of a single search result.
+
+        Args:
+            anchor (etree._Element): The anchor holding the search result.
+
+        Returns:
+            dict: The raw value of each field of the result, e.g. the name, stock
+                message, unformatted price and url.
+
+        Raises:
+            ValueError: If a field selector matches nothing in the search result.
+        """
+        return {
+            field: RetailerSpec.evaluate(selector, anchor)
+            for field, selector in self._fields.items()
+        }
+
+    def parse(self, chunks: Iterable[bytes]) -> Iterator[Dict[str, str]]:
+        """
+        Parses a listing, yielding each search result as soon as it is complete.
+
+        Args:
+            chunks (Iterable[bytes]): The listing, e.g. from `Response.iter_content`.
+
+        Yields:
+            dict: The name, stock message, unformatted price and url of a result.
+        """
+        parser = etree.HTMLPullParser(events=("start", "end"), encoding=self._encoding)
+        # Number of currently open product anchors, elements inside them must be
+        # kept until the whole anchor has been read.
+        open_anchors = 0
+
+        def handle_events() -> Iterator[Dict[str, str]]:
+            nonlocal open_anchors
+            for event, element in parser.read_events():
+                is_anchor = element.tag == self._anchor_tag and self._has_class(
+                    element, self._anchor_class
+                )
+                if event == "start":
+                    open_anchors += is_anchor
+                    continue
+
+                if is_anchor:
+                    open_anchors -= 1
+                    yield self._extract(element)
+                if not open_anchors:
+                    element.clear(keep_tail=True)
+                    # Drop the already handled siblings as well
+                    parent = element.getparent()
+                    while parent is not None and element.getprevious() is not None:
+                        del parent[0]
+
+        empty = True
+        for chunk in chunks:
+            empty = empty and not chunk.strip()
+            parser.feed(chunk)
+            yield from handle_events()
+
+        # An empty listing, e.g. a page past the last one, has no results
+        if empty:
+            return
+        parser.close()
+        yield from handle_events()
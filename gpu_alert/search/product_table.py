@@ -0,0 +1,393 @@
+import math
+import time
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# The fields of a product held in columns, in the order of the JSON profiles
+FIELDS = (
+    "name",
+    "stock",
+    "alert",
+    "time_updated",
+    "price",
+    "url",
+    "target",
+    "priority",
+)
+
+
+class ProductRecord(Mapping):
+    """
+    A `ProductRecord` is a view of a single product in a `ProductTable`, giving
+    dict-style access to its fields. Reading `time_updated` formats the time
+    stamp of the product, as in the JSON profiles.
+
+    Attributes:
+        _table -- the table holding the product.
+        _row -- the row of the product in the table.
+
+    Methods:
+        __init__
+        __getitem__
+        __setitem__
+        __iter__
+        __len__
+    """
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: "ProductTable", row: int) -> None:
+        """
+        Initializes the ProductRecord object.
+
+        Args:
+            table (ProductTable): The table holding the product.
+            row (int): The row of the product in the table.
+        """
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, field: str) -> Any:
+        return self._table._get_field(self._row, field)
+
+    def __setitem__(self, field: str, value: Any) -> None:
+        self._table._set_field(self._row, field, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS + tuple(self._table._extra.get(self._row, ())))
+
+    def __len__(self) -> int:
+        return len(FIELDS) + len(self._table._extra.get(self._row, ()))
+
+
+class ProductTable(Mapping):
+    """
+    A `ProductTable` holds the products in the profile of a search in columns
+    rather than in a dict per product: flags in byte arrays, prices, priorities
+    and time stamps in typed arrays, and time stamps as epoch seconds rather
+    than strings. This takes a fraction of the memory of a dict per product and
+    makes updating a product a few array writes. Time stamps are only formatted
+    when the profile is serialised or an alert is sent.
+
+    The table is a mapping of product ids to `ProductRecord` views, so products
+    can still be read and written like the dicts of the JSON profiles. The hot
+    path uses the methods of the table instead, which create no views.
+
+    Attributes:
+        _ids -- the id of the product in each row.
+        _rows -- a dict mapping the id of each product to its row.
+        _names -- the name of the product in each row.
+        _urls -- the url of the product in each row.
+        _stock -- the stock state of the product in each row.
+        _alert -- the alert status of the product in each row.
+        _target -- whether the product in each row is a target product.
+        _price -- the price of the product in each row, NaN if it has none.
+        _priority -- the priority of the product in each row.
+        _time_updated -- the time of the last update of the product in each row,
+            in epoch seconds, 0 if it has none.
+        _extra -- a dict mapping rows to the fields of their products not held
+            in columns.
+        _alerting -- the rows of the products that are alerting, so that alerts
+            are found without scanning the table.
+
+    Methods:
+        __init__
+        _parse_time_stamp
+        _format_time_stamp
+        _get_field
+        _set_field
+        __getitem__
+        __iter__
+        __len__
+        update
+        is_in_stock
+        is_alerting
+        set_alert
+        _set_alert
+        any_alerting
+        get_alerting_ids
+        get_target_priority
+        get_alerting_targets
+        to_profile
+    """
+
+    def __init__(self, products: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Initializes the ProductTable object with the products of a profile.
+
+        Args:
+            products (dict): A dict mapping product ids to their data, as in the
+                JSON profiles.
+        """
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = dict()
+        self._names: List[str] = []
+        self._urls: List[str] = []
+        self._stock = bytearray()
+        self._alert = bytearray()
+        self._target = bytearray()
+        self._price = array("d")
+        self._priority = array("q")
+        self._time_updated = array("q")
+        self._extra: Dict[int, Dict[str, Any]] = dict()
+        self._alerting: Set[int] = set()
+
+        # Most products share a handful of time stamps, each is parsed once
+        parsed: Dict[Optional[str], int] = dict()
+        for id, product_data in products.items():
+            time_stamp = product_data.get("time_updated")
+            if time_stamp not in parsed:
+                parsed[time_stamp] = self._parse_time_stamp(time_stamp)
+
+            self._rows[id] = len(self._ids)
+            self._ids.append(id)
+            self._names.append(product_data.get("name", ""))
+            self._urls.append(product_data.get("url", ""))
+            self._stock.append(bool(product_data.get("stock")))
+            self._alert.append(bool(product_data.get("alert")))
+            self._target.append(bool(product_data.get("target")))
+            price = product_data.get("price")
+            self._price.append(math.nan if price is None else price)
+            self._priority.append(product_data.get("priority", 0))
+            self._time_updated.append(parsed[time_stamp])
+            if product_data.get("alert"):
+                self._alerting.add(self._rows[id])
+
+            extra = {k: v for k, v in product_data.items() if k not in FIELDS}
+            if extra:
+                self._extra[self._rows[id]] = extra
+
+    @staticmethod
+    def _parse_time_stamp(time_stamp: Optional[str]) -> int:
+        """
+        Parses a time stamp in the format of `generate_time_stamp`.
+
+        Args:
+            time_stamp (str): The time stamp in local time, or None.
+
+        Returns:
+            int: The time stamp in epoch seconds, 0 if it is None.
+        """
+        if time_stamp is None:
+            return 0
+        return int(time.mktime(time.strptime(time_stamp, TIME_FORMAT)))
+
+    @staticmethod
+    def _format_time_stamp(seconds: int) -> Optional[str]:
+        """
+        Formats a time stamp in the format of `generate_time_stamp`.
+
+        Args:
+            seconds (int): The time stamp in epoch seconds, 0 if there is none.
+
+        Returns:
+            str: The time stamp in local time, or None if there is none.
+        """
+        if not seconds:
+            return None
+        return time.strftime(TIME_FORMAT, time.localtime(seconds))
+
+    def _get_field(self, row: int, field: str) -> Any:
+        """
+        Reads a field of the product in a row.
+
+        Args:
+            row (int): The row of the product.
+            field (str): The name of the field.
+
+        Returns:
+            Any: The value of the field, as it would be in the JSON profiles.
+
+        Raises:
+            KeyError: If the product has no such field.
+        """
+        if field == "name":
+            return self._names[row]
+        if field == "url":
+            return self._urls[row]
+        if field in ("stock", "alert", "target"):
+            return bool(getattr(self, f"_{field}")[row])
+        if field == "price":
+            price = self._price[row]
+            return None if math.isnan(price) else price
+        if field == "priority":
+            return self._priority[row]
+        if field == "time_updated":
+            return self._format_time_stamp(self._time_updated[row])
+        return self._extra.get(row, {})[field]
+
+    def _set_field(self, row: int, field: str, value: Any) -> None:
+        """
+        Writes a field of the product in a row.
+
+        Args:
+            row (int): The row of the product.
+            field (str): The name of the field.
+            value (Any): The value of the field, as it would be in the JSON profiles.
+        """
+        if field == "name":
+            self._names[row] = value
+        elif field == "url":
+            self._urls[row] = value
+        elif field == "alert":
+            self._set_alert(row, bool(value))
+        elif field in ("stock", "target"):
+            getattr(self, f"_{field}")[row] = bool(value)
+        elif field == "price":
+            self._price[row] = math.nan if value is None else value
+        elif field == "priority":
+            self._priority[row] = value
+        elif field == "time_updated":
+            self._time_updated[row] = self._parse_time_stamp(value)
+        else:
+            self._extra.setdefault(row, dict())[field] = value
+
+    def __getitem__(self, id: str) -> ProductRecord:
+        return ProductRecord(self, self._rows[id])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def update(self, id: str, product_data: Dict[str, Any], now: int) -> bool:
+        """
+        Updates a product with the data of a search result.
+
+        Args:
+            id (str): The id of the product.
+            product_data (dict): The new data of the product, e.g. its stock,
+                price and url.
+            now (int): The time of the update in epoch seconds.
+
+        Returns:
+            bool: True if a field of the product changed, False otherwise.
+        """
+        row = self._rows[id]
+        if product_data:
+            self._time_updated[row] = now
+
+        changed = False
+        for field, value in product_data.items():
+            if field == "stock":
+                if self._stock[row] != value:
+                    self._stock[row] = value
+                    changed = True
+            elif field == "price":
+                if self._price[row] != value:
+                    self._price[row] = value
+                    changed = True
+            elif field == "url":
+                if self._urls[row] != value:
+                    self._urls[row] = value
+                    changed = True
+            elif self._get_field(row, field) != value:
+                self._set_field(row, field, value)
+                changed = True
+        return changed
+
+    def is_in_stock(self, id: str) -> bool:
+        """
+        Returns whether a product is in stock.
+        """
+        return bool(self._stock[self._rows[id]])
+
+    def is_alerting(self, id: str) -> bool:
+        """
+        Returns whether a product is alerting.
+        """
+        return bool(self._alert[self._rows[id]])
+
+    def set_alert(self, id: str, alert: bool) -> bool:
+        """
+        Sets the alert status of a product.
+
+        Args:
+            id (str): The id of the product.
+            alert (bool): The alert status.
+
+        Returns:
+            bool: True if the alert status changed, False otherwise.
+        """
+        row = self._rows[id]
+        if self._alert[row] == alert:
+            return False
+        self._set_alert(row, alert)
+        return True
+
+    def _set_alert(self, row: int, alert: bool) -> None:
+        """
+        Sets the alert status of the product in a row.
+
+        Args:
+            row (int): The row of the product.
+            alert (bool): The alert status.
+        """
+        self._alert[row] = alert
+        if alert:
+            self._alerting.add(row)
+        else:
+            self._alerting.discard(row)
+
+    def any_alerting(self) -> bool:
+        """
+        Returns whether any product is alerting.
+        """
+        return bool(self._alerting)
+
+    def get_alerting_ids(self) -> List[str]:
+        """
+        Returns the ids of the products that are alerting.
+        """
+        return [self._ids[row] for row in self._alerting]
+
+    def get_target_priority(self) -> Optional[int]:
+        """
+        Returns the highest priority (lowest value) of the target products, or
+        None if there are no target products.
+        """
+        priorities = [p for p, t in zip(self._priority, self._target) if t]
+        return min(priorities) if priorities else None
+
+    def get_alerting_targets(self) -> List[Tuple[str, ProductRecord]]:
+        """
+        Returns the target products that are alerting, in order of priority.
+
+        Returns:
+            List[Tuple[str, ProductRecord]]: The id and record of each product.
+        """
+        rows = [row for row in self._alerting if self._target[row]]
+        rows.sort(key=self._priority.__getitem__)
+        return [(self._ids[row], ProductRecord(self, row)) for row in rows]
+
+    def to_profile(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Serialises the products as in the JSON profiles.
+
+        Returns:
+            dict: A dict mapping product ids to their data.
+        """
+        # Most products share a handful of time stamps, each is formatted once
+        formatted: Dict[int, Optional[str]] = dict()
+        products = dict()
+        for row, id in enumerate(self._ids):
+            seconds = self._time_updated[row]
+            if seconds not in formatted:
+                formatted[seconds] = self._format_time_stamp(seconds)
+            price = self._price[row]
+            products[id] = {
+                "name": self._names[row],
+                "stock": bool(self._stock[row]),
+                "alert": bool(self._alert[row]),
+                "time_updated": formatted[seconds],
+                "price": None if math.isnan(price) else price,
+                "url": self._urls[row],
+                "target": bool(self._target[row]),
+                "priority": self._priority[row],
+                **self._extra.get(row, {}),
+            }
+        return products
@@ -1,13 +1,22 @@
-import json
+import re
+import time
 from abc import ABC, abstractmethod
-from pathlib import Path
-from typing import Any, Dict
+from difflib import SequenceMatcher
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Set
+from urllib.parse import urlsplit
 
-from requests import Session
+from gpu_alert.coordination import LeaseCoordinator
+from gpu_alert.mailer import Mailer, Outbox
+from gpu_alert.metrics import span
+from gpu_alert.product import Product, WatcherPool
+from gpu_alert.resources import get_resource_registry
+from gpu_alert.session import SessionManager
+from gpu_alert.store import ProfileStore
+from gpu_alert.utils import ValidatorCache, generate_time_stamp
 
-from gpu_alert.mailer import Mailer
-from gpu_alert.product import Product
-from gpu_alert.utils import generate_time_stamp
+from .product_table import ProductTable
+from .snapshot_diff import SnapshotDiff, SnapshotEvent
 
 
 class Search(ABC):
@@ -19,6 +28,11 @@ class Search(ABC):
     which executes a focussed search on the product by interacting with the
     product page itself, rather than the website's search functionality.
 
+    Parsed search results are diffed against the results of the last update,
+    only the changed results are matched and applied to the products in
+    profile, and only the changed products are saved. Target products whose
+    price drops while in stock are alerted for without a watcher.
+
     `Search` objects specific to the retailer being searched inherit from this class.
 
     Attributes:
@@ -27,24 +41,79 @@ class Search(ABC):
         _email_manager -- an interface to AWS SES used to send alert emails.
         _profile -- a dict containing data on variants of the product being
             searched for and a timestamp of the last update to this data.
-        _products -- a dict containing only the product data stored in profile.
+        _products -- a table of the products in profile, replacing the product
+            data in profile until it is serialised.
+        _watcher_pool -- runs product watchers in the background.
+        _name_index -- a dict mapping the normalised names of the products in
+            profile to their ids.
+        _article_index -- a dict mapping the article ids in the urls of the
+            products in profile to their ids.
+        _fuzzy_cache -- a dict caching the result of fuzzy matching the
+            normalised names of search results without an exact match.
+        _active_ids -- the ids of the products that are in stock or alerting.
+        _snapshot_diff -- compares the parsed search results with the ones of
+            the last update.
+        _result_names -- a dict mapping the ids of the products matched to a
+            current search result to the name of that result.
+        _profile_store -- reads and writes the profile.
+        _dirty -- a boolean flag indicating whether the stock, price or alert
+            status of a product changed since the profile was last saved.
+        _changed_ids -- the ids of the products that changed since the profile
+            was last saved.
+        _validator_cache -- recognises responses that did not change since the
+            last update, for the search and the product page requests.
+        _outbox -- queues alert emails to be sent in the background, if set.
+        _coordinator -- coordinates the nodes running the same alert profile, if set.
+        _session -- the session manager all requests of this search are made with.
+        _consecutive_failures -- the number of updates that failed in a row.
+        _reconfigure_pending -- set when a resource of the search changed, so
+            that the search is reconfigured before its next update.
 
     Methods:
         __init__
         _read_profile
+        _get_requests_name
         _read_requests
         _create_session
+        _normalise_name
+        _get_model_tokens
+        _parse_article_id
+        _build_product_index
+        _match_fuzzy
+        _match_product
         _update_profile
         _update_products
+        _update_product_data
+        _mark_changed
+        _apply_search_results
         _update_alert_status
         _generate_email_alert
         _generate_alerts
         _start_product_watcher
         _get_product_watcher
+        vendor
+        key
+        target_priority
+        consecutive_failures
+        resources
+        _reconfigure
+        reconfigure
+        close
+        subscribe
         update
     """
 
-    def __init__(self, vendor: str, product: str, email_manager: Mailer) -> None:
+    def __init__(
+        self,
+        vendor: str,
+        product: str,
+        email_manager: Mailer,
+        watcher_pool: Optional[WatcherPool] = None,
+        profile_store: Optional[ProfileStore] = None,
+        outbox: Optional[Outbox] = None,
+        session_manager: Optional[SessionManager] = None,
+        coordinator: Optional[LeaseCoordinator] = None,
+    ) -> None:
         """
         Initializes the Search object with vendor, product, and email manager.
 
@@ -52,71 +121,345 @@ class Search(ABC):
             vendor (str): The name of the vendor to search the given product for.
             product (str): The name of the product to search for.
             email_manager (Mailer): An interface to AWS SES used to send alert emails.
+            watcher_pool (WatcherPool): Runs product watchers in the background.
+                Shared between searches to cap the number of watchers running
+                at once. A pool for this search alone is created if omitted.
+            profile_store (ProfileStore): Reads and writes the profile. Shared
+                between searches to batch writes. If omitted, the profile is
+                written immediately whenever it changes.
+            outbox (Outbox): Queues alert emails to be sent in the background.
+                If omitted, alert emails are sent by the email manager directly.
+            session_manager (SessionManager): The session manager of the vendor,
+                shared between all searches of the vendor. A session manager for
+                this search alone is created if omitted.
+            coordinator (LeaseCoordinator): Coordinates the nodes running the same
+                alert profile. If set, a stock transition is only alerted for if
+                no other node alerted for it already.
         """
         # Set object values by argument
         self._vendor = vendor
         self._product = product
         self._email_manager = email_manager
+        self._watcher_pool = watcher_pool if watcher_pool else WatcherPool()
+        self._profile_store = profile_store if profile_store else ProfileStore(0)
+        self._dirty = False
+        self._changed_ids: Set[str] = set()
+        self._snapshot_diff = SnapshotDiff()
+        self._result_names: Dict[str, str] = dict()
+        self._validator_cache = ValidatorCache()
+        self._outbox = outbox
+        self._coordinator = coordinator
+        self._consecutive_failures = 0
+        self._reconfigure_pending = False
 
         self._profile = self._read_profile()
-        self._products = self._profile["products"]
+        self._products = ProductTable(self._profile.pop("products"))
+        self._build_product_index()
         self._requests = self._read_requests()
-        self._session = self._create_session()
+        self._session = self._create_session(session_manager)
 
     def _read_profile(self) -> Dict[str, Any]:
         """
-        Reads the profile data of the product from the file system.
+        Reads the profile data of the product from the profile store.
 
         Returns:
             dict: The profile data.
         """
-        self._profile_file_path = Path(__file__).parents[2] / Path(
-            f"resources/retailers/{self._vendor}/data/{self._product}.json"
-        )
-        with open(self._profile_file_path, "r") as in_:
-            return json.load(in_)
+        return self._profile_store.read(self._vendor, self._product)
+
+    def _get_requests_name(self) -> str:
+        """
+        Returns the name of the http request data for the product in the
+        resource registry.
+
+        Returns:
+            str: The name of the http request data.
+        """
+        return f"retailers/{self._vendor}/requests/search/{self._product}.json"
 
     def _read_requests(self) -> Dict[str, Any]:
         """
-        Reads the http request data for the product from the file system.
+        Reads the http request data for the product from the resource registry.
 
         Returns:
             dict: The http request data.
         """
-        requests_file_path = Path(__file__).parents[2] / Path(
-            f"resources/retailers/{self._vendor}/requests/search/{self._product}.json"
-        )
+        return get_resource_registry().get(self._get_requests_name())
 
-        with open(requests_file_path, "r") as in_:
-            return json.load(in_)
+    def _create_session(
+        self, session_manager: Optional[SessionManager] = None
+    ) -> SessionManager:
+        """
+        Registers the cookie request of this search with the session manager of
+        the vendor. The session manager connects on the first request.
+
+        Args:
+            session_manager (SessionManager): The session manager of the vendor.
+                A session manager for this search alone is created if omitted.
 
-    def _create_session(self) -> Session:
+        Returns:
+            SessionManager: The session manager.
         """
-        Initializes the session object by making a GET request to the cookies URL.
+        if session_manager is None:
+            session_manager = SessionManager(self._vendor)
+        session_manager.register_cookie_request(self._requests["cookies"])
+        return session_manager
+
+    @staticmethod
+    def _normalise_name(name: str) -> str:
         """
-        session = Session()
-        session.get(
-            self._requests["cookies"]["url"],
-            headers=self._requests["cookies"]["headers"],
-        )
-        return session
+        Normalises a product name, so that differences in case, whitespace and
+        punctuation (e.g. "ZOTACGeForce" and "ZOTAC GeForce") are ignored.
+
+        Args:
+            name (str): The product name.
+
+        Returns:
+            str: The normalised product name.
+        """
+        return re.sub(r"[^0-9a-z]", "", name.lower())
+
+    @staticmethod
+    def _get_model_tokens(normalised_name: str) -> List[str]:
+        """
+        Returns the tokens of a normalised product name that tell variants of a
+        product apart, which are its numbers (e.g. "3080" or the "12" of "12GB")
+        and the "Ti" and "Super" model suffixes.
+
+        Args:
+            normalised_name (str): The normalised product name.
+
+        Returns:
+            List[str]: The model tokens, in the order they appear in the name.
+        """
+        return re.findall(r"\d+|(?<=\d)ti|super", normalised_name)
+
+    @staticmethod
+    def _parse_article_id(url: str) -> Optional[str]:
+        """
+        Parses the article id of a product, the number at the end of its url.
+
+        Args:
+            url (str): The url of the product.
+
+        Returns:
+            str: The article id, or None if the url does not end in a number.
+        """
+        match = re.search(r"(\d+)/?$", urlsplit(url).path)
+        return match.group(1) if match else None
+
+    def _build_product_index(self) -> None:
+        """
+        Builds the indices used to match search results to the products in
+        profile. Must be called whenever the products in profile change.
+        """
+        self._name_index: Dict[str, str] = dict()
+        self._article_index: Dict[str, str] = dict()
+        self._fuzzy_cache: Dict[str, Optional[str]] = dict()
+        self._active_ids: Set[str] = set()
+
+        for id, product in self._products.items():
+            self._name_index[self._normalise_name(product["name"])] = id
+
+            article_id = self._parse_article_id(product["url"])
+            if article_id:
+                self._article_index[article_id] = id
+
+            if self._products.is_in_stock(id) or self._products.is_alerting(id):
+                self._active_ids.add(id)
+
+    def _match_fuzzy(self, normalised_name: str) -> Optional[str]:
+        """
+        Matches a normalised name without an exact match to the most similar
+        product name in profile. To avoid matching a different variant of a
+        product, a match is only made if it is both close and unambiguous, and
+        only to a product name with the same model tokens.
+        The result is cached, so each name is only matched once.
+
+        Args:
+            normalised_name (str): The normalised name of a search result.
+
+        Returns:
+            str: The id of the matching product, or None if there is no match.
+        """
+        if normalised_name in self._fuzzy_cache:
+            return self._fuzzy_cache[normalised_name]
+
+        matcher = SequenceMatcher(b=normalised_name, autojunk=False)
+        model_tokens = self._get_model_tokens(normalised_name)
+        ratios = []
+        for candidate, id in self._name_index.items():
+            # Names of different variants can differ by a single character only
+            if self._get_model_tokens(candidate) != model_tokens:
+                continue
+            matcher.set_seq1(candidate)
+            if matcher.real_quick_ratio() >= 0.9 and matcher.quick_ratio() >= 0.9:
+                ratios.append((matcher.ratio(), id))
+        ratios.sort(reverse=True)
+
+        match = None
+        if ratios and ratios[0][0] >= 0.95:
+            if len(ratios) == 1 or ratios[1][0] < ratios[0][0] - 0.03:
+                match = ratios[0][1]
+
+        self._fuzzy_cache[normalised_name] = match
+        return match
+
+    def _match_product(self, name: str, url: str, fuzzy: bool = False) -> Optional[str]:
+        """
+        Matches a search result to a product in profile, by article id first
+        and by normalised name second.
+
+        Args:
+            name (str): The name of the search result.
+            url (str): The url of the search result.
+            fuzzy (bool): Whether to fall back to fuzzy matching the name.
+
+        Returns:
+            str: The id of the matching product, or None if there is no match.
+        """
+        article_id = self._parse_article_id(url)
+        if article_id in self._article_index:
+            return self._article_index[article_id]
+
+        normalised_name = self._normalise_name(name)
+        if normalised_name in self._name_index:
+            return self._name_index[normalised_name]
+
+        return self._match_fuzzy(normalised_name) if fuzzy else None
 
     def _update_profile(self) -> None:
         """
-        Updates the profile data of the product and writes it to the file system.
+        Updates the profile data of the product and saves the changed products to
+        the profile store, if the stock, price or alert status of a product changed.
         """
+        if not self._dirty:
+            return
+
         self._profile["time_updated"] = generate_time_stamp()
-        self._profile["products"] = self._products
-        with open(self._profile_file_path, "w") as out:
-            json.dump(self._profile, out, indent=4)
+        changes = {id: dict(self._products[id]) for id in self._changed_ids}
+        with span("profile_write", self._vendor, self._product):
+            self._profile_store.save_changes(
+                self._vendor,
+                self._product,
+                self._profile["time_updated"],
+                changes,
+                lambda: {**self._profile, "products": self._products.to_profile()},
+            )
+        self._dirty = False
+        self._changed_ids = set()
 
     @abstractmethod
-    def _update_products(self) -> None:
+    def _update_products(self) -> bool:
         """
         Updates the product data. This method should be implemented by subclasses.
+
+        Returns:
+            bool: False if the search results did not change since the last
+                update and the product data was left as is, True otherwise.
         """
         pass
 
+    def _apply_search_results(self, parsed_results: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Updates the products in profile with the parsed search results. Only the
+        search results that changed since the last update are matched and
+        applied, along with the products in stock or alerting, so the cost
+        depends on the number of changes and active products rather than of
+        products. A product whose search result disappeared is out of stock.
+
+        Args:
+            parsed_results (dict): A dictionary where the keys are product names and
+                the values are dictionaries with product data.
+        """
+        matched: Dict[str, SnapshotEvent] = dict()
+        unmatched = []
+
+        # Events of current results come first, so they win over disappeared ones.
+        # Disappeared results are matched by the url they had, as their article
+        # id may be all that matches them to a product.
+        for event in self._snapshot_diff.diff(parsed_results):
+            url = event.result.get("url") or (event.previous or {}).get("url", "")
+            id = self._match_product(event.name, url)
+            if id is None:
+                unmatched.append((event, url))
+            elif id not in matched:
+                matched[id] = event
+
+        # Near-misses may only take products that have no exact match
+        for event, url in unmatched:
+            id = self._match_product(event.name, url, True)
+            if id is not None and id not in matched:
+                matched[id] = event
+
+        # Active products whose search result is gone are sold out, including
+        # the ones active before the first snapshot
+        for id in self._active_ids.difference(matched):
+            if self._result_names.get(id) not in parsed_results:
+                matched[id] = SnapshotEvent(
+                    SnapshotEvent.DISAPPEARED,
+                    self._products[id]["name"],
+                    {"stock": False},
+                    None,
+                )
+
+        # An alert is raised for the update that found the stock only
+        for id in self._products.get_alerting_ids():
+            if id not in matched:
+                self._products.set_alert(id, False)
+                self._mark_changed(id)
+
+        now = int(time.time())
+        for id, event in matched.items():
+            if event.type == SnapshotEvent.DISAPPEARED:
+                self._result_names.pop(id, None)
+            else:
+                self._result_names[id] = event.name
+
+            last_stock_state = self._products.is_in_stock(id)
+            self._update_product_data(id, event.result, now)
+            self._update_alert_status(id, last_stock_state)
+
+            # Price drops of target products are only worth an alert while in stock
+            if (
+                event.type == SnapshotEvent.PRICE_DROP
+                and self._products.is_in_stock(id)
+                and self._products[id]["target"]
+            ):
+                self._generate_email_alert(id, "price_alert")
+
+            if self._products.is_in_stock(id) or self._products.is_alerting(id):
+                self._active_ids.add(id)
+            else:
+                self._active_ids.discard(id)
+
+    def _update_product_data(
+        self, id: str, product_data: Dict[str, Any], now: Optional[int] = None
+    ) -> None:
+        """
+        Updates the product data and the timestamp of the last update for a specific product.
+
+        Args:
+            id (str): The id of the product.
+            product_data (dict): A dictionary containing the new product data.
+            now (int): The time of the update in epoch seconds. Defaults to the
+                current time.
+        """
+        if self._products.update(
+            id, product_data, now if now is not None else int(time.time())
+        ):
+            self._mark_changed(id)
+
+    def _mark_changed(self, id: str) -> None:
+        """
+        Marks a product as changed, to be saved with the next profile update.
+
+        Args:
+            id (str): The id of the product.
+        """
+        self._dirty = True
+        self._changed_ids.add(id)
+
     def _update_alert_status(self, id: str, last_stock_state: bool) -> None:
         """
         Updates the alert status of the product.
@@ -125,58 +468,79 @@ class Search(ABC):
             id (str): The id of the product.
             last_stock_state (bool): The last known stock state of the product.
         """
-        if not last_stock_state and self._products[id]["stock"]:
-            self._products[id]["alert"] = True
-        else:
-            self._products[id]["alert"] = False
+        stock = self._products.is_in_stock(id)
+        alert = not last_stock_state and stock
+        if self._coordinator is not None and stock != last_stock_state:
+            # Another node may have seen the transition first, e.g. before failover
+            claimed = self._coordinator.claim_transition(f"{self.key}/{id}", stock)
+            alert = alert and claimed
+        if self._products.set_alert(id, alert):
+            self._mark_changed(id)
 
-    def _generate_email_alert(self, id: str) -> None:
+    def _generate_email_alert(self, id: str, alert_type: str = "stock_alert") -> None:
         """
-        Generates an email alert for the product.
+        Generates an email alert for the product. If an outbox is set, the alert
+        is queued with a key identifying the update it was generated for, so
+        that it is sent at most once.
 
         Args:
             id (str): The id of the product.
+            alert_type (str): The type of the alert (used to select the email
+                template), "stock_alert" or "price_alert".
         """
-        self._email_manager.send_to_all(
-            "stock_alert",
-            self._product,
-            self._vendor,
-            self._products[id]["url"],
-            self._products[id]["name"],
-            self._products[id]["price"],
-            self._products[id]["time_updated"],
+        product = self._products[id]
+        if self._outbox is None:
+            self._email_manager.send_to_all(
+                alert_type,
+                self._product,
+                self._vendor,
+                product["url"],
+                product["name"],
+                product["price"],
+                product["time_updated"],
+            )
+            return
+
+        key = f"{self._vendor}/{self._product}/{id}/{product['time_updated']}"
+        self._outbox.enqueue(
+            key if alert_type == "stock_alert" else f"{key}/{alert_type}",
+            alert_type,
+            {
+                "product": self._product,
+                "retailer": self._vendor,
+                "url": product["url"],
+                "name": product["name"],
+                "price": product["price"],
+                "time": product["time_updated"],
+            },
         )
 
     def _generate_alerts(self) -> None:
         """
         Checks all products for alerts and starts the product watcher if any are found.
         """
-        if any((self._products[id]["alert"] for id in self._products)):
+        if self._products.any_alerting():
             self._start_product_watcher()
 
     def _start_product_watcher(self) -> None:
         """
-        Starts the product watcher for target products that have alerts.
+        Starts background product watchers for all target products that have
+        alerts, in order of priority. An email alert is sent for each product
+        whose watcher finds it to be available.
         """
-        found_targets = [
-            p for p in self._products.values() if p["target"] and p["alert"]
-        ]
+        for id, target_product in self._products.get_alerting_targets():
+            key = f"{self._vendor}/{self._product}/{id}"
+            product_watcher = self._create_product_watcher(dict(target_product))
 
-        if found_targets:
-            found_targets.sort(key=lambda x: x["priority"])
-            target_product = found_targets[0]
-            product_watcher = self._create_product_watcher(target_product)
-
-            # Check the product page of the chosen target product for give minutes or
+            # Check the product page of the target product for five minutes or
             # until availability is found and an alert is sent, whichever is first.
-            print(
-                f"Found stock for target product {target_product['name']} via search."
-                + " Starting product page watcher."
-            )
-
-            result = product_watcher.auto_update()
-            if result:
-                self._generate_email_alert(target_product["id"])
+            if self._watcher_pool.submit(
+                key, product_watcher, partial(self._generate_email_alert, id)
+            ):
+                print(
+                    f"Found stock for target product {target_product['name']} via"
+                    + " search. Starting product page watcher."
+                )
 
     @abstractmethod
     def _create_product_watcher(self, product: Dict[str, Any]) -> Product:
@@ -185,18 +549,109 @@ class Search(ABC):
         """
         pass
 
-    def update(self) -> None:
+    @property
+    def vendor(self) -> str:
         """
-        Updates the product data, profile, and alerts.
+        The name of the vendor searched.
+        """
+        return self._vendor
+
+    @property
+    def key(self) -> str:
         """
+        The key identifying the search, also the partition leased to a node.
+        """
+        return f"{self._vendor}/{self._product}"
+
+    @property
+    def target_priority(self) -> Optional[int]:
+        """
+        The highest priority (lowest value) of the target products in profile,
+        or None if the search has no target products.
+        """
+        return self._products.get_target_priority()
+
+    @property
+    def consecutive_failures(self) -> int:
+        """
+        The number of updates that failed in a row.
+        """
+        return self._consecutive_failures
+
+    @property
+    def resources(self) -> Set[str]:
+        """
+        The names of the resources the search is configured from, in the
+        resource registry.
+        """
+        return {self._get_requests_name()}
+
+    def _reconfigure(self) -> None:
+        """
+        Reconfigures the search from its current resources. The responses cached
+        for the old requests are dropped, as they may not match the new ones.
+        """
+        self._requests = self._read_requests()
+        self._session.register_cookie_request(self._requests["cookies"])
+        self._validator_cache = ValidatorCache()
+
+    def reconfigure(self) -> None:
+        """
+        Reconfigures the search from its current resources before its next
+        update, e.g. after its request file was edited. Safe to call while the
+        search is being updated.
+        """
+        self._reconfigure_pending = True
+
+    def close(self) -> None:
+        """
+        Stops the product watchers of the search, e.g. after it was removed from
+        the alert profile. Watchers of the other searches sharing the watcher
+        pool keep running.
+        """
+        self._watcher_pool.cancel(f"{self.key}/")
+
+    def subscribe(self, callback: Callable[[SnapshotEvent], None]) -> None:
+        """
+        Subscribes a callback to the changes of the search results, e.g. to
+        record restocks or price drops.
+
+        Args:
+            callback (Callable[[SnapshotEvent], None]): Called with every change.
+        """
+        self._snapshot_diff.subscribe(callback)
+
+    def update(self) -> bool:
+        """
+        Updates the product data, profile, and alerts. The profile and alerts are
+        left as they are if the search results did not change since the last update.
+
+        Returns:
+            bool: True if the stock, price or alert status of a product changed,
+                False otherwise.
+        """
+        if self._reconfigure_pending:
+            self._reconfigure_pending = False
+            self._reconfigure()
+
         time = generate_time_stamp()
         try:
-            self._update_products()
+            results_changed = self._update_products()
+            self._consecutive_failures = 0
+            if not results_changed:
+                print(
+                    f"Product data for {self._product} unchanged at {time}"
+                    + f" (cache hit rate {self._validator_cache.hit_rate():.0%})."
+                )
+                return False
             print(
                 f"Successfully downloaded product data for {self._product} at {time}."
             )
         except Exception as e:
             print(f"Error downloading product data for {self._product} at {time}.")
             print(e)
+            self._consecutive_failures += 1
+        changed = self._dirty
         self._update_profile()
         self._generate_alerts()
+        return changed
@@ -0,0 +1,181 @@
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class SnapshotEvent:
+    """
+    A `SnapshotEvent` is a change of a single search result between two
+    consecutive snapshots of the search results. A result changing in several
+    ways at once is a single event, of the first type that applies in the
+    order: new, disappeared, restock, sold out, price drop, changed.
+
+    Attributes:
+        type -- the type of the event, one of the type constants of the class.
+        name -- the name of the search result.
+        result -- the data of the search result. A disappeared result is out of
+            stock.
+        previous -- the data of the search result in the previous snapshot, or
+            None if it is new.
+
+    Methods:
+        __init__
+    """
+
+    NEW = "new"
+    DISAPPEARED = "disappeared"
+    RESTOCK = "restock"
+    SOLD_OUT = "sold_out"
+    PRICE_DROP = "price_drop"
+    CHANGED = "changed"
+
+    __slots__ = ("type", "name", "result", "previous")
+
+    def __init__(
+        self,
+        type: str,
+        name: str,
+        result: Dict[str, Any],
+        previous: Optional[Dict[str, Any]],
+    ) -> None:
+        """
+        Initializes the SnapshotEvent object.
+
+        Args:
+            type (str): The type of the event.
+            name (str): The name of the search result.
+            result (dict): The data of the search result.
+            previous (dict): The data of the search result in the previous
+                snapshot, or None if it is new.
+        """
+        self.type = type
+        self.name = name
+        self.result = result
+        self.previous = previous
+
+    def __repr__(self) -> str:
+        return f"SnapshotEvent({self.type!r}, {self.name!r})"
+
+
+class SnapshotDiff:
+    """
+    A `SnapshotDiff` compares consecutive snapshots of the parsed search results
+    of a search and emits an event for every result that changed, so that work
+    downstream of parsing costs in proportion to the changes rather than to the
+    number of results. Results are compared by a hash of their data.
+
+    Attributes:
+        _price_drop_threshold -- the fraction a price has to drop by to be a
+            price drop rather than a change.
+        _snapshot -- a dict mapping the name of each result in the previous
+            snapshot to the hash of its data and its data.
+        _has_snapshot -- whether a snapshot was taken already.
+        _subscribers -- the callbacks called with every event.
+
+    Methods:
+        __init__
+        _classify
+        has_snapshot
+        subscribe
+        diff
+    """
+
+    def __init__(self, price_drop_threshold: float = 0.05) -> None:
+        """
+        Initializes the SnapshotDiff object.
+
+        Args:
+            price_drop_threshold (float): The fraction a price has to drop by to
+                be a price drop, e.g. 0.05 for 5%.
+        """
+        self._price_drop_threshold = price_drop_threshold
+        self._snapshot: Dict[str, Tuple[int, Dict[str, Any]]] = dict()
+        self._has_snapshot = False
+        self._subscribers: List[Callable[[SnapshotEvent], None]] = []
+
+    def _classify(self, previous: Dict[str, Any], result: Dict[str, Any]) -> str:
+        """
+        Classifies the change of a search result that is in both snapshots.
+
+        Args:
+            previous (dict): The data of the result in the previous snapshot.
+            result (dict): The data of the result in the current snapshot.
+
+        Returns:
+            str: The type of the event.
+        """
+        stock, last_stock = result.get("stock"), previous.get("stock")
+        if stock and not last_stock:
+            return SnapshotEvent.RESTOCK
+        if last_stock and not stock:
+            return SnapshotEvent.SOLD_OUT
+
+        price, last_price = result.get("price"), previous.get("price")
+        if (
+            price is not None
+            and last_price is not None
+            and math.isfinite(last_price)
+            and price < last_price * (1 - self._price_drop_threshold)
+        ):
+            return SnapshotEvent.PRICE_DROP
+        return SnapshotEvent.CHANGED
+
+    def has_snapshot(self) -> bool:
+        """
+        Returns whether a snapshot was taken already, i.e. whether the events of
+        the next diff are changes rather than all results being new.
+        """
+        return self._has_snapshot
+
+    def subscribe(self, callback: Callable[[SnapshotEvent], None]) -> None:
+        """
+        Subscribes a callback to the events of every diff.
+
+        Args:
+            callback (Callable[[SnapshotEvent], None]): Called with every event.
+        """
+        self._subscribers.append(callback)
+
+    def diff(self, results: Dict[str, Dict[str, Any]]) -> List[SnapshotEvent]:
+        """
+        Compares the parsed search results with the previous snapshot, takes them
+        as the new snapshot and emits the events to the subscribers.
+
+        Args:
+            results (dict): A dict mapping the names of the search results to
+                their data.
+
+        Returns:
+            List[SnapshotEvent]: The events, the ones of current results first.
+        """
+        snapshot: Dict[str, Tuple[int, Dict[str, Any]]] = dict()
+        events = []
+        for name, result in results.items():
+            row_hash = hash(tuple(result.items()))
+            snapshot[name] = (row_hash, result)
+
+            last = self._snapshot.get(name)
+            if last is None:
+                events.append(SnapshotEvent(SnapshotEvent.NEW, name, result, None))
+            elif last[0] != row_hash:
+                events.append(
+                    SnapshotEvent(
+                        self._classify(last[1], result), name, result, last[1]
+                    )
+                )
+
+        for name in self._snapshot.keys() - snapshot.keys():
+            events.append(
+                SnapshotEvent(
+                    SnapshotEvent.DISAPPEARED,
+                    name,
+                    {"stock": False},
+                    self._snapshot[name][1],
+                )
+            )
+
+        self._snapshot = snapshot
+        self._has_snapshot = True
+        for event in events:
+            for callback in self._subscribers:
+                callback(event)
+        return events
@@ -0,0 +1,358 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from requests import RequestException
+
+from gpu_alert.coordination import LeaseCoordinator
+from gpu_alert.mailer import Mailer, Outbox
+from gpu_alert.metrics import span
+from gpu_alert.product import Product, SpecProduct, WatcherPool
+from gpu_alert.session import SessionManager
+from gpu_alert.spec import RetailerSpec
+from gpu_alert.store import ProfileStore
+
+from .listing_parser import ListingParser
+from .search import Search
+
+
+class SpecSearch(Search):
+    """
+    A generic `Search`, searching any retailer with a `RetailerSpec`. The listing
+    is parsed while it is downloaded, the fields of each search result are read
+    with the compiled selectors of the spec, and stock messages and prices are
+    interpreted with its compiled regexes. Adding a retailer takes a spec and
+    request files in its resources, rather than a subclass.
+
+    Listings loaded in pages are fetched page by page, concurrently over the
+    shared session, and merged in page order. Fetching stops at the first page
+    adding no new product. The first batch of pages is the number of pages found
+    at the last update plus one, so that the end of the listing is usually
+    confirmed without a second round trip. A later page that fails to load is
+    taken from the last update, rather than its products being sold out.
+
+    Attributes:
+        _spec -- the compiled spec of the retailer.
+        _chunk_size -- the size in bytes of the chunks in which the response of
+            search http requests is read and parsed.
+        _page_results -- a dict mapping each page of the listing to its raw
+            search results at the last update, reused while it is unchanged.
+        _page_count -- the number of pages adding products at the last update.
+        _page_executor -- requests the pages of the listing concurrently, created
+            on first use.
+
+    Methods:
+        __init__
+        _load_spec
+        _format_price
+        _interpret_stock_message
+        _parse_search_results
+        _fetch_page
+        _fetch_page_or_last
+        _fetch_listing
+        _update_products
+        resources
+        _reconfigure
+        close
+        _create_product_watcher
+    """
+
+    def __init__(
+        self,
+        vendor: str,
+        product: str,
+        email_manager: Mailer,
+        watcher_pool: Optional[WatcherPool] = None,
+        profile_store: Optional[ProfileStore] = None,
+        outbox: Optional[Outbox] = None,
+        session_manager: Optional[SessionManager] = None,
+        coordinator: Optional[LeaseCoordinator] = None,
+    ) -> None:
+        """
+        Constructs all the necessary attributes for the SpecSearch object.
+
+        Args:
+            vendor (str): The name of the vendor, i.e. of its directory in the
+                retailer resources.
+            product (str): The name of the product to search for.
+            email_manager (Mailer): An interface to AWS SES used to send alert emails.
+            watcher_pool (WatcherPool): Runs product watchers in the background.
+            profile_store (ProfileStore): Reads and writes the profile.
+            outbox (Outbox): Queues alert emails to be sent in the background.
+            session_manager (SessionManager): The session manager of the vendor.
+            coordinator (LeaseCoordinator): Coordinates the nodes running the same
+                alert profile.
+        """
+        self._spec = self._load_spec(vendor)
+        self._chunk_size = 64 * 1024
+        pages = self._spec.get_pages()
+        self._page_results: Dict[Optional[int], List[Dict[str, str]]] = dict()
+        self._page_count = pages["concurrency"] - 1 if pages else 0
+        self._page_executor: Optional[ThreadPoolExecutor] = None
+        Search.__init__(
+            self,
+            vendor,
+            product,
+            email_manager,
+            watcher_pool,
+            profile_store,
+            outbox,
+            session_manager,
+            coordinator,
+        )
+
+    def _load_spec(self, vendor: str) -> RetailerSpec:
+        """
+        Loads the compiled spec of the retailer.
+
+        Args:
+            vendor (str): The name of the vendor.
+
+        Returns:
+            RetailerSpec: The compiled spec.
+        """
+        return RetailerSpec.load(vendor)
+
+    def _format_price(self, price: str) -> float:
+        """
+        Formats the price into a standard float format.
+
+        Args:
+            price (str): The price as a string in the format of the retailer.
+
+        Returns:
+            float: The price as a float. If price can't be converted to a float, it returns infinity.
+        """
+        return self._spec.format_price(price)
+
+    def _interpret_stock_message(self, message: str) -> bool:
+        """
+        Interprets the stock message to determine if the product is in stock or not.
+
+        Args:
+            message (str): The stock message of the retailer.
+
+        Returns:
+            bool: True if the product is in stock, False otherwise.
+        """
+        return self._spec.is_in_stock(message)
+
+    def _parse_search_results(
+        self, search_results: Iterable[Dict[str, str]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Parses the search results of the retailer.
+
+        Args:
+            search_results: The raw search results, as extracted by a `ListingParser`.
+
+        Returns:
+            dict: A dictionary where the keys are product names and the values are
+                dictionaries with product data.
+        """
+        parsed_search_results = dict()
+
+        for result in search_results:
+            name = result["name"]
+            stock = self._interpret_stock_message(result["stock_message"])
+            price = self._format_price(result["price"])
+            url = result["url"]
+
+            parsed_search_results[name] = {"stock": stock, "price": price, "url": url}
+
+        return parsed_search_results
+
+    def _fetch_page(self, page: Optional[int]) -> Tuple[List[Dict[str, str]], bool]:
+        """
+        Requests one page of the listing and extracts its raw search results.
+        The results of a page that did not change since the last update are
+        taken from the last update.
+
+        Args:
+            page (int): The number of the page, or None if the listing is a
+                single page.
+
+        Returns:
+            Tuple[list, bool]: The raw search results of the page, and whether
+                the page changed since the last update.
+        """
+        url = self._requests["search"]["url"]
+        data = self._requests["search"]["data"]
+        key = url
+        pages = self._spec.get_pages()
+        if page is not None and pages is not None:
+            data = {**data, pages["parameter"]: str(page)}
+            key = f"{url}#{page}"
+
+        with span("search_request", self._vendor, self._product):
+            search_response = self._session.post(
+                url,
+                headers={
+                    **self._requests["search"]["headers"],
+                    **self._validator_cache.get_headers(key),
+                },
+                data=data,
+                stream=True,
+            )
+
+        with search_response:
+            # An error page is no listing, it would sell out every product
+            search_response.raise_for_status()
+            listing_parser = ListingParser.from_spec(
+                self._spec, search_response.encoding
+            )
+            # The body is downloaded within the span, so it includes both
+            with span("parse", self._vendor, self._product):
+                search_results = self._validator_cache.parse_if_changed(
+                    key,
+                    search_response,
+                    lambda chunks: list(listing_parser.parse(chunks)),
+                    self._chunk_size,
+                )
+        if search_results is None:
+            return self._page_results.get(page, []), False
+
+        self._page_results[page] = search_results
+        return search_results, True
+
+    def _fetch_page_or_last(
+        self, page: int, first: int
+    ) -> Tuple[List[Dict[str, str]], bool]:
+        """
+        Requests one page of the listing like `_fetch_page`, but takes the raw
+        search results of a page after the first from the last update if its
+        request fails. A failed first page, or one that was not fetched before,
+        fails the update, as its products would be sold out otherwise.
+
+        Args:
+            page (int): The number of the page.
+            first (int): The number of the first page of the listing.
+
+        Returns:
+            Tuple[list, bool]: The raw search results of the page, and whether
+                the page changed since the last update.
+
+        Raises:
+            RequestException: If the request fails and the page can not be
+                taken from the last update.
+        """
+        try:
+            return self._fetch_page(page)
+        except RequestException as e:
+            if page == first or page not in self._page_results:
+                raise
+            print(
+                f"Error downloading page {page} of the listing for {self._product},"
+                + " keeping its last search results:"
+            )
+            print(e)
+            return self._page_results[page], False
+
+    def _fetch_listing(self) -> Optional[List[Dict[str, str]]]:
+        """
+        Fetches every page of the listing and merges their raw search results in
+        page order. Pages are requested concurrently in batches, and fetching
+        stops at the first page adding no new product, e.g. an empty page or a
+        repetition of the last one.
+
+        Returns:
+            list: The raw search results of the listing, or None if none of its
+                pages changed since the last update.
+
+        Raises:
+            RequestException: If the request of the first page, or of a page
+                not fetched before, fails.
+        """
+        pages = self._spec.get_pages()
+        if pages is None:
+            search_results, changed = self._fetch_page(None)
+            return search_results if changed else None
+
+        if self._page_executor is None:
+            self._page_executor = ThreadPoolExecutor(
+                max_workers=pages["concurrency"], thread_name_prefix=self.key
+            )
+
+        merged: List[Dict[str, str]] = []
+        names: Set[str] = set()
+        any_changed = False
+        first, last = pages["first"], pages["first"] + pages["max"]
+        # The pages found at the last update, and one more to confirm the end
+        batch_size = self._page_count + 1
+        page = first
+        while page < last:
+            batch = range(page, min(page + batch_size, last))
+            fetched = self._page_executor.map(
+                self._fetch_page_or_last, batch, [first] * len(batch)
+            )
+            for number, (search_results, changed) in zip(batch, fetched):
+                any_changed = any_changed or changed
+                new = [r for r in search_results if r["name"] not in names]
+                if not new:
+                    self._page_count = number - first
+                    return merged if any_changed else None
+                names.update(r["name"] for r in new)
+                merged.extend(new)
+            page = batch.stop
+            batch_size = pages["concurrency"]
+
+        self._page_count = pages["max"]
+        return merged if any_changed else None
+
+    def _update_products(self) -> bool:
+        """
+        Updates the product data for all products by fetching the listing of the
+        retailer, parsing it by the spec of the retailer, and updating the product
+        data accordingly. Parsing is skipped if the listing did not change since
+        the last update.
+
+        Returns:
+            bool: False if the listing did not change since the last update, True otherwise.
+        """
+        search_results = self._fetch_listing()
+        if search_results is None:
+            return False
+
+        with span("interpret", self._vendor, self._product):
+            parsed_results = self._parse_search_results(search_results)
+
+        with span("match", self._vendor, self._product):
+            self._apply_search_results(parsed_results)
+        return True
+
+    @property
+    def resources(self) -> Set[str]:
+        """
+        The names of the resources the search is configured from, in the
+        resource registry, including the spec of the retailer.
+        """
+        return {*super().resources, f"retailers/{self._vendor}/spec.json"}
+
+    def _reconfigure(self) -> None:
+        """
+        Reconfigures the search from its current resources, recompiling the spec
+        and dropping the pages of the listing fetched with the old one.
+        """
+        self._spec = self._load_spec(self._vendor)
+        pages = self._spec.get_pages()
+        self._page_results = dict()
+        self._page_count = pages["concurrency"] - 1 if pages else 0
+        if self._page_executor is not None:
+            self._page_executor.shutdown(wait=False)
+            self._page_executor = None
+        super()._reconfigure()
+
+    def close(self) -> None:
+        """
+        Stops the product watchers of the search and the threads requesting the
+        pages of its listing.
+        """
+        if self._page_executor is not None:
+            self._page_executor.shutdown(wait=False)
+            self._page_executor = None
+        super().close()
+
+    def _create_product_watcher(self, product: Dict[str, Any]) -> Product:
+        """
+        Returns the product watcher for the retailer being searched.
+        """
+        return SpecProduct(self._vendor, product, self._session)
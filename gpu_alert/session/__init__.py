@@ -0,0 +1,4 @@
+from .rate_limiter import RateLimiter, TokenBucket
+from .session_manager import SessionManager
+
+__all__ = ["RateLimiter", "SessionManager", "TokenBucket"]
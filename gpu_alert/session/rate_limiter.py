@@ -0,0 +1,187 @@
+import time
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, Optional
+
+
+class TokenBucket:
+    """
+    A `TokenBucket` admits requests to one host at a sustained rate, allowing
+    short bursts. Tokens are added continuously at the rate, up to the burst
+    size, and every request takes one token, waiting for it if none is left.
+
+    Attributes:
+        _rate -- the number of tokens added per second.
+        _burst -- the maximum number of tokens in the bucket.
+        _window -- the time in seconds utilisation is measured over.
+        _tokens -- the number of tokens in the bucket.
+        _updated -- the time the tokens were last topped up.
+        _admitted -- the times of the requests admitted within the window.
+        _lock -- a lock guarding the state of the bucket.
+
+    Methods:
+        __init__
+        _top_up
+        acquire
+        get_utilisation
+    """
+
+    def __init__(self, rate: float, burst: int, window: float = 60.0) -> None:
+        """
+        Initializes the TokenBucket object with a full bucket.
+
+        Args:
+            rate (float): The number of requests per second to admit on average.
+            burst (int): The number of requests to admit at once.
+            window (float): The time in seconds utilisation is measured over.
+        """
+        self._rate = rate
+        self._burst = burst
+        self._window = window
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._admitted: Deque[float] = deque()
+        self._lock = Lock()
+
+    def _top_up(self, now: float) -> None:
+        """
+        Adds the tokens accrued since the last top-up and forgets the requests
+        that fell out of the utilisation window. Must be called with the lock held.
+
+        Args:
+            now (float): The current monotonic time.
+        """
+        self._tokens = min(
+            self._burst, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+        while self._admitted and self._admitted[0] <= now - self._window:
+            self._admitted.popleft()
+
+    def acquire(self) -> float:
+        """
+        Takes a token from the bucket, waiting until one is available.
+
+        Returns:
+            float: The time in seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._top_up(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._admitted.append(now)
+                    return waited
+                delay = (1 - self._tokens) / self._rate
+            time.sleep(delay)
+            waited += delay
+
+    def get_utilisation(self) -> float:
+        """
+        Returns the share of the sustained rate used within the utilisation window.
+
+        Returns:
+            float: The utilisation, 1 at the sustained rate. Can exceed 1 during bursts.
+        """
+        with self._lock:
+            self._top_up(time.monotonic())
+            return len(self._admitted) / (self._rate * self._window)
+
+
+class RateLimiter:
+    """
+    A `RateLimiter` holds a `TokenBucket` per host, so that every request to a
+    retailer, from searches and product watchers alike, is admitted by the same
+    bucket. One rate limiter is shared by all session managers.
+
+    Attributes:
+        _rate -- the default number of requests per second admitted per host.
+        _burst -- the default number of requests admitted at once per host.
+        _host_limits -- a dict mapping hosts to their own (rate, burst), if set.
+        _buckets -- a dict mapping each host to its token bucket.
+        _lock -- a lock guarding `_buckets`.
+
+    Methods:
+        __init__
+        _get_bucket
+        acquire
+        get_utilisation
+        get_utilisations
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 5,
+        host_limits: Optional[Dict[str, Dict[str, float]]] = None,
+    ) -> None:
+        """
+        Initializes the RateLimiter object.
+
+        Args:
+            rate (float): The default number of requests per second admitted per host.
+            burst (int): The default number of requests admitted at once per host.
+            host_limits (Dict[str, Dict[str, float]]): The "rate" and "burst" of
+                hosts tolerating more or fewer requests than the default.
+        """
+        self._rate = rate
+        self._burst = burst
+        self._host_limits = host_limits if host_limits else dict()
+        self._buckets: Dict[str, TokenBucket] = dict()
+        self._lock = Lock()
+
+    def _get_bucket(self, host: str) -> TokenBucket:
+        """
+        Returns the token bucket of a host, creating it on first use.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            TokenBucket: The token bucket of the host.
+        """
+        with self._lock:
+            if host not in self._buckets:
+                limits = self._host_limits.get(host, dict())
+                self._buckets[host] = TokenBucket(
+                    limits.get("rate", self._rate),
+                    int(limits.get("burst", self._burst)),
+                )
+            return self._buckets[host]
+
+    def acquire(self, host: str) -> float:
+        """
+        Waits until a request to a host is admitted.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            float: The time in seconds spent waiting.
+        """
+        return self._get_bucket(host).acquire()
+
+    def get_utilisation(self, host: str) -> float:
+        """
+        Returns the utilisation of the rate of a host.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            float: The utilisation, 1 at the sustained rate.
+        """
+        return self._get_bucket(host).get_utilisation()
+
+    def get_utilisations(self) -> Dict[str, float]:
+        """
+        Returns the utilisation of the rate of every host requested so far.
+
+        Returns:
+            Dict[str, float]: A dict mapping each host to its utilisation.
+        """
+        with self._lock:
+            hosts = list(self._buckets)
+        return {host: self.get_utilisation(host) for host in hosts}
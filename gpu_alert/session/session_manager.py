@@ -0,0 +1,366 @@
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from requests.cookies import create_cookie
+
+from gpu_alert.metrics import span
+
+from .rate_limiter import RateLimiter
+
+
+class SessionManager:
+    """
+    A `SessionManager` owns the http session used for all requests to one
+    vendor, shared by all `Search` and `Product` objects of that vendor, so that
+    connections and cookies are reused rather than established per object.
+
+    The session is connected lazily, on the first request. The session cookies
+    are set by a GET request to a cookie url, or restored from a snapshot of the
+    cookies of a previous run if it has not expired yet. They are refreshed in
+    the background shortly before they expire, and the session is re-established
+    transparently if the vendor rejects a request with 401 or 403.
+
+    Every request, including the ones setting the cookies, first acquires a
+    token from the rate limiter of its host.
+
+    Attributes:
+        _vendor -- the name of the vendor the session is used for.
+        _cookie_request -- the url and headers of the request setting the
+            session cookies.
+        _pool_connections -- the number of hosts to keep connection pools for.
+        _pool_maxsize -- the maximum number of connections kept alive per host.
+        _cookie_max_age -- the time in seconds after which cookies without an
+            expiry date are refreshed.
+        _refresh_margin -- the time in seconds before the expiry of the cookies
+            at which they are refreshed.
+        _snapshot_path -- the path the session cookies are saved to, if set.
+        _rate_limiter -- admits the requests to each host at a limited rate.
+        _session -- the http session.
+        _lock -- a lock guarding `_cookie_request` and `_refresh_thread`.
+        _refresh_lock -- a lock serialising refreshes of the cookies. Requests
+            are not blocked while the cookies are refreshed.
+        _generation -- incremented every time the cookies are refreshed.
+        _cookies_expire -- the time at which the session cookies expire.
+        _stop_event -- set to stop the background refresh thread.
+        _refresh_thread -- the background thread refreshing the cookies.
+
+    Methods:
+        __init__
+        _create_session
+        _get_cookie_expiry
+        _save_snapshot
+        _load_snapshot
+        _acquire
+        _refresh
+        _run
+        register_cookie_request
+        connect
+        request
+        get
+        post
+        get_utilisation
+        close
+    """
+
+    def __init__(
+        self,
+        vendor: str,
+        pool_connections: int = 4,
+        pool_maxsize: int = 10,
+        cookie_max_age: float = 30 * 60,
+        refresh_margin: float = 60,
+        snapshot_path: Optional[Path] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        """
+        Initializes the SessionManager object.
+
+        Args:
+            vendor (str): The name of the vendor the session is used for.
+            pool_connections (int): The number of hosts to keep connection pools for.
+            pool_maxsize (int): The maximum number of connections kept alive per host.
+            cookie_max_age (float): The time in seconds after which cookies without
+                an expiry date are refreshed.
+            refresh_margin (float): The time in seconds before the expiry of the
+                cookies at which they are refreshed.
+            snapshot_path (Path): The path to save the session cookies to, so that
+                they can be restored after a restart. Cookies are not saved if omitted.
+            rate_limiter (RateLimiter): Admits the requests to each host at a limited
+                rate. Shared between session managers so that requests to the same
+                host are limited together. A rate limiter for this session manager
+                alone is created if omitted.
+        """
+        self._vendor = vendor
+        self._cookie_request: Optional[Dict[str, Any]] = None
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._cookie_max_age = cookie_max_age
+        self._refresh_margin = refresh_margin
+        self._snapshot_path = snapshot_path
+        self._rate_limiter = rate_limiter if rate_limiter else RateLimiter()
+
+        self._session = self._create_session()
+        self._lock = Lock()
+        self._refresh_lock = Lock()
+        self._generation = 0
+        self._cookies_expire: Optional[float] = None
+
+        self._stop_event = Event()
+        self._refresh_thread: Optional[Thread] = None
+
+    def _create_session(self) -> Session:
+        """
+        Creates an http session with connection pools sized for concurrent use.
+
+        Returns:
+            Session: The http session.
+        """
+        session = Session()
+        adapter = HTTPAdapter(
+            pool_connections=self._pool_connections, pool_maxsize=self._pool_maxsize
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get_cookie_expiry(self) -> float:
+        """
+        Returns the time at which the first of the session cookies expires.
+
+        Returns:
+            float: The time of expiry, as a POSIX timestamp.
+        """
+        expiry = time.time() + self._cookie_max_age
+        for cookie in self._session.cookies:
+            if cookie.expires is not None:
+                expiry = min(expiry, cookie.expires)
+        return expiry
+
+    def _save_snapshot(self) -> None:
+        """
+        Saves the session cookies and their time of expiry to the snapshot path.
+        """
+        if self._snapshot_path is None:
+            return
+
+        snapshot = {
+            "expires": self._cookies_expire,
+            "cookies": [
+                {
+                    "name": cookie.name,
+                    "value": cookie.value,
+                    "domain": cookie.domain,
+                    "path": cookie.path,
+                    "secure": cookie.secure,
+                    "expires": cookie.expires,
+                }
+                for cookie in self._session.cookies
+            ],
+        }
+
+        try:
+            self._snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            file_descriptor, temporary_path = tempfile.mkstemp(
+                dir=self._snapshot_path.parent, suffix=".tmp"
+            )
+            with os.fdopen(file_descriptor, "w") as out:
+                json.dump(snapshot, out)
+            os.replace(temporary_path, self._snapshot_path)
+        except OSError as e:
+            print(f"Error saving session cookies for {self._vendor}:")
+            print(e)
+
+    def _load_snapshot(self) -> bool:
+        """
+        Restores the session cookies from the snapshot path, unless they expire
+        before they would be refreshed.
+
+        Returns:
+            bool: True if the session cookies were restored, False otherwise.
+        """
+        if self._snapshot_path is None or not self._snapshot_path.exists():
+            return False
+
+        try:
+            with open(self._snapshot_path, "r") as in_:
+                snapshot = json.load(in_)
+        except (OSError, ValueError) as e:
+            print(f"Error reading session cookies for {self._vendor}:")
+            print(e)
+            return False
+
+        if snapshot["expires"] - self._refresh_margin <= time.time():
+            return False
+
+        for cookie in snapshot["cookies"]:
+            self._session.cookies.set_cookie(create_cookie(**cookie))
+        self._cookies_expire = snapshot["expires"]
+        return True
+
+    def _acquire(self, url: str) -> None:
+        """
+        Waits until a request to the host of a url is admitted by the rate limiter.
+
+        Args:
+            url (str): The url to request.
+        """
+        self._rate_limiter.acquire(urlsplit(url).netloc)
+
+    def _refresh(self, generation: Optional[int] = None, clear: bool = False) -> None:
+        """
+        Sets fresh session cookies by making a GET request to the cookie url. If
+        a generation is given, the cookies are only refreshed if they were not
+        refreshed since, so that concurrent callers refresh them only once.
+
+        Args:
+            generation (int): The generation of the cookies found to be stale.
+            clear (bool): Whether to discard the current cookies first.
+        """
+        with self._refresh_lock:
+            if generation is not None and generation != self._generation:
+                return
+            with self._lock:
+                cookie_request = self._cookie_request
+            if cookie_request is None:
+                raise ValueError(f"No cookie request registered for {self._vendor}.")
+
+            # The first refresh may be served from the snapshot of a previous run
+            if self._generation or not self._load_snapshot():
+                if clear:
+                    self._session.cookies.clear()
+                self._acquire(cookie_request["url"])
+                with span("cookie_fetch", self._vendor):
+                    self._session.get(
+                        cookie_request["url"], headers=cookie_request["headers"]
+                    )
+                self._cookies_expire = self._get_cookie_expiry()
+                self._save_snapshot()
+            self._generation += 1
+
+    def _run(self) -> None:
+        """
+        Refreshes the session cookies shortly before they expire, until stopped.
+        """
+        while True:
+            cookies_expire = self._cookies_expire
+            if cookies_expire is None:
+                timeout = self._cookie_max_age
+            else:
+                timeout = max(1.0, cookies_expire - self._refresh_margin - time.time())
+
+            if self._stop_event.wait(timeout):
+                return
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"Error refreshing session cookies for {self._vendor}:")
+                print(e)
+
+    def register_cookie_request(self, cookie_request: Dict[str, Any]) -> None:
+        """
+        Registers the request setting the session cookies. Only the first
+        registered request is used, as the cookies are valid vendor-wide.
+
+        Args:
+            cookie_request (dict): The url and headers of the request.
+        """
+        with self._lock:
+            if self._cookie_request is None:
+                self._cookie_request = cookie_request
+
+    def connect(self) -> None:
+        """
+        Sets the session cookies, unless this was done already, and starts the
+        background refresh thread.
+        """
+        # Only the first caller sets the cookies, the others wait for it
+        self._refresh(generation=0)
+
+        with self._lock:
+            if self._refresh_thread is None:
+                self._refresh_thread = Thread(
+                    target=self._run, name=f"session-{self._vendor}", daemon=True
+                )
+                self._refresh_thread.start()
+
+    def request(self, method: str, url: str, **kwargs: Any) -> Response:
+        """
+        Makes an http request with the shared session, connecting it first if this
+        is the first request. If the vendor rejects the request with 401 or 403,
+        the session cookies are refreshed and the request is made once more.
+
+        Args:
+            method (str): The http method.
+            url (str): The url to request.
+            **kwargs: Passed on to `Session.request`.
+
+        Returns:
+            Response: The response.
+        """
+        if not self._generation:
+            self.connect()
+        generation = self._generation
+
+        self._acquire(url)
+        response = self._session.request(method, url, **kwargs)
+        if response.status_code not in (401, 403):
+            return response
+
+        response.close()
+        print(f"Session for {self._vendor} rejected, refreshing session cookies.")
+        self._refresh(generation, clear=True)
+        self._acquire(url)
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> Response:
+        """
+        Makes a GET request with the shared session.
+
+        Args:
+            url (str): The url to request.
+            **kwargs: Passed on to `Session.request`.
+
+        Returns:
+            Response: The response.
+        """
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> Response:
+        """
+        Makes a POST request with the shared session.
+
+        Args:
+            url (str): The url to request.
+            **kwargs: Passed on to `Session.request`.
+
+        Returns:
+            Response: The response.
+        """
+        return self.request("POST", url, **kwargs)
+
+    def get_utilisation(self) -> Dict[str, float]:
+        """
+        Returns the utilisation of the request rate of every host requested so far.
+
+        Returns:
+            Dict[str, float]: A dict mapping each host to its utilisation, 1 at
+                the sustained rate.
+        """
+        return self._rate_limiter.get_utilisations()
+
+    def close(self) -> None:
+        """
+        Stops the background refresh thread and closes the session.
+        """
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+        self._session.close()
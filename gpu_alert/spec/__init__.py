@@ -0,0 +1,3 @@
+from .retailer_spec import RetailerSpec
+
+__all__ = ["RetailerSpec"]
@@ -0,0 +1,332 @@
+import re
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from lxml import etree
+
+from gpu_alert.resources import get_resource_registry
+
+RETAILERS_PATH = Path(__file__).parents[2] / Path("resources/retailers")
+
+
+class RetailerSpec:
+    """
+    A `RetailerSpec` describes how to extract product data from the pages of one
+    retailer. It is read from `resources/retailers/<vendor>/spec.json` through
+    the resource registry and compiled once per version of the file, into lxml
+    XPath objects and regular expressions, so that the generic search and
+    product watcher engines need no retailer-specific code.
+
+    The spec holds:
+        search.result -- the tag and class of the element holding a single search
+            result. The listing is parsed while it is downloaded, so results are
+            recognised by their opening tag rather than by a selector.
+        search.fields -- a selector per field of a search result ("name",
+            "stock_message", "price" and "url"), relative to the result element.
+        search.in_stock -- the regexes of the stock messages meaning in stock.
+        search.pages -- optional, for listings loaded in pages: the "parameter"
+            of the search request holding the page number, the number of the
+            "first" page, the "max" number of pages and the number of pages
+            requested concurrently ("concurrency").
+        price -- the thousands and decimal separators of the retailer's prices.
+        product.available -- a selector matching on a product page if and only if
+            the product can be bought.
+        product.markers -- optional literal strings found in the raw product
+            page, so that availability is known without parsing it:
+            "available" and "unavailable" markers are verdicts, "ambiguous"
+            markers are near-misses of the "available" ones. A page without any
+            marker is unavailable, a page with only ambiguous markers is parsed.
+        aliases -- other names of the vendor, e.g. as used in alert profiles.
+
+    Selectors are given as {"xpath": ...} or, if the cssselect package is
+    installed, {"css": ...}. Field selectors evaluating to a string, e.g.
+    "string(.//span[@class = 'price'])", are the fastest, as the text is read
+    by lxml rather than joined in Python.
+
+    Attributes:
+        _vendor -- the name of the vendor.
+        _aliases -- the other names of the vendor.
+        _result_tag -- the tag of the elements holding a single search result.
+        _result_class -- the class of the elements holding a single search result.
+        _fields -- a dict mapping each field of a search result to its selector.
+        _stock_regex -- matches the stock messages meaning in stock.
+        _pages -- the pagination of the listing, or None if it is a single page.
+        _price_regex -- matches prices in the retailer's format.
+        _available -- the selector matching on product pages of available products.
+        _markers -- a dict mapping "available", "unavailable" and "ambiguous"
+            to the markers of the product pages.
+        _encoded_markers -- a dict caching the markers encoded in each encoding
+            of the product pages.
+
+    Methods:
+        __init__
+        _compile_selector
+        _get_spec_name
+        load
+        find
+        vendor
+        get_result_tag
+        get_result_class
+        get_fields
+        get_pages
+        evaluate
+        format_price
+        is_in_stock
+        is_available
+        get_markers
+    """
+
+    # The data and compiled spec of each vendor, recompiled when the data is reloaded
+    _cache: Dict[str, Tuple[Dict[str, Any], "RetailerSpec"]] = dict()
+    _cache_lock = Lock()
+
+    def __init__(self, vendor: str, spec: Dict[str, Any]) -> None:
+        """
+        Compiles the spec of a vendor.
+
+        Args:
+            vendor (str): The name of the vendor.
+            spec (dict): The spec, as read from its JSON file.
+
+        Raises:
+            ValueError: If a selector or regex of the spec is invalid.
+        """
+        self._vendor = vendor
+        self._aliases: List[str] = spec.get("aliases", [])
+
+        search = spec["search"]
+        self._result_tag = search["result"]["tag"]
+        self._result_class = search["result"]["class"]
+        self._fields = {
+            field: self._compile_selector(selector)
+            for field, selector in search["fields"].items()
+        }
+        try:
+            self._stock_regex = re.compile("|".join(search["in_stock"]))
+        except re.error as e:
+            raise ValueError(f"Invalid stock regex in spec of {vendor}: {e}")
+
+        self._pages: Optional[Dict[str, Any]] = None
+        if "pages" in search:
+            self._pages = {"first": 1, "max": 10, "concurrency": 4, **search["pages"]}
+            if "parameter" not in self._pages:
+                raise ValueError(f"Pages of spec of {vendor} have no parameter.")
+
+        # A currency prefix, the integer part with at most one thousands separator,
+        # the decimal separator and the fraction
+        thousands = re.escape(spec["price"]["thousands_separator"])
+        decimal = re.escape(spec["price"]["decimal_separator"])
+        self._price_regex = re.compile(
+            rf"^[^0-9]+(\d+)(?:{thousands}(\d+))?{decimal}(\d+)"
+        )
+
+        self._available = self._compile_selector(spec["product"]["available"])
+        self._markers: Dict[str, List[str]] = spec["product"].get("markers", dict())
+        self._encoded_markers: Dict[str, Optional[Dict[str, List[bytes]]]] = dict()
+
+    @staticmethod
+    def _compile_selector(selector: Dict[str, str]) -> etree.XPath:
+        """
+        Compiles a selector into an XPath object.
+
+        Args:
+            selector (dict): The selector, either {"xpath": ...} or {"css": ...}.
+
+        Returns:
+            etree.XPath: The compiled selector.
+
+        Raises:
+            ValueError: If the selector is invalid.
+        """
+        try:
+            if "css" in selector:
+                # Imported here, as cssselect is only needed by specs using CSS
+                from lxml.cssselect import CSSSelector
+
+                return CSSSelector(selector["css"])
+            return etree.XPath(selector["xpath"])
+        except (etree.XPathSyntaxError, KeyError) as e:
+            raise ValueError(f"Invalid selector {selector}: {e}")
+
+    @staticmethod
+    def _get_spec_name(vendor: str) -> str:
+        """
+        Returns the name of the spec of a vendor in the resource registry.
+
+        Args:
+            vendor (str): The name of the vendor.
+
+        Returns:
+            str: The name of the spec.
+        """
+        return f"retailers/{vendor}/spec.json"
+
+    @classmethod
+    def load(cls, vendor: str) -> "RetailerSpec":
+        """
+        Returns the compiled spec of a vendor, compiling it on first use and
+        after the spec file was reloaded.
+
+        Args:
+            vendor (str): The name of the vendor.
+
+        Returns:
+            RetailerSpec: The compiled spec.
+        """
+        spec = get_resource_registry().get(cls._get_spec_name(vendor))
+        with cls._cache_lock:
+            if vendor not in cls._cache or cls._cache[vendor][0] is not spec:
+                cls._cache[vendor] = (spec, cls(vendor, spec))
+            return cls._cache[vendor][1]
+
+    @classmethod
+    def find(cls, name: str) -> "RetailerSpec":
+        """
+        Returns the compiled spec of the vendor with a name or alias.
+
+        Args:
+            name (str): The name or an alias of the vendor.
+
+        Returns:
+            RetailerSpec: The compiled spec.
+
+        Raises:
+            ValueError: If no vendor has a spec under the name or alias.
+        """
+        for spec_path in sorted(RETAILERS_PATH.glob("*/spec.json")):
+            spec = cls.load(spec_path.parent.name)
+            if name == spec.vendor or name in spec._aliases:
+                return spec
+        raise ValueError(f"No retailer spec found for {name}.")
+
+    @property
+    def vendor(self) -> str:
+        """
+        The name of the vendor.
+        """
+        return self._vendor
+
+    def get_result_tag(self) -> str:
+        """
+        Returns the tag of the elements holding a single search result.
+        """
+        return self._result_tag
+
+    def get_result_class(self) -> str:
+        """
+        Returns the class of the elements holding a single search result.
+        """
+        return self._result_class
+
+    def get_fields(self) -> Dict[str, etree.XPath]:
+        """
+        Returns the compiled selectors of the fields of a search result.
+        """
+        return self._fields
+
+    def get_pages(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns the pagination of the listing: the "parameter" holding the page
+        number, the "first" page, the "max" number of pages and the number of
+        pages requested concurrently ("concurrency"), or None if the listing is
+        a single page.
+        """
+        return self._pages
+
+    @staticmethod
+    def evaluate(selector: etree.XPath, element: etree._Element) -> str:
+        """
+        Evaluates a field selector on an element.
+
+        Args:
+            selector (etree.XPath): The compiled selector.
+            element (etree._Element): The element to evaluate the selector on.
+
+        Returns:
+            str: The result of the selector, or the text of the first element it
+                matched, including the text of its children.
+
+        Raises:
+            ValueError: If the selector matched nothing.
+        """
+        result = selector(element)
+        if isinstance(result, list):
+            if not result:
+                raise ValueError(f"Search result has no match for {selector.path}.")
+            result = result[0]
+        if isinstance(result, etree._Element):
+            return "".join(result.itertext())
+        return str(result)
+
+    def format_price(self, price: str) -> float:
+        """
+        Formats a price in the retailer's format into a float.
+
+        Args:
+            price (str): The price as a string, e.g. "€ 1.799,00".
+
+        Returns:
+            float: The price as a float. If price can't be converted to a float, it
+                returns infinity.
+        """
+        match = self._price_regex.match(price)
+        if match:
+            integer, thousands, fraction = match.groups()
+            price = f"{integer}{thousands or ''}.{fraction}" + price[match.end() :]
+
+        try:
+            return float(price)
+        except ValueError:
+            return float("inf")
+
+    def is_in_stock(self, message: str) -> bool:
+        """
+        Interprets a stock message of the retailer.
+
+        Args:
+            message (str): The stock message.
+
+        Returns:
+            bool: True if the product is in stock, False otherwise.
+        """
+        return self._stock_regex.match(message) is not None
+
+    def is_available(self, root: Optional[etree._Element]) -> bool:
+        """
+        Checks whether a parsed product page shows the product to be available.
+
+        Args:
+            root (etree._Element): The root of the parsed product page.
+
+        Returns:
+            bool: True if the product is available, False otherwise.
+        """
+        if root is None:
+            return False
+        return bool(self._available(root))
+
+    def get_markers(self, encoding: str) -> Optional[Dict[str, List[bytes]]]:
+        """
+        Returns the markers of the product pages, encoded in the encoding of the
+        page. A marker that can not be encoded can not be found in the page.
+
+        Args:
+            encoding (str): The encoding of the product page.
+
+        Returns:
+            dict: A dict mapping "available", "unavailable" and "ambiguous" to
+                the encoded markers, or None if no available marker can be
+                encoded, in which case product pages must be parsed.
+        """
+        if encoding not in self._encoded_markers:
+            encoded: Dict[str, List[bytes]] = dict()
+            for kind in ("available", "unavailable", "ambiguous"):
+                encoded[kind] = []
+                for marker in self._markers.get(kind, []):
+                    try:
+                        encoded[kind].append(marker.encode(encoding))
+                    except (UnicodeEncodeError, LookupError):
+                        continue
+            self._encoded_markers[encoding] = encoded if encoded["available"] else None
+        return self._encoded_markers[encoding]
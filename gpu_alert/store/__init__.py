@@ -0,0 +1,4 @@
+from .profile_store import ProfileStore
+from .sqlite_profile_store import SQLiteProfileStore
+
+__all__ = ["ProfileStore", "SQLiteProfileStore"]
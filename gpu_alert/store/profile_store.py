@@ -0,0 +1,190 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Optional
+
+
+class ProfileStore:
+    """
+    A `ProfileStore` reads and writes the profiles of the products searched for.
+    Writes are deferred: saved profiles are held in memory and flushed to the
+    file system in batches, at most once per flush interval, so a profile saved
+    several times between two flushes is only serialised and written once. Every file is
+    written atomically, by writing to a temporary file and renaming it.
+
+    Attributes:
+        _flush_interval -- the time in seconds between two flushes. Profiles are
+            written immediately if 0.
+        _pending -- a dict mapping the paths of the profiles waiting to be
+            written to their data.
+        _lock -- a lock guarding `_pending`.
+        _stop_event -- set to stop the background flush thread.
+        _flush_thread -- the background thread flushing the pending profiles.
+
+    Methods:
+        __init__
+        _get_profile_path
+        _write_atomic
+        _run
+        read
+        save
+        save_changes
+        _start_flush_thread
+        flush
+        close
+    """
+
+    def __init__(self, flush_interval: float = 30.0) -> None:
+        """
+        Initializes the ProfileStore object.
+
+        Args:
+            flush_interval (float): The time in seconds between two flushes.
+                Profiles are written immediately if 0.
+        """
+        self._flush_interval = flush_interval
+        self._pending: Dict[Path, Dict[str, Any]] = dict()
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._flush_thread: Optional[Thread] = None
+
+    def _get_profile_path(self, vendor: str, product: str) -> Path:
+        """
+        Returns the path of the profile of a product.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+
+        Returns:
+            Path: The path of the profile.
+        """
+        return Path(__file__).parents[2] / Path(
+            f"resources/retailers/{vendor}/data/{product}.json"
+        )
+
+    @staticmethod
+    def _write_atomic(path: Path, content: str) -> None:
+        """
+        Writes a file atomically, so that a crash mid-write leaves either the
+        old or the new content behind.
+
+        Args:
+            path (Path): The path of the file.
+            content (str): The content to write.
+        """
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(file_descriptor, "w") as out:
+                out.write(content)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def _run(self) -> None:
+        """
+        Flushes the pending profiles once per flush interval until stopped.
+        """
+        while not self._stop_event.wait(self._flush_interval):
+            self.flush()
+
+    def read(self, vendor: str, product: str) -> Dict[str, Any]:
+        """
+        Reads the profile of a product from the file system.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+
+        Returns:
+            dict: The profile data.
+        """
+        with open(self._get_profile_path(vendor, product), "r") as in_:
+            return json.load(in_)
+
+    def save(self, vendor: str, product: str, profile: Dict[str, Any]) -> None:
+        """
+        Saves the profile of a product. The profile is only serialised and
+        written to the file system with the next flush.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+            profile (dict): The profile data. It is held until the next flush and
+                must not be modified after it is saved.
+        """
+        path = self._get_profile_path(vendor, product)
+
+        if not self._flush_interval:
+            self._write_atomic(path, json.dumps(profile, indent=4))
+            return
+
+        with self._lock:
+            self._pending[path] = profile
+            self._start_flush_thread()
+
+    def save_changes(
+        self,
+        vendor: str,
+        product: str,
+        time_updated: Optional[str],
+        changes: Dict[str, Dict[str, Any]],
+        get_profile: Callable[[], Dict[str, Any]],
+    ) -> None:
+        """
+        Saves the changes to the profile of a product. Profiles are written as a
+        whole, so the whole profile is saved.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+            time_updated (str): The time of the last update of the profile.
+            changes (dict): A dict mapping the ids of the products that changed
+                since the last save to their data.
+            get_profile (Callable[[], dict]): Returns the whole profile data.
+        """
+        self.save(vendor, product, get_profile())
+
+    def _start_flush_thread(self) -> None:
+        """
+        Starts the background flush thread on the first deferred save. Must be
+        called holding `_lock`.
+        """
+        if self._flush_thread is None:
+            self._flush_thread = Thread(
+                target=self._run, name="profile-store", daemon=True
+            )
+            self._flush_thread.start()
+
+    def flush(self) -> None:
+        """
+        Writes all pending profiles to the file system.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, dict()
+
+        for path, profile in pending.items():
+            try:
+                self._write_atomic(path, json.dumps(profile, indent=4))
+            except OSError as e:
+                print(f"Error writing profile {path}, retrying with the next flush:")
+                print(e)
+                # Keep the failed write, unless a newer version was saved meanwhile
+                with self._lock:
+                    self._pending.setdefault(path, profile)
+
+    def close(self) -> None:
+        """
+        Stops the background flush thread and writes all pending profiles.
+        """
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+        self.flush()
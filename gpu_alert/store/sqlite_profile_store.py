@@ -0,0 +1,469 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .profile_store import ProfileStore
+
+# The fields of a product stored in their own columns, any other field is kept
+# in the extra column as JSON
+PRODUCT_FIELDS = (
+    "name",
+    "stock",
+    "alert",
+    "time_updated",
+    "price",
+    "url",
+    "target",
+    "priority",
+)
+
+Row = Tuple[Any, ...]
+
+
+class SQLiteProfileStore(ProfileStore):
+    """
+    A `SQLiteProfileStore` keeps the profiles of the products searched for in an
+    SQLite database in WAL mode, rather than in a JSON file per product, along
+    with an append-only history of the stock and price transitions of every
+    product. Inherits from the ProfileStore class, so searches use it unchanged.
+
+    Profiles are migrated from their JSON files on first read, or all at once
+    with `migrate`. Saves are diffed against the last saved state of each
+    product, only the products whose data changed are written, and writes are
+    deferred and batched into one transaction per flush. A product whose only
+    change is the time of its last update is not written, its stored time is
+    the time of its last change.
+
+    Attributes:
+        _connection -- the connection to the database.
+        _saved -- a dict mapping each (vendor, product) to the last saved row of
+            each of its products.
+        _pending_profiles -- a dict mapping each (vendor, product) with pending
+            changes to the time of its last update.
+        _pending_rows -- a dict mapping each (vendor, product, id) with pending
+            changes to its row.
+        _pending_history -- the transitions waiting to be appended to the history.
+
+    Methods:
+        __init__
+        _get_store_path
+        _create_tables
+        _to_row
+        _to_product
+        _insert_profile
+        read
+        _stage
+        save
+        save_changes
+        flush
+        migrate
+        get_restocks
+        get_alerting_targets
+        close
+    """
+
+    def __init__(
+        self, flush_interval: float = 30.0, path: Optional[Path] = None
+    ) -> None:
+        """
+        Initializes the SQLiteProfileStore object.
+
+        Args:
+            flush_interval (float): The time in seconds between two flushes.
+                Profiles are written immediately if 0.
+            path (Path): The path of the database. Defaults to a database in the
+                store resources.
+        """
+        ProfileStore.__init__(self, flush_interval)
+        path = path if path else self._get_store_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        self._saved: Dict[Tuple[str, str], Dict[str, Row]] = dict()
+        self._pending_profiles: Dict[Tuple[str, str], Optional[str]] = dict()
+        self._pending_rows: Dict[Tuple[str, str, str], Row] = dict()
+        self._pending_history: List[Row] = []
+        self._create_tables()
+
+    @staticmethod
+    def _get_store_path() -> Path:
+        """
+        Returns the default path of the database.
+
+        Returns:
+            Path: The path of the database.
+        """
+        return Path(__file__).parents[2] / Path("resources/store/products.sqlite3")
+
+    def _create_tables(self) -> None:
+        """
+        Creates the tables of profiles, products and history and their indexes,
+        if they do not exist yet.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS profiles (
+                    vendor TEXT NOT NULL,
+                    product TEXT NOT NULL,
+                    time_updated TEXT,
+                    PRIMARY KEY (vendor, product)
+                )
+                """)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS products (
+                    vendor TEXT NOT NULL,
+                    product TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    name TEXT,
+                    stock INTEGER NOT NULL,
+                    alert INTEGER NOT NULL,
+                    time_updated TEXT,
+                    price REAL,
+                    url TEXT,
+                    target INTEGER NOT NULL,
+                    priority INTEGER,
+                    extra TEXT,
+                    PRIMARY KEY (vendor, product, id)
+                )
+                """)
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS products_targets"
+                + " ON products (target, alert, priority)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS products_stock"
+                + " ON products (product, stock)"
+            )
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    vendor TEXT NOT NULL,
+                    product TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    time TEXT NOT NULL,
+                    transition TEXT NOT NULL,
+                    stock INTEGER NOT NULL,
+                    price REAL
+                )
+                """)
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS history_transitions"
+                + " ON history (product, transition, time)"
+            )
+
+    @staticmethod
+    def _to_row(product_data: Dict[str, Any]) -> Row:
+        """
+        Converts the data of a product into a row of the products table, without
+        the key columns.
+
+        Args:
+            product_data (dict): The data of the product.
+
+        Returns:
+            Row: The values of the columns from name to extra.
+        """
+        extra = {k: v for k, v in product_data.items() if k not in PRODUCT_FIELDS}
+        return (
+            product_data.get("name"),
+            int(bool(product_data.get("stock"))),
+            int(bool(product_data.get("alert"))),
+            product_data.get("time_updated"),
+            product_data.get("price"),
+            product_data.get("url"),
+            int(bool(product_data.get("target"))),
+            product_data.get("priority"),
+            json.dumps(extra) if extra else None,
+        )
+
+    @staticmethod
+    def _to_product(row: Row) -> Dict[str, Any]:
+        """
+        Converts a row of the products table, without the key columns, into the
+        data of a product.
+
+        Args:
+            row (Row): The values of the columns from name to extra.
+
+        Returns:
+            dict: The data of the product.
+        """
+        product_data = dict(zip(PRODUCT_FIELDS, row))
+        for field in ("stock", "alert", "target"):
+            product_data[field] = bool(product_data[field])
+        if row[-1] is not None:
+            product_data.update(json.loads(row[-1]))
+        return product_data
+
+    def _insert_profile(
+        self, vendor: str, product: str, profile: Dict[str, Any]
+    ) -> None:
+        """
+        Inserts a profile as a whole, replacing the stored one, without adding to
+        the history. Must be called holding `_lock`.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+            profile (dict): The profile data.
+        """
+        rows = {id: self._to_row(p) for id, p in profile["products"].items()}
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM products WHERE vendor = ? AND product = ?",
+                (vendor, product),
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?)",
+                (vendor, product, profile.get("time_updated")),
+            )
+            self._connection.executemany(
+                "INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(vendor, product, id) + row for id, row in rows.items()],
+            )
+        self._saved[(vendor, product)] = rows
+
+    def read(self, vendor: str, product: str) -> Dict[str, Any]:
+        """
+        Reads the profile of a product from the database, migrating it from its
+        JSON file if it is not stored yet.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+
+        Returns:
+            dict: The profile data.
+        """
+        self.flush()
+        with self._lock:
+            profile_row = self._connection.execute(
+                "SELECT time_updated FROM profiles WHERE vendor = ? AND product = ?",
+                (vendor, product),
+            ).fetchone()
+            if profile_row is None:
+                profile = ProfileStore.read(self, vendor, product)
+                self._insert_profile(vendor, product, profile)
+                return profile
+
+            rows = self._connection.execute(
+                "SELECT id, name, stock, alert, time_updated, price, url, target,"
+                + " priority, extra FROM products WHERE vendor = ? AND product = ?"
+                + " ORDER BY rowid",
+                (vendor, product),
+            ).fetchall()
+            self._saved[(vendor, product)] = {row[0]: row[1:] for row in rows}
+        return {
+            "time_updated": profile_row[0],
+            "products": {row[0]: self._to_product(row[1:]) for row in rows},
+        }
+
+    def _stage(
+        self,
+        vendor: str,
+        product: str,
+        time_updated: Optional[str],
+        products: Dict[str, Dict[str, Any]],
+    ) -> None:
+        """
+        Determines the products whose data changed since the last save and their
+        stock and price transitions, and stages them for the next flush. Flushes
+        at once if writes are not deferred.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+            time_updated (str): The time of the last update of the profile.
+            products (dict): A dict mapping the ids of products to their data.
+        """
+        with self._lock:
+            saved = self._saved.setdefault((vendor, product), dict())
+            for id, product_data in products.items():
+                row = self._to_row(product_data)
+                last = saved.get(id)
+                # Column 3 is the time of the last update
+                if last is not None and last[:3] + last[4:] == row[:3] + row[4:]:
+                    continue
+
+                if last is not None and last[1] != row[1]:
+                    transition = "restock" if row[1] else "sold_out"
+                elif last is not None and last[4] != row[4]:
+                    transition = "price"
+                else:
+                    transition = ""
+                if transition:
+                    self._pending_history.append(
+                        (vendor, product, id, row[3], transition, row[1], row[4])
+                    )
+
+                saved[id] = row
+                self._pending_rows[(vendor, product, id)] = row
+            self._pending_profiles[(vendor, product)] = time_updated
+
+            if self._flush_interval:
+                self._start_flush_thread()
+                return
+        self.flush()
+
+    def save(self, vendor: str, product: str, profile: Dict[str, Any]) -> None:
+        """
+        Saves the profile of a product. The products whose data changed since
+        the last save and their stock and price transitions are determined
+        immediately, but only written to the database with the next flush.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+            profile (dict): The profile data.
+        """
+        self._stage(vendor, product, profile.get("time_updated"), profile["products"])
+
+    def save_changes(
+        self,
+        vendor: str,
+        product: str,
+        time_updated: Optional[str],
+        changes: Dict[str, Dict[str, Any]],
+        get_profile: Callable[[], Dict[str, Any]],
+    ) -> None:
+        """
+        Saves the changes to the profile of a product. Only the changed products
+        are diffed against their last saved state, the whole profile is only
+        serialised if it is not stored yet.
+
+        Args:
+            vendor (str): The name of the vendor.
+            product (str): The name of the product.
+            time_updated (str): The time of the last update of the profile.
+            changes (dict): A dict mapping the ids of the products that changed
+                since the last save to their data.
+            get_profile (Callable[[], dict]): Returns the whole profile data.
+        """
+        if (vendor, product) not in self._saved:
+            self.save(vendor, product, get_profile())
+            return
+        self._stage(vendor, product, time_updated, changes)
+
+    def flush(self) -> None:
+        """
+        Writes all pending changes to the database in one transaction.
+        """
+        with self._lock:
+            profiles, self._pending_profiles = self._pending_profiles, dict()
+            rows, self._pending_rows = self._pending_rows, dict()
+            history, self._pending_history = self._pending_history, []
+            if not (profiles or rows or history):
+                return
+
+            try:
+                with self._connection:
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?)",
+                        [key + (time,) for key, time in profiles.items()],
+                    )
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO products"
+                        + " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [key + row for key, row in rows.items()],
+                    )
+                    self._connection.executemany(
+                        "INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?)", history
+                    )
+            except sqlite3.Error as e:
+                print("Error writing profiles, retrying with the next flush:")
+                print(e)
+                # Keep the failed writes, unless newer versions were saved meanwhile
+                for key, time in profiles.items():
+                    self._pending_profiles.setdefault(key, time)
+                for row_key, row in rows.items():
+                    self._pending_rows.setdefault(row_key, row)
+                self._pending_history[:0] = history
+
+    def migrate(self, overwrite: bool = False) -> int:
+        """
+        Migrates the JSON profiles of all vendors into the database.
+
+        Args:
+            overwrite (bool): Whether to replace profiles stored already, e.g.
+                after products were added to their JSON files.
+
+        Returns:
+            int: The number of profiles migrated.
+        """
+        self.flush()
+        count = 0
+        data_paths = sorted(
+            (Path(__file__).parents[2] / Path("resources/retailers")).glob(
+                "*/data/*.json"
+            )
+        )
+        for data_path in data_paths:
+            vendor, product = data_path.parents[1].name, data_path.stem
+            with self._lock:
+                stored = self._connection.execute(
+                    "SELECT 1 FROM profiles WHERE vendor = ? AND product = ?",
+                    (vendor, product),
+                ).fetchone()
+                if stored and not overwrite:
+                    continue
+                with open(data_path, "r") as in_:
+                    self._insert_profile(vendor, product, json.load(in_))
+            count += 1
+        return count
+
+    def get_restocks(
+        self, product: str, since: str, vendor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the restocks of the variants of a product since a time.
+
+        Args:
+            product (str): The name of the product, e.g. "RTX-3080".
+            since (str): The time to return restocks from, e.g. "2023-05-07 00:00:00".
+            vendor (str): The name of the vendor to return restocks at. Defaults
+                to all vendors.
+
+        Returns:
+            List[dict]: The vendor, id, time and price of every restock, oldest first.
+        """
+        self.flush()
+        query = (
+            "SELECT vendor, id, time, price FROM history"
+            + " WHERE product = ? AND transition = 'restock' AND time >= ?"
+        )
+        parameters: Tuple[str, ...] = (product, since)
+        if vendor is not None:
+            query += " AND vendor = ?"
+            parameters += (vendor,)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY time", parameters)
+            return [dict(zip(("vendor", "id", "time", "price"), r)) for r in rows]
+
+    def get_alerting_targets(self) -> List[Dict[str, Any]]:
+        """
+        Returns the target products that are alerting, across all profiles.
+
+        Returns:
+            List[dict]: The vendor, product and id of every alerting target product
+                along with its data, in order of priority.
+        """
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT vendor, product, id, name, stock, alert, time_updated, price,"
+                + " url, target, priority, extra FROM products"
+                + " WHERE target = 1 AND alert = 1 ORDER BY priority"
+            ).fetchall()
+        return [
+            {"vendor": r[0], "product": r[1], "id": r[2], **self._to_product(r[3:])}
+            for r in rows
+        ]
+
+    def close(self) -> None:
+        """
+        Stops the background flush thread, writes all pending changes and closes
+        the connection to the database.
+        """
+        ProfileStore.close(self)
+        with self._lock:
+            self._connection.close()
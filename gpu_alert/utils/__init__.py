@@ -1,3 +1,4 @@
 from .utils import generate_time_stamp
+from .validator_cache import ValidatorCache
 
-__all__ = ["generate_time_stamp"]
+__all__ = ["generate_time_stamp", "ValidatorCache"]
@@ -0,0 +1,220 @@
+import hashlib
+import zlib
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TypeVar
+
+from requests import Response
+
+T = TypeVar("T")
+
+
+class ValidatorCache:
+    """
+    A `ValidatorCache` remembers the validators of the last response to each
+    request, so that responses that did not change since can be recognised and
+    their processing skipped. Validators are the `ETag` and `Last-Modified`
+    headers, which are sent back as a conditional request, and a hash of the
+    response body, for retailers that do not support conditional requests.
+
+    Compressed bodies are hashed as they are received, before they are decoded
+    and parsed, so that an unchanged body costs its download only. Other bodies
+    are hashed while they are parsed.
+
+    Attributes:
+        _validators -- a dict mapping the key of each request to the validators
+            of its last response.
+        _lock -- a lock guarding `_validators` and the hit counters.
+        _hits -- the number of responses found to be unchanged.
+        _requests -- the number of responses checked.
+
+    Methods:
+        __init__
+        _read_header_validators
+        _record_digest
+        get_headers
+        parse_if_changed
+        is_not_modified
+        hit_rate
+    """
+
+    # Creates a decompressor for each content encoding that compressed bodies
+    # are decoded from by the cache itself
+    _decompressors: Dict[str, Callable[[], Any]] = {
+        "gzip": lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+        "x-gzip": lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+        "deflate": lambda: zlib.decompressobj(),
+    }
+
+    def __init__(self) -> None:
+        """
+        Initializes the ValidatorCache object.
+        """
+        self._validators: Dict[str, Dict[str, str]] = dict()
+        self._lock = Lock()
+        self._hits = 0
+        self._requests = 0
+
+    @staticmethod
+    def _read_header_validators(response: Response) -> Dict[str, str]:
+        """
+        Reads the validators of a response from its headers.
+
+        Args:
+            response (Response): The response.
+
+        Returns:
+            dict: The `ETag` and `Last-Modified` validators, if present.
+        """
+        validators = dict()
+        if "ETag" in response.headers:
+            validators["etag"] = response.headers["ETag"]
+        if "Last-Modified" in response.headers:
+            validators["last_modified"] = response.headers["Last-Modified"]
+        return validators
+
+    def get_headers(self, key: str) -> Dict[str, str]:
+        """
+        Returns the headers making a request conditional on its response having
+        changed since the last response.
+
+        Args:
+            key (str): The key identifying the request, e.g. its url.
+
+        Returns:
+            dict: The conditional request headers, empty if there are none.
+        """
+        with self._lock:
+            validators = self._validators.get(key, dict())
+
+        headers = dict()
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def _record_digest(self, key: str, response: Response, digest: str) -> bool:
+        """
+        Records the digest and the header validators of a response as the
+        validators of the last response to its request.
+
+        Args:
+            key (str): The key identifying the request, e.g. its url.
+            response (Response): The response.
+            digest (str): The hash of the body of the response.
+
+        Returns:
+            bool: True if the body did not change since the last response, False
+                otherwise.
+        """
+        validators = {"digest": digest, **self._read_header_validators(response)}
+
+        with self._lock:
+            self._requests += 1
+            last_validators = self._validators.get(key, dict())
+            self._validators[key] = validators
+            if last_validators.get("digest") == digest:
+                self._hits += 1
+                return True
+        return False
+
+    def parse_if_changed(
+        self,
+        key: str,
+        response: Response,
+        parse: Callable[[Iterable[bytes]], T],
+        chunk_size: int = 64 * 1024,
+    ) -> Optional[T]:
+        """
+        Parses the body of a response, unless it did not change since the last
+        response to the same request.
+
+        A gzip or deflate compressed body is read and hashed as received, and is
+        only decoded and passed to the parser if its hash changed. It is held in
+        memory in its compressed form until then. Any other body is hashed as it
+        is passed to the parser, so it is never held in memory as a whole, but
+        the parsing is only skipped if the server found it unchanged, otherwise
+        the result is discarded.
+
+        Args:
+            key (str): The key identifying the request, e.g. its url.
+            response (Response): The response, ideally requested with `stream=True`.
+            parse (Callable[[Iterable[bytes]], T]): Parses the chunks of the body.
+                Must consume them before returning, e.g. by returning a list
+                rather than a generator.
+            chunk_size (int): The size in bytes of the chunks the body is read in.
+
+        Returns:
+            The result of `parse`, or None if the body did not change.
+        """
+        if response.status_code == 304:
+            with self._lock:
+                self._hits += 1
+                self._requests += 1
+            return None
+
+        digest = hashlib.blake2b(digest_size=16)
+        content_encoding = response.headers.get("Content-Encoding", "").lower()
+
+        if content_encoding in self._decompressors:
+            compressed_chunks = []
+            for chunk in response.raw.stream(chunk_size, decode_content=False):
+                digest.update(chunk)
+                compressed_chunks.append(chunk)
+            if self._record_digest(key, response, digest.hexdigest()):
+                return None
+
+            decompressor = self._decompressors[content_encoding]()
+
+            def decode_chunks() -> Iterator[bytes]:
+                for chunk in compressed_chunks:
+                    yield decompressor.decompress(chunk)
+                yield decompressor.flush()
+
+            return parse(decode_chunks())
+
+        def hash_chunks() -> Iterator[bytes]:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                digest.update(chunk)
+                yield chunk
+
+        chunks = hash_chunks()
+        result = parse(chunks)
+        # Hash the rest of the body, if the parser stopped before its end
+        for _ in chunks:
+            pass
+
+        if self._record_digest(key, response, digest.hexdigest()):
+            return None
+        return result
+
+    def is_not_modified(self, key: str, response: Response) -> bool:
+        """
+        Checks whether the server found a response unchanged, without reading its
+        body, and records the validators of the response otherwise. Used for
+        responses whose body may be read in part only, which can not be hashed.
+
+        Args:
+            key (str): The key identifying the request, e.g. its url.
+            response (Response): The response, ideally requested with `stream=True`.
+
+        Returns:
+            bool: True if the response is "304 Not Modified", False otherwise.
+        """
+        with self._lock:
+            self._requests += 1
+            if response.status_code == 304:
+                self._hits += 1
+                return True
+            self._validators[key] = self._read_header_validators(response)
+        return False
+
+    def hit_rate(self) -> float:
+        """
+        Returns the fraction of responses found to be unchanged.
+
+        Returns:
+            float: The hit rate, 0 if no response was checked yet.
+        """
+        with self._lock:
+            return self._hits / self._requests if self._requests else 0.0
@@ -0,0 +1,70 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from gpu_alert.coordination import LeaseCoordinator, SQLiteLeaseBackend
+
+PARTITIONS = [f"retailer_a/RTX-30{i}0" for i in range(5, 10)]
+
+
+class TestLeaseCoordinator(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = Path(self._directory.name) / "leases.sqlite3"
+        self.addCleanup(self._directory.cleanup)
+
+    def _create_coordinator(self, node_id, lease_ttl=15.0):
+        coordinator = LeaseCoordinator(
+            SQLiteLeaseBackend(self._path), node_id, lease_ttl
+        )
+        coordinator._partitions = PARTITIONS
+        return coordinator
+
+    def _get_held(self, coordinator):
+        return {p for p in PARTITIONS if coordinator.holds(p)}
+
+    def test_rebalance(self):
+        first = self._create_coordinator("first")
+        first.rebalance()
+        self.assertEqual(self._get_held(first), set(PARTITIONS))
+
+        # A node joining is given an equal share once the surplus is released
+        second = self._create_coordinator("second")
+        second.rebalance()
+        first.rebalance()
+        second.rebalance()
+        first_held, second_held = self._get_held(first), self._get_held(second)
+        self.assertEqual(first_held | second_held, set(PARTITIONS))
+        self.assertFalse(first_held & second_held)
+        self.assertLessEqual(abs(len(first_held) - len(second_held)), 1)
+
+        # The partitions of a node shutting down are taken over at once
+        second.close()
+        first.rebalance()
+        self.assertEqual(self._get_held(first), set(PARTITIONS))
+        first.close()
+
+    def test_failover(self):
+        failed = self._create_coordinator("failed", lease_ttl=0.3)
+        failed.rebalance()
+        survivor = self._create_coordinator("survivor", lease_ttl=0.3)
+        survivor.rebalance()
+        self.assertFalse(self._get_held(survivor))
+
+        # The failed node stops renewing, its leases expire
+        time.sleep(0.35)
+        self.assertFalse(self._get_held(failed))
+        survivor.rebalance()
+        self.assertEqual(self._get_held(survivor), set(PARTITIONS))
+
+    def test_claim_transition(self):
+        first = self._create_coordinator("first")
+        second = self._create_coordinator("second")
+        key = "retailer_a/RTX-3080/product0"
+
+        self.assertTrue(first.claim_transition(key, True))
+        self.assertFalse(second.claim_transition(key, True))
+        self.assertTrue(second.claim_transition(key, False))
+        self.assertFalse(first.claim_transition(key, False))
+        self.assertTrue(first.claim_transition(key, True))
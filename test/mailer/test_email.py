@@ -1,3 +1,4 @@
+import time
 import unittest
 from datetime import datetime
 from unittest.mock import patch
@@ -26,3 +27,50 @@ class TestEmailManager(unittest.TestCase):
         expected = ["a@example.com", "a@example.com", "b@example.com", "c@example.eu"]
         result = list(email_manager._read_recipients())
         self.assertEqual(expected, result)
+
+    @patch("gpu_alert.mailer.Mailer._create_ses_client")
+    def test_send_to_all_parallel(self, mock_create_ses_client):
+        # Stub SES client with a fixed round-trip time per request
+        mock_create_ses_client.return_value.send_templated_email.side_effect = (
+            lambda **_: time.sleep(0.1)
+        )
+        email_manager = Mailer("test_recipients")
+        email_manager.send_to_all(
+            "stock_alert", "RTX-3060", "Retailer B", "", "", "", ""
+        )
+        ses_client = mock_create_ses_client.return_value
+        self.assertEqual(ses_client.send_templated_email.call_count, 4)
+        self.assertLess(email_manager.last_dispatch_duration, 0.3)
+
+    @patch("gpu_alert.mailer.Mailer._read_recipients")
+    @patch("gpu_alert.mailer.Mailer._create_ses_client")
+    def test_send_to_all_bulk(self, mock_create_ses_client, mock_read_recipients):
+        recipients = [f"{i}@example.com" for i in range(120)]
+        mock_read_recipients.return_value = iter(recipients)
+        ses_client = mock_create_ses_client.return_value
+        ses_client.send_bulk_templated_email.side_effect = lambda **kwargs: {
+            "Status": [
+                {"Status": "Failed" if i == 0 else "Success"}
+                for i, _ in enumerate(kwargs["Destinations"])
+            ]
+        }
+        email_manager = Mailer("test_recipients", bulk=True)
+        email_manager.send_to_all(
+            "stock_alert", "RTX-3060", "Retailer B", "", "", "", ""
+        )
+        self.assertEqual(ses_client.send_bulk_templated_email.call_count, 3)
+        retried = [
+            c.kwargs["Destination"]["ToAddresses"][0]
+            for c in ses_client.send_templated_email.call_args_list
+        ]
+        self.assertEqual(
+            sorted(retried), ["0@example.com", "100@example.com", "50@example.com"]
+        )
+
+    def test_read_recipients_cached(self):
+        email_manager = Mailer("test_recipients")
+        list(email_manager._read_recipients())
+        with patch("builtins.open") as mock_open:
+            result = list(email_manager._read_recipients())
+        self.assertEqual(mock_open.call_count, 0)
+        self.assertEqual(len(result), 4)
@@ -0,0 +1,95 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import boto3
+from botocore.stub import Stubber
+
+from gpu_alert.mailer import Mailer, Outbox
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = Path(self._directory.name) / "outbox.sqlite3"
+        self.addCleanup(self._directory.cleanup)
+
+        self._mailer = MagicMock()
+        self._mailer._read_recipients.side_effect = lambda: iter(
+            ["a@example.com", "b@example.com"]
+        )
+
+    def test_enqueue(self):
+        # The first attempt for each recipient is throttled
+        attempted = set()
+
+        def send_email(recipient_email, alert_type, template_data):
+            if recipient_email in attempted:
+                return True
+            attempted.add(recipient_email)
+            return False
+
+        self._mailer.send_email.side_effect = send_email
+        outbox = Outbox(self._mailer, self._path, base_delay=0.01)
+        outbox.enqueue("retailer_a/RTX-3080/product0/t0", "stock_alert", {"a": "1"})
+        outbox.enqueue("retailer_a/RTX-3080/product0/t0", "stock_alert", {"a": "1"})
+
+        wait_for(lambda: outbox.count_pending() == 0)
+        outbox.close()
+        self.assertEqual(self._mailer.send_email.call_count, 4)
+        self.assertEqual(attempted, {"a@example.com", "b@example.com"})
+
+    def test_enqueue_persisted(self):
+        self._mailer.send_email.return_value = False
+        outbox = Outbox(self._mailer, self._path, base_delay=60)
+        outbox.enqueue("retailer_a/RTX-3080/product0/t0", "stock_alert", {})
+        wait_for(lambda: self._mailer.send_email.call_count == 2)
+        outbox.close()
+
+        self._mailer.send_email.return_value = True
+        outbox = Outbox(self._mailer, self._path, base_delay=60)
+        self.assertEqual(outbox.count_pending(), 2)
+        outbox.close()
+
+    def test_enqueue_ses(self):
+        # Sent through a stubbed SES client, which validates the parameters
+        ses_client = boto3.client(
+            "ses",
+            region_name="eu-central-1",
+            aws_access_key_id="key",
+            aws_secret_access_key="secret",
+        )
+        stubber = Stubber(ses_client)
+        stubber.add_client_error("send_templated_email", "Throttling")
+        stubber.add_response(
+            "send_templated_email",
+            {"MessageId": "1"},
+            {
+                "Source": "<your SES-enabled email>",
+                "Destination": {"ToAddresses": ["a@example.com"]},
+                "Template": "stock_alert",
+                "TemplateData": '{"product": "RTX-3080"}',
+            },
+        )
+        mailer = Mailer("test_recipients")
+        with patch.object(mailer, "_create_ses_client", return_value=ses_client):
+            with patch.object(
+                mailer, "_read_recipients", return_value=iter(["a@example.com"])
+            ), stubber:
+                outbox = Outbox(mailer, self._path, base_delay=0.01)
+                outbox.enqueue(
+                    "retailer_a/RTX-3080/product0/t0",
+                    "stock_alert",
+                    {"product": "RTX-3080"},
+                )
+                wait_for(lambda: outbox.count_pending() == 0)
+                outbox.close()
+                stubber.assert_no_pending_responses()
@@ -1,4 +1,8 @@
+import asyncio
+import itertools
+import time
 import unittest
+from unittest.mock import MagicMock, patch
 
 from gpu_alert.manager import Manager
 
@@ -12,3 +16,161 @@ class TestManager(unittest.TestCase):
             upper_limit = 105
             self.assertGreater(result, lower_limit)
             self.assertLess(result, upper_limit)
+
+    @patch("gpu_alert.manager.Manager._generate_time_interval", return_value=0)
+    @patch("gpu_alert.manager.Manager._generate_search_interval", return_value=0.01)
+    @patch("gpu_alert.manager.Manager._create_searches")
+    def test_run_concurrently(self, mock_create_searches, *_):
+        slow_search = MagicMock(
+            vendor="slow", target_priority=None, consecutive_failures=0
+        )
+        slow_search.update.side_effect = lambda: time.sleep(0.3)
+        fast_search = MagicMock(
+            vendor="fast", target_priority=None, consecutive_failures=0
+        )
+        mock_create_searches.return_value = [slow_search, fast_search]
+
+        manager = Manager("me")
+
+        async def run():
+            try:
+                await asyncio.wait_for(manager._run_concurrently(), timeout=0.25)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(slow_search.update.call_count, 1)
+        self.assertGreater(fast_search.update.call_count, 5)
+
+    @patch("gpu_alert.manager.Manager._generate_time_interval", return_value=0)
+    @patch("gpu_alert.manager.Manager._generate_search_interval", return_value=0.01)
+    @patch("gpu_alert.manager.Manager._apply_resource_changes")
+    @patch("gpu_alert.manager.Manager._create_searches", return_value=[])
+    def test_run_concurrently_added(self, _, mock_apply_resource_changes, *__):
+        # Searches added to an empty profile do not share a single thread
+        slow_search = MagicMock(
+            vendor="slow", target_priority=None, consecutive_failures=0
+        )
+        slow_search.update.side_effect = lambda: time.sleep(0.3)
+        fast_search = MagicMock(
+            vendor="fast", target_priority=None, consecutive_failures=0
+        )
+        mock_apply_resource_changes.side_effect = itertools.chain(
+            [([slow_search, fast_search], [])], itertools.repeat(([], []))
+        )
+
+        manager = Manager("me", reload_interval=0.01)
+
+        async def run():
+            try:
+                await asyncio.wait_for(manager._run_concurrently(), timeout=0.25)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(slow_search.update.call_count, 1)
+        self.assertGreater(fast_search.update.call_count, 5)
+
+    @patch("gpu_alert.manager.Manager._generate_search_interval", return_value=0.01)
+    @patch("gpu_alert.manager.Manager._apply_resource_changes")
+    @patch("gpu_alert.manager.Manager._create_searches")
+    def test_run_concurrently_removed(
+        self, mock_create_searches, mock_apply_resource_changes, _
+    ):
+        search = MagicMock(vendor="fast", target_priority=None, consecutive_failures=0)
+        mock_create_searches.return_value = [search]
+        mock_apply_resource_changes.side_effect = itertools.chain(
+            [([], [search])], itertools.repeat(([], []))
+        )
+
+        manager = Manager("me", reload_interval=0.01)
+
+        async def run():
+            try:
+                await asyncio.wait_for(manager._run_concurrently(), timeout=0.1)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(run())
+        search.close.assert_called_once_with()
+
+    @patch("gpu_alert.manager.Manager._close")
+    @patch("gpu_alert.manager.Manager._apply_resource_changes")
+    @patch("gpu_alert.manager.Manager._create_searches")
+    def test_auto_update_removed(
+        self, mock_create_searches, mock_apply_resource_changes, _
+    ):
+        search = MagicMock(
+            key="retailer_a/RTX-3080", target_priority=None, consecutive_failures=0
+        )
+        search.update.side_effect = KeyboardInterrupt
+        mock_create_searches.return_value = [search]
+        mock_apply_resource_changes.return_value = ([], [search])
+
+        manager = Manager("me")
+        with patch("time.sleep"):
+            with self.assertRaises(KeyboardInterrupt):
+                manager.auto_update()
+        search.close.assert_called_once_with()
+
+    @patch("gpu_alert.manager.Manager._create_search")
+    @patch("gpu_alert.manager.Manager._read_alert_profile")
+    def test_apply_resource_changes(self, mock_read_alert_profile, mock_create_search):
+        def create_search(alert):
+            key = f"retailer_a/{alert['product']}"
+            requests = f"retailers/{key.replace('/', '/requests/search/')}.json"
+            return MagicMock(key=key, resources={requests})
+
+        mock_create_search.side_effect = create_search
+        mock_read_alert_profile.return_value = [
+            {"vendor": "retailer_a", "product": "RTX-3070"},
+            {"vendor": "alternate", "product": "RTX-3080"},
+        ]
+        manager = Manager("me")
+        self.addCleanup(manager._close)
+        kept, dropped = manager._searches
+
+        mock_read_alert_profile.return_value = [
+            {"vendor": "alternate", "product": "RTX-3070"},
+            {"vendor": "retailer_a", "product": "RTX-3090"},
+        ]
+        manager._on_resources_changed(
+            {
+                "alert_profiles/me.json",
+                "retailers/retailer_a/requests/search/RTX-3070.json",
+            }
+        )
+        added, removed = manager._apply_resource_changes()
+
+        self.assertEqual([s.key for s in added], ["retailer_a/RTX-3090"])
+        self.assertEqual(removed, [dropped])
+        self.assertEqual(manager._searches, [kept] + added)
+        kept.reconfigure.assert_called_once_with()
+        added[0].reconfigure.assert_not_called()
+        self.assertEqual(manager._apply_resource_changes(), ([], []))
+
+    @patch("gpu_alert.manager.Manager._close")
+    @patch("gpu_alert.manager.Manager._create_search")
+    @patch("gpu_alert.manager.Manager._read_alert_profile", return_value=[])
+    def test_auto_update_empty(self, mock_read_alert_profile, mock_create_search, _):
+        search = MagicMock(
+            key="retailer_a/RTX-3080", target_priority=None, consecutive_failures=0
+        )
+        search.update.side_effect = KeyboardInterrupt
+        mock_create_search.return_value = search
+        manager = Manager("me", reload_interval=0.01)
+        self.assertEqual(manager._searches, [])
+
+        # The profile gains an entry while the loop waits for one
+        def sleep(seconds):
+            if not manager._searches:
+                self.assertEqual(seconds, 0.01)
+                mock_read_alert_profile.return_value = [
+                    {"vendor": "retailer_a", "product": "RTX-3080"}
+                ]
+                manager._on_resources_changed({"alert_profiles/me.json"})
+
+        with patch("time.sleep", side_effect=sleep):
+            with self.assertRaises(KeyboardInterrupt):
+                manager.auto_update()
+        search.update.assert_called_once_with()
@@ -0,0 +1,59 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from gpu_alert.manager import PollScheduler
+
+
+def create_search(vendor="alternate", target_priority=None, consecutive_failures=0):
+    search = MagicMock()
+    search.vendor = vendor
+    search.target_priority = target_priority
+    search.consecutive_failures = consecutive_failures
+    return search
+
+
+class TestPollScheduler(unittest.TestCase):
+    def test_get_interval(self):
+        scheduler = PollScheduler(lambda: 40.0, lambda: 5.0)
+        hot_target = create_search(target_priority=1)
+        dead_product = create_search()
+        for _ in range(10):
+            scheduler.record(hot_target, True)
+            scheduler.record(dead_product, False)
+
+        self.assertLess(scheduler.get_interval(hot_target), 20)
+        self.assertGreater(scheduler.get_interval(dead_product), 60)
+
+    def test_get_interval_priority(self):
+        scheduler = PollScheduler(lambda: 40.0, lambda: 5.0)
+        self.assertEqual(scheduler.get_interval(create_search(target_priority=1)), 20)
+        self.assertEqual(scheduler.get_interval(create_search(target_priority=4)), 35)
+        self.assertEqual(scheduler.get_interval(create_search()), 40)
+
+    def test_get_interval_failures(self):
+        scheduler = PollScheduler(lambda: 40.0, lambda: 5.0, max_interval=300.0)
+        self.assertEqual(scheduler.get_interval(create_search()), 40)
+        self.assertEqual(
+            scheduler.get_interval(create_search(consecutive_failures=2)), 160
+        )
+        self.assertEqual(
+            scheduler.get_interval(create_search(consecutive_failures=10)), 300
+        )
+
+    def test_pop(self):
+        scheduler = PollScheduler(lambda: 40.0, lambda: 5.0)
+        later, sooner = create_search(), create_search()
+        scheduler.push(later, time.time() + 20)
+        scheduler.push(sooner, time.time() + 10)
+
+        self.assertIs(scheduler.pop()[0], sooner)
+        self.assertIs(scheduler.pop()[0], later)
+
+    def test_budget(self):
+        scheduler = PollScheduler(lambda: 40.0, lambda: 5.0)
+        self.assertEqual(scheduler.get_budget_delay("alternate"), 0)
+
+        scheduler.consume_budget("alternate")
+        self.assertGreater(scheduler.get_budget_delay("alternate"), 4)
+        self.assertEqual(scheduler.get_budget_delay("other"), 0)
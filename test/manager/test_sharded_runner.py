@@ -0,0 +1,117 @@
+import queue
+import unittest
+from unittest.mock import MagicMock, patch
+
+from gpu_alert.manager import AlertForwarder, ShardedRunner
+
+ALERTS = [
+    {"product": "RTX-3070", "vendor": "alternate"},
+    {"product": "RTX-3080", "vendor": "retailer_a"},
+    {"product": "RTX-3080", "vendor": "alternate"},
+    {"product": "RTX-3090", "vendor": "alternate"},
+]
+
+
+@patch("gpu_alert.manager.sharded_runner.Outbox")
+@patch("gpu_alert.manager.Manager._read_alert_profile", return_value=ALERTS)
+class TestShardedRunner(unittest.TestCase):
+    def test_get_shard(self, *_):
+        counts = [0] * 4
+        for i in range(1000):
+            shard = ShardedRunner.get_shard("retailer_a", f"product{i}", 4)
+            self.assertEqual(
+                shard, ShardedRunner.get_shard("retailer_a", f"product{i}", 4)
+            )
+            counts[shard] += 1
+        self.assertTrue(all(count > 150 for count in counts))
+
+    def test_create_shards(self, *_):
+        runner = ShardedRunner("me", workers=8)
+        self.assertEqual(len(runner._shards), 8)
+        self.assertEqual(sum(len(shard) for shard in runner._shards), len(ALERTS))
+
+        # Aliases of the same vendor share a shard
+        for shard in runner._shards:
+            if ALERTS[1] in shard:
+                self.assertIn(ALERTS[2], shard)
+
+    def test_supervise(self, *_):
+        runner = ShardedRunner("me", workers=1, restart_delay=10)
+        runner._context = MagicMock()
+        crashed = MagicMock(exitcode=1)
+        crashed.is_alive.return_value = False
+        runner._context.Process.return_value = crashed
+
+        self.assertIsNone(runner._supervise())
+        self.assertEqual(runner._context.Process.call_count, 1)
+
+        # The crashed worker is restarted after the restart delay
+        delay = runner._supervise()
+        self.assertAlmostEqual(delay, 10, delta=1)
+        self.assertEqual(runner._context.Process.call_count, 1)
+        runner._restart_at[0] = 0
+        runner._supervise()
+        self.assertEqual(runner._context.Process.call_count, 2)
+
+        # The delay doubles while the worker keeps crashing
+        self.assertAlmostEqual(runner._supervise(), 20, delta=1)
+
+    def test_split_rate_limits(self, *_):
+        runner = ShardedRunner(
+            "me",
+            workers=1,
+            rate=2.0,
+            burst=5,
+            host_limits={"www.alternate.de": {"rate": 4.0}},
+        )
+        self.assertEqual(
+            runner._split_rate_limits(2),
+            {
+                "rate": 1.0,
+                "burst": 2,
+                "host_limits": {"www.alternate.de": {"rate": 2.0, "burst": 2}},
+            },
+        )
+        self.assertEqual(runner._split_rate_limits(10)["burst"], 1)
+
+    def test_reshard(self, mock_read_alert_profile, _):
+        runner = ShardedRunner("me", workers=8)
+        runner._context = MagicMock()
+        runner._context.Process.side_effect = lambda **_: MagicMock()
+        runner._supervise()
+        started = list(runner._processes)
+        shards = list(runner._shards)
+
+        # An entry is added to a shard that has entries already
+        shard = next(i for i, shard in enumerate(shards) if shard)
+        product = next(
+            f"product{i}"
+            for i in range(1000)
+            if ShardedRunner.get_shard("retailer_a", f"product{i}", 8) == shard
+        )
+        mock_read_alert_profile.return_value = ALERTS + [
+            {"product": product, "vendor": "retailer_a"}
+        ]
+        runner._on_resources_changed({"alert_profiles/me.json"})
+        self.assertTrue(runner._profile_changed.is_set())
+        runner._reshard()
+        runner._supervise()
+
+        # Only the worker of that shard is restarted
+        for i, process in enumerate(runner._processes):
+            if i == shard:
+                started[i].terminate.assert_called_once_with()
+            elif process is not None:
+                self.assertIs(process, started[i])
+                process.terminate.assert_not_called()
+        self.assertEqual(runner._context.Process.call_count, runner._count_shards() + 1)
+
+    def test_forwarded_alerts(self, *_):
+        alert_queue: queue.Queue = queue.Queue()
+        AlertForwarder(alert_queue).enqueue("key", "stock_alert", {"a": "1"})
+
+        runner = ShardedRunner("me", workers=1)
+        runner._alert_queue = alert_queue
+        runner._close()
+        runner._outbox.enqueue.assert_called_once_with("key", "stock_alert", {"a": "1"})
+        runner._outbox.close.assert_called_once()
@@ -0,0 +1,48 @@
+import unittest
+from urllib.request import urlopen
+
+from gpu_alert.metrics import MetricsRegistry, MetricsServer
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self._registry = MetricsRegistry(buckets=(0.1, 1.0))
+
+    def test_span(self):
+        with self._registry.span("parse", "retailer_a", "RTX-3070"):
+            pass
+        with self.assertRaises(ValueError):
+            with self._registry.span("parse", "retailer_a", "RTX-3070"):
+                raise ValueError()
+
+        metrics = self._registry.render()
+        labels = 'stage="parse",vendor="retailer_a",product="RTX-3070"'
+        self.assertIn(
+            f'gpu_alert_stage_duration_seconds_bucket{{{labels},le="0.1"}} 1', metrics
+        )
+        self.assertIn(f"gpu_alert_stage_duration_seconds_count{{{labels}}} 1", metrics)
+        self.assertIn(f"gpu_alert_stage_errors_total{{{labels}}} 1", metrics)
+
+    def test_render_buckets(self):
+        for duration in (0.05, 0.5, 5.0):
+            self._registry.observe(("mail_send", "", ""), duration)
+
+        metrics = self._registry.render()
+        self.assertIn('le="0.1"} 1', metrics)
+        self.assertIn('le="1.0"} 2', metrics)
+        self.assertIn('le="+Inf"} 3', metrics)
+
+    def test_render_escape(self):
+        self._registry.observe(("parse", "retailer_a", 'RTX "3070"'), 0.01)
+        self.assertIn('product="RTX \\"3070\\""', self._registry.render())
+
+
+class TestMetricsServer(unittest.TestCase):
+    def test_serve(self):
+        registry = MetricsRegistry()
+        registry.observe(("search_request", "retailer_a", "RTX-3070"), 0.2)
+        server = MetricsServer(registry, 0)
+        self.addCleanup(server.close)
+
+        with urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            self.assertEqual(response.read().decode(), registry.render())
@@ -0,0 +1,36 @@
+import tempfile
+import unittest
+from pathlib import Path
+from threading import Event, Thread
+
+from gpu_alert.metrics import Profiler
+from gpu_alert.search import Search
+
+
+class TestProfiler(unittest.TestCase):
+    def test_profile(self):
+        stop_event = Event()
+
+        def work():
+            while not stop_event.is_set():
+                Search._normalise_name("ASUS GeForce RTX 3060 TUF OC, Grafikkarte")
+
+        worker = Thread(target=work)
+        worker.start()
+        self.addCleanup(worker.join)
+        self.addCleanup(stop_event.set)
+
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = Profiler(Path(directory), duration=10.0, interval=0.001)
+            self.assertTrue(profiler.start())
+            self.assertFalse(profiler.start())
+            stop_event.wait(0.2)
+            profiler.stop()
+            self.assertFalse(profiler.is_running())
+
+            summary_path = next(Path(directory).glob("*-summary.txt"))
+            summary = summary_path.read_text()
+            self.assertIn("gpu_alert.search.search", summary)
+            self.assertIn("_normalise_name", summary)
+            self.assertTrue(list(Path(directory).glob("*-stacks.folded")))
+            self.assertTrue(list(Path(directory).glob("*.tracemalloc")))
@@ -0,0 +1,67 @@
+import unittest
+from pathlib import Path
+
+from lxml import etree
+
+from gpu_alert.product import AvailabilityDetector
+from gpu_alert.spec import RetailerSpec
+
+FIXTURES_PATH = Path(__file__).parents[2] / Path("benchmarks/fixtures/retailer_a")
+
+
+def split(page, chunk_size):
+    return [page[i : i + chunk_size] for i in range(0, len(page), chunk_size)]
+
+
+class TestAvailabilityDetector(unittest.TestCase):
+    def setUp(self):
+        self._spec = RetailerSpec.load("retailer_a")
+        self._detector = AvailabilityDetector(self._spec)
+        page = (FIXTURES_PATH / Path("product.html")).read_bytes()
+        button = b'title="In den Warenkorb">In den Warenkorb</a>'
+        self.assertIn(button, page)
+
+        self._pages = {
+            "available": page,
+            "sold_out": page.replace(button, b'title="Merken">Merken</a>'),
+            "single_quoted": page.replace(
+                button, b"title='In den Warenkorb'>In den Warenkorb</a>"
+            ),
+            "text_only": page.replace(button, b">Merken</a> In den Warenkorb"),
+        }
+
+    def test_detect_saved_pages(self):
+        expected = {
+            "available": True,
+            "sold_out": False,
+            "single_quoted": True,
+            "text_only": False,
+        }
+        for name, page in self._pages.items():
+            parsed = self._spec.is_available(etree.HTML(page))
+            self.assertEqual(parsed, expected[name], name)
+            for chunk_size in (7, 1024, 16 * 1024, len(page)):
+                self.assertEqual(
+                    self._detector.detect(split(page, chunk_size), "utf-8"),
+                    parsed,
+                    f"{name} in chunks of {chunk_size}",
+                )
+
+    def test_stop_at_verdict(self):
+        read = []
+
+        def chunks():
+            for chunk in split(self._pages["available"], 1024):
+                read.append(chunk)
+                yield chunk
+
+        self.assertTrue(self._detector.detect(chunks(), "utf-8"))
+        self.assertLess(len(read), len(split(self._pages["available"], 1024)))
+
+    def test_parse_ambiguous_only(self):
+        parse_calls = []
+        parse = self._detector._parse
+        self._detector._parse = lambda *args: parse_calls.append(1) or parse(*args)
+        for name in ("available", "sold_out", "single_quoted", "text_only"):
+            self._detector.detect([self._pages[name]], "utf-8")
+        self.assertEqual(len(parse_calls), 2)
@@ -0,0 +1,27 @@
+import io
+import unittest
+from unittest.mock import MagicMock
+
+from requests import HTTPError, Response
+
+from gpu_alert.product import SpecProduct
+
+
+def create_response(status_code, body, headers=None):
+    response = Response()
+    response.status_code = status_code
+    response.raw = io.BytesIO(body)
+    response.headers.update(headers if headers else dict())
+    return response
+
+
+class TestSpecProduct(unittest.TestCase):
+    def test_check_availability_error(self):
+        session = MagicMock()
+        session.get.return_value = create_response(503, b"", {"ETag": '"error"'})
+        product = SpecProduct("retailer_a", {"name": "RTX-3080", "url": "url"}, session)
+
+        with self.assertRaises(HTTPError):
+            product._check_availability()
+        # The validators of the error page are not sent with the next request
+        self.assertEqual(product._validator_cache.get_headers("url"), dict())
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from gpu_alert.product import Product, WatcherPool
+
+
+class IdleProduct(Product):
+    _vendor = "retailer_a"
+
+    def __init__(self, checked):
+        super().__init__({"name": "RTX-3080"})
+        self._checked = checked
+
+    def _generate_time_interval(self):
+        return 60.0
+
+    def _check_availability(self):
+        self._availability = False
+        self._checked.set()
+
+
+class TestWatcherPool(unittest.TestCase):
+    def test_submit(self):
+        release = threading.Event()
+        watcher = MagicMock()
+        watcher.auto_update.side_effect = lambda stop_event: release.wait(5)
+        callback = MagicMock()
+
+        watcher_pool = WatcherPool(max_workers=2)
+        self.assertTrue(watcher_pool.submit("product0", watcher, callback))
+        self.assertTrue(watcher_pool.is_watching("product0"))
+        self.assertFalse(watcher_pool.submit("product0", watcher, callback))
+
+        release.set()
+        watcher_pool.shutdown()
+        self.assertFalse(watcher_pool.is_watching("product0"))
+        self.assertEqual(watcher.auto_update.call_count, 1)
+        self.assertEqual(callback.call_count, 1)
+
+    def test_submit_unavailable(self):
+        watcher = MagicMock()
+        watcher.auto_update.return_value = False
+        callback = MagicMock()
+
+        watcher_pool = WatcherPool(max_workers=1)
+        watcher_pool.submit("product0", watcher, callback)
+        watcher_pool.shutdown()
+        self.assertEqual(callback.call_count, 0)
+
+    def test_shutdown(self):
+        checked = threading.Event()
+        watcher_pool = WatcherPool(max_workers=1)
+        watcher_pool.submit("product0", IdleProduct(checked), MagicMock())
+        watcher_pool.submit("product1", IdleProduct(threading.Event()), MagicMock())
+        checked.wait(5)
+
+        # The running watcher stops waiting for its next request and the queued
+        # one does not start
+        start_time = time.time()
+        watcher_pool.shutdown()
+        self.assertLess(time.time() - start_time, 1.0)
+        self.assertFalse(watcher_pool.is_watching("product0"))
+        self.assertFalse(watcher_pool.is_watching("product1"))
+
+    def test_cancel(self):
+        checked = threading.Event()
+        watcher_pool = WatcherPool(max_workers=2)
+        self.addCleanup(watcher_pool.shutdown)
+        watcher_pool.submit(
+            "retailer_a/RTX-3080/product0", IdleProduct(checked), MagicMock()
+        )
+        watcher_pool.submit(
+            "retailer_a/RTX-3080-Ti/product0",
+            IdleProduct(threading.Event()),
+            MagicMock(),
+        )
+        checked.wait(5)
+
+        # Only the watchers of the cancelled search stop
+        watcher_pool.cancel("retailer_a/RTX-3080/")
+        deadline = time.time() + 1.0
+        while watcher_pool.is_watching("retailer_a/RTX-3080/product0"):
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        self.assertTrue(watcher_pool.is_watching("retailer_a/RTX-3080-Ti/product0"))
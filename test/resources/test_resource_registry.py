@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from gpu_alert.resources import ResourceRegistry
+
+ALERT_PROFILE = "alert_profiles/me.json"
+
+
+class TestResourceRegistry(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self._root = Path(self._directory.name)
+        (self._root / "alert_profiles").mkdir()
+        self._write([{"vendor": "retailer_a", "product": "RTX-3080"}])
+
+    def _write(self, data, mtime_ns=None):
+        path = self._root / ALERT_PROFILE
+        with open(path, "w") as out:
+            out.write(data if isinstance(data, str) else json.dumps(data))
+        # Edits within the resolution of the file system time stamps are not
+        # told apart by the modification time alone
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_get_cached(self):
+        registry = ResourceRegistry(self._root)
+        profile = registry.get(ALERT_PROFILE)
+        with patch("builtins.open") as mock_open:
+            self.assertIs(registry.get(ALERT_PROFILE), profile)
+        self.assertEqual(mock_open.call_count, 0)
+
+    def test_get_invalid(self):
+        self._write([{"vendor": "retailer_a"}])
+        with self.assertRaises(ValueError):
+            ResourceRegistry(self._root).get(ALERT_PROFILE)
+
+    def test_reload(self):
+        registry = ResourceRegistry(self._root)
+        registry.get(ALERT_PROFILE)
+        callback = MagicMock()
+        registry.subscribe(callback)
+        self.assertEqual(registry.reload(), set())
+
+        alerts = [
+            {"vendor": "retailer_a", "product": "RTX-3080"},
+            {"vendor": "retailer_a", "product": "RTX-3090"},
+        ]
+        self._write(alerts, mtime_ns=10**18)
+        self.assertEqual(registry.reload(), {ALERT_PROFILE})
+        callback.assert_called_once_with({ALERT_PROFILE})
+        self.assertEqual(registry.get(ALERT_PROFILE), alerts)
+
+    def test_reload_invalid(self):
+        registry = ResourceRegistry(self._root)
+        profile = registry.get(ALERT_PROFILE)
+
+        # An edit in progress keeps the last valid version
+        self._write('[{"vendor": "retailer_a", "prod', mtime_ns=10**18)
+        self.assertEqual(registry.reload(), set())
+        self.assertIs(registry.get(ALERT_PROFILE), profile)
+
+        (self._root / ALERT_PROFILE).unlink()
+        self.assertEqual(registry.reload(), set())
+        self.assertIs(registry.get(ALERT_PROFILE), profile)
@@ -0,0 +1,49 @@
+import unittest
+
+from gpu_alert.search.listing_parser import ListingParser
+
+LISTING = """<?xml version='1.0' encoding='UTF-8'?>
+<partial-response><changes><update id="lazyListingContainer"><![CDATA[
+<div class="listing"><!-- lazy loaded -->
+<a href="https://www.example.com/product/1" class="card productBox boxCounter">
+<div class="product-name font-weight-bold"><span>ZOTAC</span>GeForce RTX 3080</div>
+<div class="delivery-info text-right"><span>Auf Lager</span></div>
+<div class="price-container"><span class="price">€ 1.659,00</span></div>
+</a>
+<a href="https://www.example.com/help" class="nav-link">Hilfe</a>
+<a href="https://www.example.com/product/2" class="card productBox">
+<div class="product-name"><span>INNO3D </span>GeForce RTX 3080 iChill X3</div>
+<div class="delivery-info"><span>Liefertermin unbekannt</span></div>
+<span class="price">€ 999,00</span>
+</a>
+</div>]]></update></changes></partial-response>
+""".encode("utf-8")
+
+
+class TestListingParser(unittest.TestCase):
+    def test_parse(self):
+        expected = [
+            {
+                "name": "ZOTACGeForce RTX 3080",
+                "stock_message": "Auf Lager",
+                "price": "€ 1.659,00",
+                "url": "https://www.example.com/product/1",
+            },
+            {
+                "name": "INNO3D GeForce RTX 3080 iChill X3",
+                "stock_message": "Liefertermin unbekannt",
+                "price": "€ 999,00",
+                "url": "https://www.example.com/product/2",
+            },
+        ]
+
+        # Split the listing into small chunks, cutting through tags and characters
+        chunks = (LISTING[i : i + 7] for i in range(0, len(LISTING), 7))
+        result = list(ListingParser("productBox", "utf-8").parse(chunks))
+
+        self.assertEqual(expected, result)
+
+    def test_parse_empty(self):
+        parser = ListingParser("productBox", "utf-8")
+        self.assertEqual(list(parser.parse([])), [])
+        self.assertEqual(list(parser.parse([b"", b" \n"])), [])
@@ -0,0 +1,63 @@
+import json
+import time
+import unittest
+from pathlib import Path
+
+from gpu_alert.search import ProductTable
+
+PROFILE_PATH = Path(__file__).parents[2] / Path(
+    "resources/retailers/retailer_a/data/TEST-RTX-3060.json"
+)
+
+
+class TestProductTable(unittest.TestCase):
+    def setUp(self):
+        with open(PROFILE_PATH, "r") as in_:
+            self._products = json.load(in_)["products"]
+        self._table = ProductTable(self._products)
+
+    def test_to_profile(self):
+        self.assertEqual(self._table.to_profile(), self._products)
+
+        extra = {"product0": {**self._products["product0"], "sku": "A-1"}}
+        self.assertEqual(ProductTable(extra).to_profile(), extra)
+
+    def test_record(self):
+        record = self._table["product1"]
+        self.assertEqual(dict(record), self._products["product1"])
+
+        record["target"] = True
+        record["priority"] = 1
+        record["time_updated"] = "2023-05-14 20:42:05"
+        self.assertTrue(self._table["product1"]["target"])
+        self.assertEqual(self._table.get_target_priority(), 1)
+        self.assertEqual(self._table["product1"]["time_updated"], "2023-05-14 20:42:05")
+        with self.assertRaises(KeyError):
+            record["sku"]
+
+    def test_update(self):
+        now = int(time.time())
+        result = {"stock": True, "price": 900.0, "url": "https://www.dummy.de"}
+        self.assertTrue(self._table.update("product0", result, now))
+        self.assertFalse(self._table.update("product0", result, now + 60))
+
+        self.assertTrue(self._table.is_in_stock("product0"))
+        self.assertEqual(self._table["product0"]["price"], 900.0)
+        self.assertEqual(
+            self._table["product0"]["time_updated"],
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now + 60)),
+        )
+
+    def test_alerting_targets(self):
+        self.assertFalse(self._table.any_alerting())
+        for id, priority in (("product0", 3), ("product1", 2), ("product2", 1)):
+            self._table[id]["target"] = id != "product2"
+            self._table[id]["priority"] = priority
+            self.assertTrue(self._table.set_alert(id, True))
+        self.assertFalse(self._table.set_alert("product0", True))
+
+        self.assertTrue(self._table.any_alerting())
+        self.assertEqual(
+            [id for id, _ in self._table.get_alerting_targets()],
+            ["product1", "product0"],
+        )
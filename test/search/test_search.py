@@ -1,8 +1,8 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from gpu_alert.mailer import Mailer
-from gpu_alert.search import Search
+from gpu_alert.search import Search, SearchRetailerA
 
 
 class TestSearch(unittest.TestCase):
@@ -17,3 +17,147 @@ class TestSearch(unittest.TestCase):
         search._products["product2"]["alert"] = True
         search._generate_alerts()
         self.assertEqual(mock_start_product_watcher.call_count, 1)
+
+    @patch("gpu_alert.search.Search._create_session")
+    def test_start_product_watcher(self, _):
+        watcher_pool = MagicMock()
+        search = SearchRetailerA("TEST-RTX-3060", Mailer("me"), watcher_pool)
+        for id in ("product0", "product1", "product2"):
+            search._products[id]["alert"] = True
+        search._products["product2"]["target"] = True
+        search._products["product2"]["priority"] = 2
+        search._products["product1"]["target"] = True
+        search._products["product1"]["priority"] = 1
+        search._start_product_watcher()
+
+        keys = [c.args[0] for c in watcher_pool.submit.call_args_list]
+        self.assertEqual(
+            keys,
+            ["retailer_a/TEST-RTX-3060/product1", "retailer_a/TEST-RTX-3060/product2"],
+        )
+
+    @patch("gpu_alert.search.Search._create_session")
+    def test_apply_search_results(self, _):
+        search = SearchRetailerA("TEST-RTX-3060", Mailer("me"))
+        search._products["product1"]["stock"] = True
+        search._products["product2"][
+            "name"
+        ] = "ASUSGeForce RTX 3060 TUF OC, Grafikkarte"
+        search._build_product_index()
+
+        search._apply_search_results(
+            {
+                "RTX  dummy 0": {"stock": True, "price": 900.0, "url": ""},
+                "ASUS GeForce RTX 3060 TUF-OC, Grafikkart": {
+                    "stock": True,
+                    "price": 500.0,
+                    "url": "",
+                },
+                "RTX Dummy 3": {"stock": True, "price": 100.0, "url": ""},
+            }
+        )
+
+        self.assertTrue(search._products["product0"]["stock"])
+        self.assertTrue(search._products["product0"]["alert"])
+        self.assertEqual(search._products["product0"]["price"], 900.0)
+        self.assertFalse(search._products["product1"]["stock"])
+        self.assertFalse(search._products["product1"]["alert"])
+        self.assertTrue(search._products["product2"]["alert"])
+        self.assertEqual(search._active_ids, {"product0", "product2"})
+
+    @patch("gpu_alert.search.Search._create_session")
+    def test_update_alert_status_coordinated(self, _):
+        coordinator = MagicMock()
+        coordinator.claim_transition.side_effect = [True, False]
+        search = SearchRetailerA("TEST-RTX-3060", Mailer("me"), coordinator=coordinator)
+
+        # Only the node claiming a stock transition alerts for it
+        for id in ("product0", "product1"):
+            search._products[id]["stock"] = True
+            search._update_alert_status(id, False)
+        self.assertTrue(search._products["product0"]["alert"])
+        self.assertFalse(search._products["product1"]["alert"])
+        coordinator.claim_transition.assert_called_with(
+            "retailer_a/TEST-RTX-3060/product1", True
+        )
+
+        search._update_alert_status("product0", True)
+        self.assertEqual(coordinator.claim_transition.call_count, 2)
+
+    @patch("gpu_alert.search.Search._create_session")
+    def test_apply_search_results_changes_only(self, _):
+        outbox = MagicMock()
+        search = SearchRetailerA("TEST-RTX-3060", Mailer("me"), outbox=outbox)
+        search._products["product0"]["target"] = True
+        results = {
+            "RTX Dummy 0": {"stock": True, "price": 900.0, "url": ""},
+            "RTX Dummy 1": {"stock": True, "price": 900.0, "url": ""},
+        }
+        search._apply_search_results(results)
+        self.assertEqual(search._changed_ids, {"product0", "product1"})
+        search._changed_ids = set()
+
+        # Alerts are cleared with the next update, unchanged results are not applied
+        with patch.object(search._products, "update") as mock_update:
+            search._apply_search_results(dict(results))
+        mock_update.assert_not_called()
+        self.assertFalse(search._products.any_alerting())
+        self.assertEqual(search._changed_ids, {"product0", "product1"})
+
+        # Only target products in stock are alerted for when their price drops
+        search._apply_search_results(
+            {
+                "RTX Dummy 0": {"stock": True, "price": 800.0, "url": ""},
+                "RTX Dummy 1": {"stock": True, "price": 800.0, "url": ""},
+            }
+        )
+        self.assertEqual(outbox.enqueue.call_count, 1)
+        self.assertEqual(outbox.enqueue.call_args.args[1], "price_alert")
+        self.assertEqual(outbox.enqueue.call_args.args[2]["price"], 800.0)
+
+        # A disappeared result is out of stock
+        search._apply_search_results({})
+        self.assertFalse(search._products["product0"]["stock"])
+        self.assertEqual(search._active_ids, set())
+
+    @patch("gpu_alert.search.Search._create_session")
+    def test_apply_search_results_disappeared(self, _):
+        search = SearchRetailerA("TEST-RTX-3060", Mailer("me"))
+        search._products["product0"]["name"] = "ZOTAC RTX 3060 Twin Edge"
+        search._products["product0"]["url"] = "https://www.dummy.de/product/1234567"
+        search._build_product_index()
+
+        # The result is matched by its article id only, as its name differs
+        search._apply_search_results(
+            {
+                "ZOTAC GAMING GeForce RTX 3060 Twin Edge OC, 12GB": {
+                    "stock": True,
+                    "price": 400.0,
+                    "url": "https://www.dummy.de/product/1234567",
+                },
+            }
+        )
+        self.assertTrue(search._products.is_in_stock("product0"))
+
+        search._apply_search_results({})
+        self.assertFalse(search._products.is_in_stock("product0"))
+        self.assertEqual(search._active_ids, set())
+
+    @patch("gpu_alert.search.Search._create_session")
+    def test_match_fuzzy_model_tokens(self, _):
+        search = SearchRetailerA("TEST-RTX-3060", Mailer("me"))
+        search._products["product0"]["name"] = "ASUS GeForce RTX 3080 TUF OC, 10GB"
+        search._products["product1"]["name"] = "ZOTAC RTX 3060 Twin Edge OC, 12GB"
+        search._build_product_index()
+
+        # Close names of different variants are not matched
+        for name in (
+            "ASUS GeForce RTX 3080 Ti TUF OC, 10GB",
+            "ASUS GeForce RTX 3080 TUF OC, 12GB",
+            "ZOTAC RTX 3060 Twin Edge OC, 8GB",
+        ):
+            self.assertIsNone(search._match_product(name, "", True))
+        self.assertEqual(
+            search._match_product("ASUS GeForse RTX 3080 TUF OC, 10GB", "", True),
+            "product0",
+        )
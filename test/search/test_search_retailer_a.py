@@ -1,9 +1,32 @@
+import io
 import unittest
+from unittest.mock import DEFAULT, MagicMock, patch
+
+from requests import HTTPError, Response
 
 from gpu_alert.mailer import Mailer
 from gpu_alert.search import SearchRetailerA
 
 
+def create_listing(*names):
+    boxes = [
+        f'<a class="productBox" href="https://www.dummy.de/product/{i}">'
+        + f'<div class="product-name">{name}</div>'
+        + '<div class="delivery-info">Auf Lager</div>'
+        + '<span class="price">€ 1.799,00</span></a>'
+        for i, name in enumerate(names)
+    ]
+    return f"<div>{''.join(boxes)}</div>".encode()
+
+
+def create_response(body, status_code=200):
+    response = Response()
+    response.status_code = status_code
+    response.encoding = "utf-8"
+    response.raw = io.BytesIO(body)
+    return response
+
+
 class TestSearchRetailerA(unittest.TestCase):
     def test_format_price(self):
         email_manager = Mailer("me")
@@ -26,3 +49,107 @@ class TestSearchRetailerA(unittest.TestCase):
         result = {x: alert_retailer_a._format_price(x) for x in expected}
 
         self.assertEqual(expected, result)
+
+    def test_fetch_listing_pages(self):
+        listings = {
+            "1": create_listing("RTX Dummy 0", "RTX Dummy 1"),
+            "2": create_listing("RTX Dummy 2"),
+            # Past the last page, the listing repeats its last page
+            "3": create_listing("RTX Dummy 2"),
+            "4": create_listing("RTX Dummy 2"),
+        }
+        session_manager = MagicMock()
+        session_manager.post.side_effect = lambda url, data, **_: create_response(
+            listings[data["lpf"]]
+        )
+        search = SearchRetailerA(
+            "TEST-RTX-3060", Mailer("me"), session_manager=session_manager
+        )
+
+        self.assertTrue(search._update_products())
+        for id in ("product0", "product1", "product2"):
+            self.assertTrue(search._products[id]["stock"])
+        self.assertEqual(search._page_count, 2)
+
+        # The pages found and one more are requested, all unchanged
+        session_manager.post.reset_mock()
+        self.assertFalse(search._update_products())
+        pages = sorted(c.kwargs["data"]["lpf"] for c in session_manager.post.mock_calls)
+        self.assertEqual(pages, ["1", "2", "3"])
+
+    def test_fetch_listing_failed_page(self):
+        listings = {
+            "1": create_listing("RTX Dummy 0", "RTX Dummy 1"),
+            "2": create_listing("RTX Dummy 2"),
+            "3": b"",
+        }
+        failed = set()
+        session_manager = MagicMock()
+        session_manager.post.side_effect = lambda url, data, **_: create_response(
+            listings[data["lpf"]], 503 if data["lpf"] in failed else 200
+        )
+        search = SearchRetailerA(
+            "TEST-RTX-3060", Mailer("me"), session_manager=session_manager
+        )
+        self.assertTrue(search._update_products())
+
+        # A failed later page is taken from the last update
+        failed.add("2")
+        self.assertFalse(search._update_products())
+        for id in ("product0", "product1", "product2"):
+            self.assertTrue(search._products[id]["stock"])
+
+        # A failed first page fails the update
+        failed.add("1")
+        with self.assertRaises(HTTPError):
+            search._update_products()
+
+    def test_reconfigure(self):
+        session_manager = MagicMock()
+        session_manager.post.side_effect = lambda url, data, **_: create_response(
+            create_listing("RTX Dummy 0") if data["lpf"] == "1" else b""
+        )
+        search = SearchRetailerA(
+            "TEST-RTX-3060", Mailer("me"), session_manager=session_manager
+        )
+        self.assertIn("retailers/retailer_a/spec.json", search.resources)
+        self.assertTrue(search._update_products())
+
+        requests = {
+            **search._requests,
+            "search": {**search._requests["search"], "url": "https://www.dummy.de/"},
+        }
+        search.reconfigure()
+        session_manager.post.reset_mock()
+        with patch.multiple(
+            search,
+            _read_requests=MagicMock(return_value=requests),
+            _update_profile=DEFAULT,
+            _generate_alerts=DEFAULT,
+        ):
+            # The new requests are used right away, rather than cached responses
+            search.update()
+
+        self.assertEqual(search._requests, requests)
+        session_manager.register_cookie_request.assert_called_with(requests["cookies"])
+        urls = {c.args[0] for c in session_manager.post.mock_calls}
+        self.assertEqual(urls, {"https://www.dummy.de/"})
+        self.assertEqual(search._page_count, 1)
+
+    def test_close(self):
+        session_manager = MagicMock()
+        session_manager.post.side_effect = lambda url, data, **_: create_response(
+            create_listing("RTX Dummy 0") if data["lpf"] == "1" else b""
+        )
+        watcher_pool = MagicMock()
+        search = SearchRetailerA(
+            "TEST-RTX-3060", Mailer("me"), watcher_pool, session_manager=session_manager
+        )
+        search._update_products()
+        page_executor = search._page_executor
+
+        search.close()
+        watcher_pool.cancel.assert_called_once_with("retailer_a/TEST-RTX-3060/")
+        self.assertIsNone(search._page_executor)
+        with self.assertRaises(RuntimeError):
+            page_executor.submit(print)
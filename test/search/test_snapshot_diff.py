@@ -0,0 +1,62 @@
+import unittest
+
+from gpu_alert.search import SnapshotDiff, SnapshotEvent
+
+
+class TestSnapshotDiff(unittest.TestCase):
+    def test_diff(self):
+        snapshot_diff = SnapshotDiff(price_drop_threshold=0.05)
+        results = {
+            "RTX 0": {"stock": False, "price": 900.0, "url": "/0"},
+            "RTX 1": {"stock": True, "price": 900.0, "url": "/1"},
+            "RTX 2": {"stock": True, "price": 900.0, "url": "/2"},
+            "RTX 3": {"stock": True, "price": 900.0, "url": "/3"},
+            "RTX 4": {"stock": True, "price": 900.0, "url": "/4"},
+        }
+        self.assertFalse(snapshot_diff.has_snapshot())
+        events = snapshot_diff.diff(results)
+        self.assertTrue(snapshot_diff.has_snapshot())
+        self.assertEqual({e.type for e in events}, {SnapshotEvent.NEW})
+
+        # Unchanged results emit no events
+        self.assertEqual(snapshot_diff.diff(dict(results)), [])
+
+        events = snapshot_diff.diff(
+            {
+                "RTX 0": {"stock": True, "price": 900.0, "url": "/0"},
+                "RTX 1": {"stock": False, "price": 900.0, "url": "/1"},
+                "RTX 2": {"stock": True, "price": 800.0, "url": "/2"},
+                "RTX 3": {"stock": True, "price": 880.0, "url": "/3"},
+                "RTX 5": {"stock": True, "price": 900.0, "url": "/5"},
+            }
+        )
+        self.assertEqual(
+            [(e.type, e.name) for e in events],
+            [
+                (SnapshotEvent.RESTOCK, "RTX 0"),
+                (SnapshotEvent.SOLD_OUT, "RTX 1"),
+                (SnapshotEvent.PRICE_DROP, "RTX 2"),
+                (SnapshotEvent.CHANGED, "RTX 3"),
+                (SnapshotEvent.NEW, "RTX 5"),
+                (SnapshotEvent.DISAPPEARED, "RTX 4"),
+            ],
+        )
+        self.assertEqual(events[2].previous["price"], 900.0)
+        self.assertEqual(events[-1].result, {"stock": False})
+
+    def test_price_drop_from_no_price(self):
+        snapshot_diff = SnapshotDiff()
+        snapshot_diff.diff({"RTX 0": {"stock": True, "price": float("inf")}})
+        events = snapshot_diff.diff({"RTX 0": {"stock": True, "price": 900.0}})
+        self.assertEqual(events[0].type, SnapshotEvent.CHANGED)
+
+    def test_subscribe(self):
+        snapshot_diff = SnapshotDiff()
+        received = []
+        snapshot_diff.subscribe(received.append)
+        snapshot_diff.diff({"RTX 0": {"stock": True}})
+        snapshot_diff.diff({"RTX 0": {"stock": True}})
+        snapshot_diff.diff({})
+        self.assertEqual(
+            [e.type for e in received], [SnapshotEvent.NEW, SnapshotEvent.DISAPPEARED]
+        )
@@ -0,0 +1,40 @@
+import time
+import unittest
+
+from gpu_alert.session import RateLimiter, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_acquire_burst(self):
+        bucket = TokenBucket(rate=10, burst=3)
+        waited = [bucket.acquire() for _ in range(3)]
+        self.assertEqual(waited, [0, 0, 0])
+
+    def test_acquire_rate(self):
+        bucket = TokenBucket(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+        # The first request is admitted at once, the other three at 20 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.14)
+
+    def test_get_utilisation(self):
+        bucket = TokenBucket(rate=1, burst=5, window=10)
+        self.assertEqual(bucket.get_utilisation(), 0)
+        for _ in range(5):
+            bucket.acquire()
+        self.assertAlmostEqual(bucket.get_utilisation(), 0.5)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_host_limits(self):
+        rate_limiter = RateLimiter(
+            rate=1, burst=1, host_limits={"www.example.com": {"rate": 100, "burst": 2}}
+        )
+        rate_limiter.acquire("www.example.com")
+        self.assertEqual(rate_limiter.acquire("www.example.com"), 0)
+        rate_limiter.acquire("www.example.org")
+
+        self.assertEqual(
+            set(rate_limiter.get_utilisations()), {"www.example.com", "www.example.org"}
+        )
@@ -0,0 +1,61 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from gpu_alert.session import SessionManager
+
+COOKIE_REQUEST = {"url": "https://www.example.com/", "headers": {}}
+
+
+class TestSessionManager(unittest.TestCase):
+    def setUp(self):
+        self._session_manager = SessionManager("retailer_a")
+        self._session_manager._session = MagicMock()
+        self._session_manager._session.cookies = []
+        self._session_manager.register_cookie_request(COOKIE_REQUEST)
+        self.addCleanup(self._session_manager.close)
+
+    def test_connect(self):
+        self._session_manager.connect()
+        self._session_manager.connect()
+        self.assertEqual(self._session_manager._session.get.call_count, 1)
+
+    def test_request_rejected(self):
+        rejected, accepted = MagicMock(status_code=403), MagicMock(status_code=200)
+        self._session_manager._session.request.side_effect = [rejected, accepted]
+
+        response = self._session_manager.post("https://www.example.com/search")
+
+        self.assertIs(response, accepted)
+        # Once to connect on the first request, once after the rejection
+        self.assertEqual(self._session_manager._session.get.call_count, 2)
+        self._session_manager._session.get.assert_called_with(
+            COOKIE_REQUEST["url"], headers=COOKIE_REQUEST["headers"]
+        )
+
+    def test_connect_from_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_path = Path(directory) / "retailer_a.json"
+            session_manager = SessionManager("retailer_a", snapshot_path=snapshot_path)
+            session_manager._session.get = MagicMock(
+                side_effect=lambda *_, **__: session_manager._session.cookies.set(
+                    "session", "abc", domain="www.example.com"
+                )
+            )
+            session_manager.register_cookie_request(COOKIE_REQUEST)
+            session_manager.connect()
+            session_manager.close()
+
+            restarted_session_manager = SessionManager(
+                "retailer_a", snapshot_path=snapshot_path
+            )
+            restarted_session_manager._session.get = MagicMock()
+            restarted_session_manager.register_cookie_request(COOKIE_REQUEST)
+            restarted_session_manager.connect()
+            restarted_session_manager.close()
+
+        self.assertEqual(restarted_session_manager._session.get.call_count, 0)
+        self.assertEqual(
+            restarted_session_manager._session.cookies.get("session"), "abc"
+        )
@@ -0,0 +1,105 @@
+import unittest
+
+from lxml import etree
+
+from gpu_alert.spec import RetailerSpec
+
+SPEC = {
+    "search": {
+        "result": {"tag": "div", "class": "item"},
+        "fields": {
+            "name": {"xpath": "string(.//h2)"},
+            "stock_message": {"xpath": ".//p[@class = 'stock']"},
+            "price": {"xpath": "string(.//span)"},
+            "url": {"xpath": "string(.//a/@href)"},
+        },
+        "in_stock": ["^In stock", "^Only \\d+ left"],
+    },
+    "price": {"thousands_separator": ",", "decimal_separator": "."},
+    "product": {"available": {"xpath": "//button[@id = 'add-to-cart']"}},
+    "aliases": ["shop"],
+}
+
+
+class TestRetailerSpec(unittest.TestCase):
+    def setUp(self):
+        self._spec = RetailerSpec("retailer_b", SPEC)
+
+    def test_format_price(self):
+        expected = {
+            "$ 1,799.00": 1799.0,
+            "$ 599.00": 599.0,
+            "100.00": 100.0,
+            "$ ": float("inf"),
+            "$ 1.304,00": float("inf"),
+        }
+        result = {x: self._spec.format_price(x) for x in expected}
+        self.assertEqual(expected, result)
+
+    def test_is_in_stock(self):
+        self.assertTrue(self._spec.is_in_stock("Only 3 left"))
+        self.assertFalse(self._spec.is_in_stock("Sold out, in stock soon"))
+
+    def test_evaluate(self):
+        item = etree.fromstring(
+            '<div class="item"><h2>RTX <b>3080</b></h2><p class="stock">In stock</p>'
+            + '<span>$ 699.00</span><a href="/p/1">more</a></div>'
+        )
+        fields = self._spec.get_fields()
+        result = {f: RetailerSpec.evaluate(fields[f], item) for f in fields}
+        self.assertEqual(
+            result,
+            {
+                "name": "RTX 3080",
+                "stock_message": "In stock",
+                "price": "$ 699.00",
+                "url": "/p/1",
+            },
+        )
+
+        with self.assertRaises(ValueError):
+            RetailerSpec.evaluate(fields["stock_message"], etree.fromstring("<div/>"))
+
+    def test_is_available(self):
+        page = etree.HTML(
+            "<html><body><button id='add-to-cart'>Buy</button></body></html>"
+        )
+        self.assertTrue(self._spec.is_available(page))
+        self.assertFalse(self._spec.is_available(etree.HTML("<p>Sold out</p>")))
+
+    def test_get_markers(self):
+        self.assertIsNone(self._spec.get_markers("utf-8"))
+
+        markers = {
+            "available": ["Add to cart"],
+            "unavailable": ["Nicht verfügbar"],
+            "ambiguous": ["cart"],
+        }
+        spec = RetailerSpec(
+            "retailer_b",
+            {**SPEC, "product": {**SPEC["product"], "markers": markers}},
+        )
+        self.assertEqual(
+            spec.get_markers("utf-8"),
+            {
+                "available": [b"Add to cart"],
+                "unavailable": ["Nicht verfügbar".encode()],
+                "ambiguous": [b"cart"],
+            },
+        )
+
+        # Markers that can not be encoded are left out
+        self.assertEqual(spec.get_markers("ascii")["unavailable"], [])
+        self.assertIsNone(spec.get_markers("unknown-encoding"))
+
+    def test_find(self):
+        self.assertEqual(RetailerSpec.find("alternate").vendor, "retailer_a")
+        with self.assertRaises(ValueError):
+            RetailerSpec.find("unknown")
+
+    def test_invalid_selector(self):
+        with self.assertRaises(ValueError):
+            RetailerSpec(
+                "retailer_b",
+                {**SPEC, "product": {"available": {"xpath": "//button["}}},
+            )
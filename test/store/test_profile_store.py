@@ -0,0 +1,46 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gpu_alert.store import ProfileStore
+
+
+class TestProfileStore(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = Path(self._directory.name) / "RTX-3080.json"
+        patcher = patch.object(
+            ProfileStore, "_get_profile_path", return_value=self._path
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._directory.cleanup)
+
+    def test_save_deferred(self):
+        profile_store = ProfileStore(flush_interval=3600)
+        with patch("json.dumps", wraps=json.dumps) as mock_dumps:
+            profile_store.save("retailer_a", "RTX-3080", {"products": {"a": 1}})
+            profile_store.save("retailer_a", "RTX-3080", {"products": {"a": 2}})
+            self.assertFalse(self._path.exists())
+            # Profiles are serialised when they are written only
+            self.assertEqual(mock_dumps.call_count, 0)
+
+            with patch.object(
+                ProfileStore, "_write_atomic", wraps=ProfileStore._write_atomic
+            ) as mock_write_atomic:
+                profile_store.close()
+                self.assertEqual(mock_write_atomic.call_count, 1)
+            self.assertEqual(mock_dumps.call_count, 1)
+
+        self.assertEqual(
+            profile_store.read("retailer_a", "RTX-3080"), {"products": {"a": 2}}
+        )
+        self.assertEqual(list(Path(self._directory.name).iterdir()), [self._path])
+
+    def test_save_immediate(self):
+        profile_store = ProfileStore(flush_interval=0)
+        profile_store.save("retailer_a", "RTX-3080", {"products": {}})
+        with open(self._path, "r") as in_:
+            self.assertEqual(json.load(in_), {"products": {}})
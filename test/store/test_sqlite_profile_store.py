@@ -0,0 +1,172 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gpu_alert.store import ProfileStore, SQLiteProfileStore
+
+PROFILE = {
+    "time_updated": "2023-05-14 20:42:05",
+    "products": {
+        "product0": {
+            "name": "ZOTACGeForce RTX 3080 AMP Holo, Grafikkarte",
+            "stock": False,
+            "alert": False,
+            "time_updated": "2023-05-14 20:42:05",
+            "price": 1659.0,
+            "url": "https://www.example.com/product/1",
+            "target": True,
+            "priority": 2,
+        },
+        "product1": {
+            "name": "ZOTACGeForce RTX 3080 Trinity OC, Grafikkarte",
+            "stock": False,
+            "alert": False,
+            "time_updated": "2023-05-14 20:42:05",
+            "price": float("inf"),
+            "url": "https://www.example.com/product/2",
+            "target": False,
+            "priority": 10000,
+        },
+    },
+}
+
+
+class TestSQLiteProfileStore(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self._json_path = Path(self._directory.name) / "RTX-3080.json"
+        with open(self._json_path, "w") as out:
+            json.dump(PROFILE, out)
+        patcher = patch.object(
+            ProfileStore, "_get_profile_path", return_value=self._json_path
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self._store = SQLiteProfileStore(
+            flush_interval=0, path=Path(self._directory.name) / "products.sqlite3"
+        )
+        self.addCleanup(self._store.close)
+
+    def _update(self, profile, id, time, **product_data):
+        profile["products"][id].update(product_data, time_updated=time)
+        profile["time_updated"] = time
+        self._store.save("retailer_a", "RTX-3080", profile)
+
+    def test_read_migrated(self):
+        self.assertEqual(self._store.read("retailer_a", "RTX-3080"), PROFILE)
+
+        # Later reads are served from the database
+        self._json_path.unlink()
+        self.assertEqual(self._store.read("retailer_a", "RTX-3080"), PROFILE)
+
+    def test_save_changed_rows(self):
+        profile = self._store.read("retailer_a", "RTX-3080")
+        with patch.object(self._store, "_connection") as mock_connection:
+            self._update(profile, "product1", "2023-05-15 10:00:00")
+            self._update(profile, "product1", "2023-05-15 10:01:00", stock=True)
+        rows = [
+            c.args[1]
+            for c in mock_connection.executemany.call_args_list
+            if "INTO products" in c.args[0]
+        ]
+        # Only the time of the last update changed in the first save
+        self.assertEqual([len(r) for r in rows], [0, 1])
+        self.assertEqual(rows[1][0][2], "product1")
+
+    def test_save_changes(self):
+        profile = self._store.read("retailer_a", "RTX-3080")
+        product_data = dict(profile["products"]["product0"], stock=True)
+        product_data["time_updated"] = "2023-05-15 10:00:00"
+        self._store.save_changes(
+            "retailer_a",
+            "RTX-3080",
+            "2023-05-15 10:00:00",
+            {"product0": product_data},
+            lambda: self.fail("the whole profile is not needed"),
+        )
+
+        profile = self._store.read("retailer_a", "RTX-3080")
+        self.assertEqual(profile["time_updated"], "2023-05-15 10:00:00")
+        self.assertTrue(profile["products"]["product0"]["stock"])
+        self.assertEqual(
+            profile["products"]["product1"], PROFILE["products"]["product1"]
+        )
+        self.assertEqual(len(self._store.get_restocks("RTX-3080", "2023-05-15")), 1)
+
+    def test_history(self):
+        profile = self._store.read("retailer_a", "RTX-3080")
+        self._update(profile, "product0", "2023-05-10 10:00:00", stock=True)
+        self._update(profile, "product0", "2023-05-10 11:00:00", price=1599.0)
+        self._update(profile, "product0", "2023-05-10 12:00:00", stock=False)
+        self._update(profile, "product1", "2023-05-16 09:00:00", stock=True)
+
+        self.assertEqual(
+            self._store.get_restocks("RTX-3080", "2023-05-09 00:00:00"),
+            [
+                {
+                    "vendor": "retailer_a",
+                    "id": "product0",
+                    "time": "2023-05-10 10:00:00",
+                    "price": 1659.0,
+                },
+                {
+                    "vendor": "retailer_a",
+                    "id": "product1",
+                    "time": "2023-05-16 09:00:00",
+                    "price": float("inf"),
+                },
+            ],
+        )
+        self.assertEqual(
+            len(self._store.get_restocks("RTX-3080", "2023-05-15 00:00:00")), 1
+        )
+        transitions = self._store._connection.execute(
+            "SELECT transition FROM history WHERE id = 'product0' ORDER BY time"
+        ).fetchall()
+        self.assertEqual(transitions, [("restock",), ("price",), ("sold_out",)])
+
+    def test_get_alerting_targets(self):
+        profile = self._store.read("retailer_a", "RTX-3080")
+        self.assertEqual(self._store.get_alerting_targets(), [])
+        self._update(profile, "product0", "2023-05-15 10:00:00", stock=True, alert=True)
+        self._update(profile, "product1", "2023-05-15 10:00:00", stock=True, alert=True)
+
+        targets = self._store.get_alerting_targets()
+        self.assertEqual(
+            [(t["product"], t["id"]) for t in targets], [("RTX-3080", "product0")]
+        )
+        self.assertTrue(targets[0]["alert"])
+
+    def test_indexed_queries(self):
+        queries = [
+            "SELECT * FROM history WHERE product = 'RTX-3080'"
+            + " AND transition = 'restock' AND time >= '2023-05-09'",
+            "SELECT * FROM products WHERE target = 1 AND alert = 1 ORDER BY priority",
+        ]
+        for query in queries:
+            plan = self._store._connection.execute(f"EXPLAIN QUERY PLAN {query}")
+            self.assertIn("USING INDEX", " ".join(row[-1] for row in plan))
+
+    def test_save_deferred(self):
+        store = SQLiteProfileStore(
+            flush_interval=3600, path=Path(self._directory.name) / "deferred.sqlite3"
+        )
+        profile = store.read("retailer_a", "RTX-3080")
+        profile["products"]["product0"]["stock"] = True
+        store.save("retailer_a", "RTX-3080", profile)
+        self.assertEqual(
+            store._connection.execute("SELECT COUNT(*) FROM history").fetchone()[0], 0
+        )
+        store.close()
+
+        store = SQLiteProfileStore(
+            flush_interval=0, path=Path(self._directory.name) / "deferred.sqlite3"
+        )
+        self.assertTrue(
+            store.read("retailer_a", "RTX-3080")["products"]["product0"]["stock"]
+        )
+        store.close()
@@ -0,0 +1,122 @@
+import gzip
+import io
+import unittest
+from unittest.mock import MagicMock
+
+from requests import Response
+from urllib3 import HTTPResponse
+
+from gpu_alert.utils import ValidatorCache
+
+
+def create_response(status_code, body, headers=None):
+    response = Response()
+    response.status_code = status_code
+    response.raw = io.BytesIO(body)
+    response.headers.update(headers if headers else dict())
+    return response
+
+
+class TestValidatorCache(unittest.TestCase):
+    def test_parse_if_changed(self):
+        validator_cache = ValidatorCache()
+        body = b"<html>listing</html>"
+
+        result = validator_cache.parse_if_changed(
+            "url", create_response(200, body), list, 8
+        )
+        self.assertEqual(len(result), 3)
+        self.assertEqual(b"".join(result), body)
+        self.assertIsNone(
+            validator_cache.parse_if_changed("url", create_response(200, body), list)
+        )
+        self.assertIsNotNone(
+            validator_cache.parse_if_changed(
+                "url", create_response(200, body + b" "), list
+            )
+        )
+        self.assertAlmostEqual(validator_cache.hit_rate(), 1 / 3)
+
+    def test_parse_if_changed_stopped(self):
+        # A parser stopping early still has the whole body hashed
+        validator_cache = ValidatorCache()
+        body = b"<html>listing</html>"
+
+        def parse_first(chunks):
+            return next(iter(chunks))
+
+        validator_cache.parse_if_changed(
+            "url", create_response(200, body), parse_first, 8
+        )
+        self.assertIsNotNone(
+            validator_cache.parse_if_changed(
+                "url", create_response(200, body[:8]), parse_first, 8
+            )
+        )
+
+    def test_parse_if_changed_compressed(self):
+        # A compressed body is hashed before it is decoded, and an unchanged one
+        # is not parsed at all
+        validator_cache = ValidatorCache()
+        body = b"<html>listing</html>"
+        parse = MagicMock(side_effect=list)
+
+        def create_compressed_response(body):
+            response = Response()
+            response.status_code = 200
+            response.headers["Content-Encoding"] = "gzip"
+            response.raw = HTTPResponse(
+                io.BytesIO(gzip.compress(body)),
+                headers=response.headers,
+                preload_content=False,
+            )
+            return response
+
+        result = validator_cache.parse_if_changed(
+            "url", create_compressed_response(body), parse, 8
+        )
+        self.assertEqual(b"".join(result), body)
+        self.assertIsNone(
+            validator_cache.parse_if_changed(
+                "url", create_compressed_response(body), parse, 8
+            )
+        )
+        self.assertEqual(parse.call_count, 1)
+        self.assertIsNotNone(
+            validator_cache.parse_if_changed(
+                "url", create_compressed_response(body + b" "), parse, 8
+            )
+        )
+        self.assertAlmostEqual(validator_cache.hit_rate(), 1 / 3)
+
+    def test_conditional_request(self):
+        validator_cache = ValidatorCache()
+        self.assertEqual(validator_cache.get_headers("url"), dict())
+
+        headers = {"ETag": '"abc"', "Last-Modified": "Sat, 14 May 2023 20:42:05 GMT"}
+        validator_cache.parse_if_changed(
+            "url", create_response(200, b"", headers), list
+        )
+        self.assertEqual(
+            validator_cache.get_headers("url"),
+            {
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Sat, 14 May 2023 20:42:05 GMT",
+            },
+        )
+        self.assertIsNone(
+            validator_cache.parse_if_changed("url", create_response(304, b""), list)
+        )
+
+    def test_is_not_modified(self):
+        validator_cache = ValidatorCache()
+        headers = {"ETag": '"abc"'}
+        response = create_response(200, b"<html>product</html>", headers)
+        self.assertFalse(validator_cache.is_not_modified("url", response))
+        # The body is left unread
+        self.assertEqual(response.raw.tell(), 0)
+        self.assertEqual(validator_cache.get_headers("url"), {"If-None-Match": '"abc"'})
+        self.assertTrue(
+            validator_cache.is_not_modified("url", create_response(304, b""))
+        )
+        self.assertAlmostEqual(validator_cache.hit_rate(), 1 / 2)